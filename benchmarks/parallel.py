@@ -0,0 +1,85 @@
+"""
+Scaling of parallel UTM projection with the number of worker processes, for
+row-wise operands and, if NumPy is available, array backed ones. Speedups are
+relative to serial application. Note that with NumPy available, the workers use
+the batch kernels for both, since the shared memory block is array backed.
+
+Run from the repository root:
+
+    python benchmarks/parallel.py [number of points] [max number of processes]
+"""
+
+import sys
+from os import cpu_count
+from random import Random
+from time import perf_counter
+
+from pyge.context import OpDirection
+from pyge.coordinateset import CoordinateSetRowWise
+from pyge.minimal import MinimalContext
+from pyge.parallel import ProcessPool
+
+try:
+    import numpy as np
+
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+except ImportError:
+    np = None
+
+
+def points_per_second(apply, direction, operands) -> float:
+    start = perf_counter()
+    apply(direction, operands)
+    return len(operands) / (perf_counter() - start)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else cpu_count() or 1
+    rng = Random(42)
+    rows = [
+        [rng.uniform(-80, 84), rng.uniform(3, 15), rng.uniform(0, 100)]
+        for _ in range(n)
+    ]
+
+    ctx = MinimalContext()
+    op = ctx.op("geo | utm zone=32 | ne")
+    layouts = {"row-wise": lambda: CoordinateSetRowWise([list(r) for r in rows])}
+    if np is not None:
+        layouts["numpy"] = lambda: CoordinateSetNumpy(np.array(rows))
+
+    print(f"UTM zone 32, {n} points, forward")
+    print(f"{'processes':>9} " + " ".join(f"{k:>14} {'speedup':>8}" for k in layouts))
+
+    def serial(direction, operands):
+        ctx.apply(op, direction, operands)
+
+    baseline = {
+        k: points_per_second(serial, OpDirection.FWD, f()) for k, f in layouts.items()
+    }
+    print(
+        f"{'serial':>9} "
+        + " ".join(f"{baseline[k]:>14,.0f} {1.0:>7.1f}x" for k in layouts)
+    )
+
+    # Powers of two, and the maximum
+    counts = sorted({2**i for i in range(processes.bit_length())} | {processes})
+    for count in counts:
+        with ProcessPool(ctx, op, count) as pool:
+            # Warm up: Start the workers, and have them instantiate the operator
+            pool.apply(OpDirection.FWD, CoordinateSetRowWise([[55.0, 12.0]]))
+            rates = {
+                k: points_per_second(pool.apply, OpDirection.FWD, f())
+                for k, f in layouts.items()
+            }
+        print(
+            f"{count:>9} "
+            + " ".join(
+                f"{rates[k]:>14,.0f} {rates[k] / baseline[k]:>7.1f}x" for k in layouts
+            )
+        )
+    ctx.release(op)
+
+
+if __name__ == "__main__":
+    main()
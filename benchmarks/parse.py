@@ -0,0 +1,127 @@
+"""
+Definitions per second for parsing and instantiating operators, over a generated
+corpus of pipeline definitions, in varying layouts, with and without comments.
+
+`pyge.parser` normalizes definitions using a few passes of the `str` methods,
+and only scans a definition token by token when there is an error to locate. For
+reference, the normalization used before, which split and joined the definition
+once per separator, is included as "legacy normalize".
+
+Run from the repository root:
+
+    python benchmarks/parse.py [number of definitions]
+"""
+
+import sys
+from random import Random
+from time import perf_counter
+
+from pyge.minimal import MinimalContext
+from pyge.operator import Operator
+from pyge.parser import normalize_definition, parse_definition
+
+ELLIPSOIDS = ("GRS80", "WGS84", "intl", "bessel")
+
+
+def corpus(n: int) -> list[str]:
+    rng = Random(42)
+
+    def number(low, high):
+        return f"{rng.uniform(low, high):.{rng.randint(0, 6)}f}"
+
+    def templates():
+        zone, other = rng.randint(1, 60), rng.randint(1, 60)
+        ellps = rng.choice(ELLIPSOIDS)
+        translation = ",".join(number(-500, 500) for _ in range(3))
+        rotation = ",".join(number(-5, 5) for _ in range(3))
+        return [
+            ["geo", f"utm zone={zone}", "ne"],
+            ["geo", f"inv utm zone={zone}", f"utm zone={other}", "ne"],
+            [
+                "geo",
+                f"cart ellps={ellps}",
+                f"helmert translation={translation}",
+                f"inv cart ellps={rng.choice(ELLIPSOIDS)}",
+                "inv geo",
+            ],
+            [
+                "geo",
+                "cart",
+                (
+                    f"helmert translation={translation} rotation={rotation} "
+                    f"scale={number(-2, 2)} convention=position_vector"
+                ),
+                "inv cart",
+                "inv geo",
+            ],
+            [
+                (
+                    f"tmerc lon_0={number(-180, 180)} lat_0={number(-80, 80)} "
+                    f"k_0={number(0.99, 1)} x_0={number(0, 1e6)} ellps={ellps}"
+                )
+            ],
+        ]
+
+    # The same pipelines, in the compact layout, and in a sprawling one, with
+    # comments, line breaks and extra whitespace
+    def layout(steps: list[str]) -> str:
+        if rng.random() < 0.5:
+            return " | ".join(steps)
+        lines = []
+        for step in steps:
+            step = step.replace("=", " = ").replace(",", ", ")
+            comment = f"   # {rng.choice(('step', 'see docs', 'TODO'))}"
+            lines.append(step + (comment if rng.random() < 0.5 else ""))
+        return "# A pipeline\n  " + "\n| ".join(lines) + "\n"
+
+    return [layout(rng.choice(templates())) for _ in range(n)]
+
+
+# The normalization used before `pyge.parser`
+def legacy_normalize(definition: str) -> str:
+    lines = definition.replace("\r", "\n").split("\n")
+    trimmed = ""
+    for line in lines:
+        trimmed += " "
+        trimmed += (list(line.strip().split("#")) + [""])[0]
+    trimmed = " ".join(trimmed.split())
+    for splitter in "|=,.:":
+        trimmed = splitter.join(d.strip() for d in trimmed.split(splitter))
+    steps = [stripped for d in trimmed.split("|") if len(stripped := d.strip()) > 0]
+    return " | ".join(steps)
+
+
+def definitions_per_second(function, definitions: list[str]) -> float:
+    start = perf_counter()
+    for definition in definitions:
+        function(definition)
+    return len(definitions) / (perf_counter() - start)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    definitions = corpus(n)
+    assert all(legacy_normalize(d) == normalize_definition(d) for d in definitions)
+
+    ctx = MinimalContext(capacity=2 * n)
+    # Warm up the cache, keeping it within its capacity
+    for definition in definitions:
+        ctx.release(ctx.op(definition))
+
+    cases = {
+        "legacy normalize": legacy_normalize,
+        "normalize": normalize_definition,
+        "parse": parse_definition,
+        "instantiate": lambda definition: Operator(definition, ctx),
+        "cached ctx.op": lambda definition: ctx.release(ctx.op(definition)),
+    }
+    print(
+        f"{n} definitions, {sum(map(len, definitions)) / n:.0f} characters on average"
+    )
+    for name, function in cases.items():
+        rate = definitions_per_second(function, definitions)
+        print(f"{name:>18} {rate:>12,.0f} definitions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+The benchmark suite: Points per second for each builtin operator method, for each
+CoordinateSet implementation at several data set sizes, and for a few
+representative pipelines, in both directions.
+
+Results can be saved as a JSON baseline, and later runs compared against it,
+flagging any case slower than the baseline by more than a threshold (default
+10%). The exit status is 1 if there are regressions, so the comparison can gate
+e.g. nightly jobs or upgrades.
+
+Run from the repository root:
+
+    python benchmarks/suite.py --save                 # Write benchmarks/baseline.json
+    python benchmarks/suite.py --compare              # ... and compare against it
+    python benchmarks/suite.py --quick --filter utm   # A quick look at some cases
+
+Timings are the best of a number of repetitions, each on a fresh copy of the
+input, so setting up the coordinate sets is not included.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from pyge.builtin_operator_methods import builtin_operator_methods
+from pyge.context import OpDirection
+from pyge.coordinateset import CoordinateSetColumnWise, CoordinateSetRowWise
+from pyge.coordinateset_buffer import CoordinateSetBuffer
+from pyge.coordinateset_mmap import CoordinateSetMmap
+from pyge.minimal import MinimalContext
+
+try:
+    import numpy as np
+
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+except ImportError:
+    np = None
+
+BASELINE = "benchmarks/baseline.json"
+
+# One case per builtin operator method, with the kind of input it expects. The
+# pipeline method is exercised by the pipelines below
+OPERATORS = {
+    "addone": ("addone", "generic"),
+    "subone": ("subone", "generic"),
+    "affine": ("affine matrix=1,0.1,0,0,1,0,0,0,1 translation=1,2,3", "generic"),
+    "cart": ("cart ellps=GRS80", "radians"),
+    "geo": ("geo", "degrees"),
+    "gis": ("gis", "degrees"),
+    "helmert": (
+        "helmert translation=1,2,3 rotation=1,2,3 scale=1 convention=position_vector",
+        "cartesian",
+    ),
+    "ne": ("ne", "generic"),
+    "tmerc": ("tmerc lon_0=9 k_0=0.9996 x_0=500000", "radians"),
+    "unitconvert": ("unitconvert xy_in=deg xy_out=gon z_in=ft z_out=m", "degrees"),
+    "utm": ("utm zone=32", "radians"),
+}
+
+PIPELINES = {
+    "utm": "geo | utm zone=32 | ne",
+    "datum shift": "geo | cart | helmert translation=-87,-98,-121 | inv cart | inv geo",
+    "affine run": "helmert translation=1,2,3 | ne | addone | subone | inv ne",
+    "unit conversion": "unitconvert xy_in=deg xy_out=arcsec | inv unitconvert xy_in=arcsec | geo",
+}
+
+# The pipeline used to compare the CoordinateSet implementations
+LAYOUT_PIPELINE = PIPELINES["utm"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pyge benchmark suite")
+    parser.add_argument(
+        "--save", nargs="?", const=BASELINE, help=f"Save results (to {BASELINE})"
+    )
+    parser.add_argument(
+        "--compare", nargs="?", const=BASELINE, help=f"Compare with {BASELINE}"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Regression threshold (0.1)"
+    )
+    parser.add_argument("--filter", default="", help="Only cases containing this")
+    parser.add_argument("--quick", action="store_true", help="Fewer, smaller runs")
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else 5
+    sizes = (1_000, 10_000) if args.quick else (1_000, 10_000, 100_000)
+    n = sizes[-2]
+
+    with TemporaryDirectory() as directory:
+        layouts = _layouts(Path(directory))
+        default = ["row-wise", "numpy"] if np is not None else ["row-wise"]
+        cases = []
+        for name, (definition, kind) in OPERATORS.items():
+            for layout in default:
+                cases.append((f"operator/{name}/{layout}", definition, kind, layout, n))
+        for name, definition in PIPELINES.items():
+            for layout in default:
+                cases.append(
+                    (f"pipeline/{name}/{layout}", definition, "degrees", layout, n)
+                )
+        for layout in layouts:
+            for size in sizes:
+                cases.append(
+                    (
+                        f"layout/{layout}/{size}",
+                        LAYOUT_PIPELINE,
+                        "degrees",
+                        layout,
+                        size,
+                    )
+                )
+
+        missing = set(builtin_operator_methods) - set(OPERATORS) - {"pipeline"}
+        for name in sorted(missing):
+            print(f"Warning: No benchmark for the '{name}' operator method")
+
+        ctx = MinimalContext()
+        results = {}
+        for key, definition, kind, layout, size in cases:
+            if args.filter not in key:
+                continue
+            rows = _data(kind, size)
+            op = ctx.op(definition)
+            rates = _measure(ctx, op, layouts[layout], rows, repeat)
+            ctx.release(op)
+            for direction, rate in zip(("fwd", "inv"), rates):
+                results[f"{key}/{direction}"] = rate
+                print(f"{key + '/' + direction:<40} {rate:>14,.0f} points/s")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = _compare(baseline, results, args.threshold)
+    if args.save:
+        Path(args.save).write_text(json.dumps(_document(results), indent=2) + "\n")
+        print(f"Saved results to {args.save}")
+    if args.compare and regressions:
+        sys.exit(1)
+
+
+# Points per second, forward and inverse, as the best of `repeat` runs
+def _measure(ctx, op, build, rows: list[list[float]], repeat: int) -> tuple:
+    fwd = inv = float("inf")
+    for _ in range(repeat):
+        operands = build(rows)
+        try:
+            start = perf_counter()
+            ctx.apply(op, OpDirection.FWD, operands)
+            middle = perf_counter()
+            ctx.apply(op, OpDirection.INV, operands)
+            stop = perf_counter()
+        finally:
+            # Memory mapped operands hold on to their file until closed
+            if hasattr(operands, "close"):
+                operands.close()
+        fwd, inv = min(fwd, middle - start), min(inv, stop - middle)
+    return len(rows) / fwd, len(rows) / inv
+
+
+# Print the comparison of the cases found in both the baseline and the results,
+# and return the number of regressions
+def _compare(baseline: dict, results: dict, threshold: float) -> int:
+    print(f"\n{'case':<40} {'baseline':>14} {'current':>14} {'change':>8}")
+    regressions = 0
+    for key in (key for key in results if key in baseline):
+        before, after = baseline[key], results[key]
+        change = after / before - 1.0
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:<40} {before:>14,.0f} {after:>14,.0f} {change:>+8.1%}{flag}")
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def _document(results: dict) -> dict:
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "numpy": np.__version__ if np is not None else None,
+        },
+        "results": results,
+    }
+
+
+# Reproducible input data of the given kind
+def _data(kind: str, n: int) -> list[list[float]]:
+    rng = Random(42)
+    if kind == "degrees":
+        return [
+            [rng.uniform(-80, 84), rng.uniform(3, 15), rng.uniform(0, 100)]
+            for _ in range(n)
+        ]
+    if kind == "radians":
+        return [
+            [rng.uniform(0.05, 0.26), rng.uniform(-1.4, 1.46), rng.uniform(0, 100)]
+            for _ in range(n)
+        ]
+    if kind == "cartesian":
+        return [[rng.uniform(-6.4e6, 6.4e6) for _ in range(3)] for _ in range(n)]
+    return [[rng.uniform(-1000, 1000) for _ in range(3)] for _ in range(n)]
+
+
+# Constructors for each CoordinateSet implementation, from a list of rows
+def _layouts(directory: Path) -> dict:
+    files = iter(range(1 << 30))
+
+    def mmap(rows):
+        path = directory / f"{next(files)}.bin"
+        coords = CoordinateSetMmap.create(path, len(rows), len(rows[0]))
+        for i, row in enumerate(rows):
+            coords[i] = row
+        return coords
+
+    layouts = {
+        "row-wise": lambda rows: CoordinateSetRowWise([list(r) for r in rows]),
+        "column-wise": lambda rows: CoordinateSetColumnWise(
+            [list(c) for c in zip(*rows)]
+        ),
+        "buffer": lambda rows: CoordinateSetBuffer(
+            array("d", [v for r in rows for v in r]), len(rows[0])
+        ),
+        "mmap": mmap,
+    }
+    if np is not None:
+        layouts["numpy"] = lambda rows: CoordinateSetNumpy(np.array(rows))
+        layouts["numpy-columnwise"] = lambda rows: CoordinateSetNumpy(
+            np.array(rows).T.copy(), columnwise=True
+        )
+    return layouts
+
+
+if __name__ == "__main__":
+    main()
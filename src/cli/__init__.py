@@ -1,4 +1,8 @@
 from .agurk import agurk
+from .kp import kp
+
+# The entry points of the scripts in pyproject.toml
+__all__ = ["agurk", "ellps", "kp", "plink", "plonk"]
 
 
 def plonk():
@@ -0,0 +1,132 @@
+"""
+kp: Transform coordinates from files, or stdin, in the style of Rust Geodesy's kp
+
+    echo 55 12 | kp "geo | utm zone=32 | ne"
+    kp --inv "geo | utm zone=32 | ne" utm.txt > geo.txt
+
+Input is one coordinate tuple per line, separated by whitespace or commas. Text
+following a '#' is a comment. Lines without coordinates are passed through as is,
+so the output lines up with the input, while coordinate lines are written with
+space separated values.
+
+The input is read, parsed, transformed and written in blocks of many lines, so
+per-line overhead stays low, and the batch kernels are used where possible.
+"""
+
+import argparse
+import sys
+from contextlib import ExitStack, nullcontext
+
+from pyge.context import OpDirection
+from pyge.coordinateset import CoordinateSetRowWise
+from pyge.minimal import MinimalContext
+
+# NumPy is optional: With it, blocks of uniform dimension are parsed in one go,
+# and transformed by the batch kernels
+try:
+    import numpy as np
+
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+except ImportError:
+    np = None
+
+# Approximate number of bytes of input handled per block
+BLOCK_SIZE = 1 << 20
+
+
+def kp(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="kp", description="Transform coordinates from files, or stdin"
+    )
+    parser.add_argument("operator", help="Operator definition, e.g. 'utm zone=32'")
+    parser.add_argument("files", nargs="*", help="Input files (default: stdin)")
+    parser.add_argument("--inv", action="store_true", help="Use the inverse operator")
+    parser.add_argument(
+        "-d", "--decimals", type=int, help="Number of decimals (default: all)"
+    )
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_intermixed_args(argv)
+
+    ctx = MinimalContext()
+    try:
+        op = ctx.op(args.operator)
+    except (NameError, ValueError) as error:
+        parser.exit(1, f"kp: {error}\n")
+    direction = OpDirection.INV if args.inv else OpDirection.FWD
+    format = repr if args.decimals is None else f"{{:.{args.decimals}f}}".format
+
+    try:
+        with ExitStack() as files:
+            output = sys.stdout
+            if args.output:
+                output = files.enter_context(open(args.output, "w"))
+            for name in args.files or ["-"]:
+                with nullcontext(sys.stdin) if name == "-" else open(name) as input:
+                    first = 1
+                    try:
+                        while lines := input.readlines(BLOCK_SIZE):
+                            text = _transform(ctx, op, direction, lines, first, format)
+                            output.write(text)
+                            first += len(lines)
+                    except ValueError as error:
+                        parser.exit(1, f"kp: {name}, {error}\n")
+    except OSError as error:
+        parser.exit(1, f"kp: {error}\n")
+    finally:
+        ctx.release(op)
+
+
+# Transform the coordinates of a block of input lines, numbered from `first`, and
+# return the output text
+def _transform(ctx, op, direction, lines: list[str], first: int, format) -> str:
+    rows, where = [], []
+    for i, line in enumerate(lines):
+        tokens = line.split("#", 1)[0].replace(",", " ").split()
+        if tokens:
+            rows.append(tokens)
+            where.append(i)
+    if not rows:
+        return "".join(lines)
+
+    # Rows of different dimensions are transformed separately, as operators
+    # distinguish between e.g. 2D data and 3D data at zero height
+    dims = [len(row) for row in rows]
+    results = [None] * len(rows)
+    for dim in dict.fromkeys(dims):
+        members = [k for k, n in enumerate(dims) if n == dim]
+        try:
+            if np is not None:
+                group = np.array([rows[k] for k in members], dtype=np.float64)
+                operands = CoordinateSetNumpy(group)
+            else:
+                group = [[float(t) for t in rows[k]] for k in members]
+                operands = CoordinateSetRowWise(group)
+        except ValueError:
+            # Parsing the rows in one go does not tell where it failed, so go look
+            for i, row in zip(where, rows):
+                if not all(_is_number(token) for token in row):
+                    line = lines[i].strip()
+                    raise ValueError(
+                        f"line {first + i}: Cannot parse '{line}'"
+                    ) from None
+            raise
+        ctx.apply(op, direction, operands)
+
+        coords = operands.coords
+        if not isinstance(coords, list):
+            coords = coords.tolist()
+        for k, result in zip(members, coords):
+            results[k] = result
+
+    output = lines[:]
+    for i, result in zip(where, results):
+        output[i] = " ".join(map(format, result)) + "\n"
+    return "".join(output)
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
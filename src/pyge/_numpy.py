@@ -0,0 +1,21 @@
+"""
+NumPy, imported on first use, for the array-at-a-time code paths
+
+NumPy is an optional dependency, and takes longer to import than all of pyge. So
+the batch kernels, and the array methods of `Ellipsoid`, use `np` from here: A
+stand-in, importing NumPy on first use. These code paths are only taken for
+operands with array storage, i.e. when NumPy is available, and already imported.
+"""
+
+from importlib import import_module
+
+
+class _NumPy:
+    # Only called for attributes not yet looked up, as these are then copied here
+    def __getattr__(self, name: str):
+        value = getattr(import_module("numpy"), name)
+        setattr(self, name, value)
+        return value
+
+
+np = _NumPy()
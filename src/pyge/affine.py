@@ -0,0 +1,84 @@
+"""
+Affine transformations of the first three coordinates of a coordinate tuple
+
+An affine transformation maps (x, y, z) to matrix @ (x, y, z) + translation, with the
+matrix represented as a tuple of 3 row tuples. Coordinate tuples of fewer than three
+dimensions are read as having zeros in the missing positions, and only their own
+dimensions are written back. Dimensions beyond the third pass through untouched.
+
+The helpers work element-wise, so the matrix elements may be plain floats as well as
+NumPy arrays of per-point values.
+"""
+
+from typing import NamedTuple
+
+IDENTITY = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+ZERO = (0.0, 0.0, 0.0)
+
+
+class Affine(NamedTuple):
+    """An affine transformation. `planar` marks those undefined for 1D data"""
+
+    matrix: tuple = IDENTITY
+    translation: tuple = ZERO
+    planar: bool = False
+
+    def then(self, other: "Affine") -> "Affine":
+        """The composition: First `self`, then `other`"""
+        m = multiply(other.matrix, self.matrix)
+        t = transform(other.matrix, self.translation)
+        return Affine(
+            m,
+            tuple(t[i] + other.translation[i] for i in range(3)),
+            self.planar or other.planar,
+        )
+
+    def inverse(self) -> "Affine":
+        m = inverse_matrix(self.matrix)
+        t = transform(m, self.translation)
+        return Affine(m, tuple(-ti for ti in t), self.planar)
+
+    def restricted(self, k: int) -> "Affine":
+        """The transformation as seen by k dimensional data, k < 3: The upper left
+        k x k block of the matrix, the first k elements of the translation, and
+        identity for the rest"""
+        m = tuple(
+            tuple(
+                self.matrix[i][j] if i < k and j < k else IDENTITY[i][j]
+                for j in range(3)
+            )
+            for i in range(3)
+        )
+        t = tuple(self.translation[i] if i < k else 0.0 for i in range(3))
+        return Affine(m, t, self.planar)
+
+    @property
+    def is_identity(self) -> bool:
+        return self.matrix == IDENTITY and self.translation == ZERO
+
+
+def multiply(a, b):
+    """The matrix product a @ b"""
+    return tuple(
+        tuple(
+            a[i][0] * b[0][j] + a[i][1] * b[1][j] + a[i][2] * b[2][j] for j in range(3)
+        )
+        for i in range(3)
+    )
+
+
+def transform(m, v):
+    """The matrix-vector product m @ v"""
+    return tuple(m[i][0] * v[0] + m[i][1] * v[1] + m[i][2] * v[2] for i in range(3))
+
+
+def inverse_matrix(m):
+    """The inverse of a 3x3 matrix, by cofactors"""
+    (a, b, c), (d, e, f), (g, h, i) = m
+    A, B, C = e * i - f * h, f * g - d * i, d * h - e * g
+    det = a * A + b * B + c * C
+    return (
+        (A / det, (c * h - b * i) / det, (b * f - c * e) / det),
+        (B / det, (a * i - c * g) / det, (c * d - a * f) / det),
+        (C / det, (b * g - a * h) / det, (a * e - b * d) / det),
+    )
@@ -1,20 +1,21 @@
-from .addone import addone, subone
-from .cart import cart
-from .helmert import helmert
-from .tmerc import tmerc, utm
-from .conventions import geo, gis, ne
-from .pipeline import pipeline
-from ..operator_method import OperatorMethod
+"""The builtin operator methods, imported on first use (see `pyge.registry`)"""
 
-builtin_operator_methods: dict[str, OperatorMethod] = {
-    "addone": addone,
-    "cart": cart,
-    "geo": geo,
-    "gis": gis,
-    "helmert": helmert,
-    "ne": ne,
-    "pipeline": pipeline,
-    "subone": subone,
-    "tmerc": tmerc,
-    "utm": utm,
+from ..registry import LazyRegistry, module_attributes
+
+# Method id -> (module, attribute)
+BUILTINS: dict[str, tuple[str, str]] = {
+    "addone": ("addone", "addone"),
+    "affine": ("affine", "affine"),
+    "cart": ("cart", "cart"),
+    "geo": ("conventions", "geo"),
+    "gis": ("conventions", "gis"),
+    "helmert": ("helmert", "helmert"),
+    "ne": ("conventions", "ne"),
+    "pipeline": ("pipeline", "pipeline"),
+    "subone": ("addone", "subone"),
+    "tmerc": ("tmerc", "tmerc"),
+    "unitconvert": ("unitconvert", "unitconvert"),
+    "utm": ("tmerc", "utm"),
 }
+
+builtin_operator_methods = LazyRegistry(module_attributes(__name__, BUILTINS))
@@ -28,10 +28,28 @@ def addone_inverse_function(
     return n
 
 
+def addone_forward_batch(_op: Operator, _ctx: Context, columns: list) -> int:
+    columns[0] += 1
+    return len(columns[0])
+
+
+def addone_inverse_batch(_op: Operator, _ctx: Context, columns: list) -> int:
+    columns[0] -= 1
+    return len(columns[0])
+
+
 addone = OperatorMethod(
-    id="addone", fwd=addone_forward_function, inv=addone_inverse_function
+    id="addone",
+    fwd=addone_forward_function,
+    inv=addone_inverse_function,
+    fwd_batch=addone_forward_batch,
+    inv_batch=addone_inverse_batch,
 )
 
 subone = OperatorMethod(
-    id="subone", inv=addone_forward_function, fwd=addone_inverse_function
+    id="subone",
+    inv=addone_forward_function,
+    fwd=addone_inverse_function,
+    inv_batch=addone_forward_batch,
+    fwd_batch=addone_inverse_batch,
 )
@@ -0,0 +1,120 @@
+"""The general affine operator method
+
+Mostly for use by the pipeline optimizer, which merges runs of consecutive affine
+steps (helmert, geo, gis, ne, ...) into one affine step.
+
+Parameters:
+
+- `matrix=a,b,c,d,e,f,g,h,i`: The 3x3 matrix, row by row. Default: Identity
+- `translation=x,y,z`: The translation, applied after the matrix. Default: Zero
+- `matrix_2d=a,b,c,d` and `translation_2d=x,y`: The transformation to use for
+  2D coordinate tuples, if different from the upper left part of the 3D case
+- `matrix_1d=a` and `translation_1d=x`: Ditto for 1D coordinate tuples
+- `planar`: Flag, indicating that the operator is undefined for 1D data
+"""
+
+from ..affine import IDENTITY, Affine
+from ..context import Context
+from ..coordinateset import CoordinateSet
+from ..operator import Operator
+from ..operator_method import OperatorMethod
+from .helmert import transform_columns, transform_operands
+
+
+def _select(op: Operator, dim: int, inverse: bool) -> Affine:
+    if dim < 2 and op.prepared["planar"]:
+        raise ValueError("affine: Cannot handle 1D data")
+    affine = op.prepared["inverse" if inverse else "affine"][min(dim, 3)]
+    if affine is None:
+        raise ValueError(f"affine: Not invertible for {dim}D data")
+    return affine
+
+
+def affine_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return transform_operands(operands, _select(op, operands.dim(), False))
+
+
+def affine_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return transform_operands(operands, _select(op, operands.dim(), True))
+
+
+def affine_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return transform_columns(columns, _select(op, len(columns), False))
+
+
+def affine_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return transform_columns(columns, _select(op, len(columns), True))
+
+
+def affine_affine(op: Operator) -> Affine | None:
+    # Only mergeable if the low dimensional cases are not special cased
+    if op.prepared["special_cased"]:
+        return None
+    return op.prepared["affine"][3]
+
+
+def _inverse(affine: Affine) -> Affine | None:
+    try:
+        return affine.inverse()
+    except ZeroDivisionError:
+        return None
+
+
+def affine_prepare(parameters: dict[str, str]) -> dict:
+    def floats(param: str, mask):
+        return OperatorMethod.parameter_as_floats(parameters, param, mask)
+
+    def affine(k: int, suffix: str, default: Affine) -> Affine:
+        m = floats(
+            f"matrix{suffix}",
+            [default.matrix[i][j] for i in range(k) for j in range(k)],
+        )
+        t = floats(f"translation{suffix}", default.translation[0:k])
+        if len(m) != k * k or len(t) != k:
+            raise ValueError(f"affine: Expected {k * k} + {k} parameters{suffix}")
+        return Affine(
+            tuple(
+                tuple(
+                    m[i * k + j] if i < k and j < k else IDENTITY[i][j]
+                    for j in range(3)
+                )
+                for i in range(3)
+            ),
+            tuple(t[i] if i < k else 0.0 for i in range(3)),
+            "planar" in parameters,
+        )
+
+    full = affine(3, "", Affine())
+    by_dim = {3: full}
+    inverse = {3: _inverse(full)}
+
+    # Like the other affine operators, lower dimensional data see the restriction
+    # of the 3D transformation, in both directions, unless explicitly special cased
+    special_cased = False
+    for k in (2, 1):
+        suffix = f"_{k}d"
+        if f"matrix{suffix}" in parameters or f"translation{suffix}" in parameters:
+            special_cased = True
+            by_dim[k] = affine(k, suffix, full.restricted(k))
+            inverse[k] = _inverse(by_dim[k])
+        else:
+            by_dim[k] = full.restricted(k)
+            inverse[k] = None if inverse[3] is None else inverse[3].restricted(k)
+
+    prepared = {}
+    prepared["affine"] = by_dim
+    prepared["inverse"] = inverse
+    prepared["planar"] = "planar" in parameters
+    prepared["special_cased"] = special_cased
+    return prepared
+
+
+affine = OperatorMethod(
+    id="affine",
+    fwd=affine_forward,
+    inv=affine_inverse,
+    prep=affine_prepare,
+    fwd_batch=affine_forward_batch,
+    inv_batch=affine_inverse_batch,
+    affine=affine_affine,
+)
@@ -4,6 +4,7 @@ from ..context import Context
 from ..coordinateset import CoordinateSet
 from ..operator_method import OperatorMethod
 from ..operator import Operator
+from .._numpy import np
 from ..ellipsoid import Ellipsoid
 from math import nan, hypot, atan2, sqrt
 
@@ -12,10 +13,10 @@ def cart_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     if operands.dim() < 2:
         raise ValueError("cart: Cannot map 1D data")
 
-    ellps = Ellipsoid.named(op.parameters.get("ellps", "GRS80"))
+    ellps = op.prepared["ellps"]
 
     for i in range(len(operands)):
-        longitude, latitude, height = operands.promoted(i, (nan, nan, 0))
+        longitude, latitude, height = operands.promoted(i, (nan, nan, 0))[0:3]
         operands[i] = ellps.cartesian(longitude, latitude, height)
     return len(operands)
 
@@ -24,14 +25,13 @@ def cart_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     if operands.dim() < 2:
         raise ValueError("cart: Cannot map 1D data")
 
-    ellps = Ellipsoid.named(op.parameters.get("ellps", "GRS80"))
+    ellps = op.prepared["ellps"]
     two_dimensional = operands.dim() == 2
     south = op.prepared["south"]
-    a = ellps.semimajor_axis()
-    f = ellps.flattening()
+    a, f = ellps.a, ellps.f
 
     for i in range(len(operands)):
-        x, y, z = operands.promoted(i, (nan, nan, 0))
+        x, y, z = operands.promoted(i, (nan, nan, 0))[0:3]
         if two_dimensional:
             longitude = atan2(y, x)
             p = hypot(x, y)
@@ -64,8 +64,60 @@ def cart_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     return len(operands)
 
 
+# The array-at-a-time version of `cart_forward`
+def cart_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    if len(columns) < 2:
+        raise ValueError("cart: Cannot map 1D data")
+
+    ellps = op.prepared["ellps"]
+    height = _heights(columns)
+
+    X, Y, Z = ellps.cartesian_array(columns[0], columns[1], height)
+    columns[0][...] = X
+    columns[1][...] = Y
+    if len(columns) > 2:
+        columns[2][...] = Z
+    return len(columns[0])
+
+
+# The array-at-a-time version of `cart_inverse`
+def cart_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    if len(columns) < 2:
+        raise ValueError("cart: Cannot map 1D data")
+
+    ellps = op.prepared["ellps"]
+    x, y = columns[0], columns[1]
+
+    if len(columns) == 2:
+        # The reduced latitude trick, as explained in `cart_inverse`
+        a, f = ellps.a, ellps.f
+        longitude = np.arctan2(y, x)
+        p = np.hypot(x, y)
+        cos_reduced_latitude = p / a
+        sin_reduced_latitude = np.sqrt(1.0 - cos_reduced_latitude**2.0)
+        latitude = np.arctan2(a * sin_reduced_latitude, (1 - f) * p)
+        if op.prepared["south"]:
+            latitude = -latitude
+    else:
+        longitude, latitude, height = ellps.geographic_array(x, y, _heights(columns))
+        columns[2][...] = height
+
+    columns[0][...] = longitude
+    columns[1][...] = latitude
+    return len(columns[0])
+
+
+# The third column, with NaNs (and a missing column) read as zero, mimicking
+# the (nan, nan, 0) promotion mask of the scalar functions
+def _heights(columns: list):
+    if len(columns) < 3:
+        return 0.0
+    return np.where(np.isnan(columns[2]), 0.0, columns[2])
+
+
 def cart_prepare(parameters: dict[str, str]) -> dict[str, (float)]:
     prepared = {}
+    prepared["ellps"] = Ellipsoid.named(parameters.get("ellps", "GRS80"))
     prepared["south"] = "south" in parameters
     return prepared
 
@@ -75,4 +127,6 @@ cart = OperatorMethod(
     fwd=cart_forward,
     inv=cart_inverse,
     prep=cart_prepare,
+    fwd_batch=cart_forward_batch,
+    inv_batch=cart_inverse_batch,
 )
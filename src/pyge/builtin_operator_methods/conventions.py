@@ -1,10 +1,51 @@
 """Handle different input/output axis order and unit conventions"""
 
+from ..affine import Affine
 from ..context import Context
 from ..coordinateset import CoordinateSet
 from ..operator_method import OperatorMethod
 from ..operator import Operator
-from math import radians, degrees
+from .._numpy import np
+from math import radians, degrees, pi
+
+DEG = pi / 180.0
+RAD = 180.0 / pi
+
+# The batch kernels swap axes through a scratch buffer of at most this many elements,
+# small enough to stay in cache, rather than through a full size temporary copy
+SCRATCH_SIZE = 32768
+
+
+# Batch kernel helper: Swap the first two columns, scaling them by `factor` on the way.
+# We do not swap the column views themselves, since the operands are typically views
+# into the caller's array, which would then be left with permuted axes
+def _swap(columns: list, factor: float, name: str) -> int:
+    if len(columns) < 2:
+        raise ValueError(f"{name}: Cannot handle 1D data")
+    a, b = columns[0], columns[1]
+    n = len(a)
+    scratch = np.empty(min(n, SCRATCH_SIZE))
+    for start in range(0, n, SCRATCH_SIZE):
+        end = min(start + SCRATCH_SIZE, n)
+        t = scratch[0 : end - start]
+        if factor == 1.0:
+            t[...] = a[start:end]
+            a[start:end] = b[start:end]
+            b[start:end] = t
+        else:
+            np.multiply(a[start:end], factor, out=t)
+            np.multiply(b[start:end], factor, out=a[start:end])
+            b[start:end] = t
+    return n
+
+
+# Batch kernel helper: Scale the first two columns in place
+def _scale(columns: list, factor: float, name: str) -> int:
+    if len(columns) < 2:
+        raise ValueError(f"{name}: Cannot handle 1D data")
+    columns[0] *= factor
+    columns[1] *= factor
+    return len(columns[0])
 
 
 # Geo: (Latitude, Longitude) in degrees to (Longitude, Latitude) in radians
@@ -45,16 +86,47 @@ def gis_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     return len(operands)
 
 
+def geo_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _swap(columns, DEG, "geo")
+
+
+def geo_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _swap(columns, RAD, "geo")
+
+
+def gis_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _scale(columns, DEG, "gis")
+
+
+def gis_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _scale(columns, RAD, "gis")
+
+
+# The affine representations, for the pipeline optimizer
+def geo_affine(op: Operator) -> Affine:
+    return Affine(((0.0, DEG, 0.0), (DEG, 0.0, 0.0), (0.0, 0.0, 1.0)), planar=True)
+
+
+def gis_affine(op: Operator) -> Affine:
+    return Affine(((DEG, 0.0, 0.0), (0.0, DEG, 0.0), (0.0, 0.0, 1.0)), planar=True)
+
+
 geo = OperatorMethod(
     id="geo",
     fwd=geo_forward,
     inv=geo_inverse,
+    fwd_batch=geo_forward_batch,
+    inv_batch=geo_inverse_batch,
+    affine=geo_affine,
 )
 
 gis = OperatorMethod(
     id="gis",
     fwd=gis_forward,
     inv=gis_inverse,
+    fwd_batch=gis_forward_batch,
+    inv_batch=gis_inverse_batch,
+    affine=gis_affine,
 )
 
 
@@ -68,9 +140,20 @@ def ne_both(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     return len(operands)
 
 
+def ne_both_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _swap(columns, 1.0, "ne")
+
+
+def ne_affine(op: Operator) -> Affine:
+    return Affine(((0.0, 1.0, 0.0), (1.0, 0.0, 0.0), (0.0, 0.0, 1.0)), planar=True)
+
+
 # Note: ne is an involution - its inverse is identical to itself
 ne = OperatorMethod(
     id="ne",
     fwd=ne_both,
     inv=ne_both,
+    fwd_batch=ne_both_batch,
+    inv_batch=ne_both_batch,
+    affine=ne_affine,
 )
@@ -1,33 +1,252 @@
-"""The 3-parameter Helmert operator methods"""
+"""The Helmert operator methods: 3, 7 and 14 parameters
 
+Parameters:
+
+- `translation=x,y,z`: Translation, in meters
+- `rotation=rx,ry,rz`: Rotation, in arc seconds
+- `scale=s`: Scale, in ppm
+- `dtranslation`, `drotation`, `dscale`: Rates of change of the above, per year
+- `t_epoch`: Reference epoch of the parameters, in decimal years.
+  Required when any of the rates are given
+- `t_obs`: Observation epoch, in decimal years. If given, it is used for all
+  coordinates. Otherwise, the time is taken from the 4th coordinate, and a
+  missing (NaN) or absent time coordinate is read as `t_epoch`
+- `convention=position_vector` or `convention=coordinate_frame`: The
+  interpretation of the rotation. Required when rotations are given
+- `exact`: Use the exact rotation matrix, rather than the small angle approximation
+"""
+
+import math
+from math import isnan, pi
+
+from ..affine import IDENTITY, Affine, transform
 from ..context import Context
 from ..coordinateset import CoordinateSet
 from ..operator_method import OperatorMethod
 from ..operator import Operator
+from .._numpy import np
 
+ARCSEC = pi / 648_000
 
-def helmert_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
-    xyz = op.parameter_as_floats("translation", (0, 0, 0))
 
-    dimensions_affected = tuple(range(min(operands.dim(), len(xyz))))
+# The combined rotation and scaling matrix, (1 + s) R. The entries are plain floats,
+# or - for time dependent transformations in the batch kernels - NumPy arrays, with
+# `trig` providing the sin and cos functions matching the type
+def helmert_matrix(rotation, scale, exact: bool, position_vector: bool, trig=math):
+    rx, ry, rz = (r * ARCSEC for r in rotation)
+    k = 1.0 + scale * 1e-6
+
+    # Coordinate frame convention, following the PROJ implementation
+    if exact:
+        cx, sx = trig.cos(rx), trig.sin(rx)
+        cy, sy = trig.cos(ry), trig.sin(ry)
+        cz, sz = trig.cos(rz), trig.sin(rz)
+        r = (
+            (cy * cz, cx * sz + sx * sy * cz, sx * sz - cx * sy * cz),
+            (-cy * sz, cx * cz - sx * sy * sz, sx * cz + cx * sy * sz),
+            (sy, -sx * cy, cx * cy),
+        )
+    else:
+        r = ((1.0, rz, -ry), (-rz, 1.0, rx), (ry, -rx, 1.0))
+
+    # The position vector convention rotates the opposite way
+    if position_vector:
+        r = tuple(zip(*r))
+    return tuple(tuple(k * rij for rij in row) for row in r)
+
+
+# The transformation at the epoch t
+def _at_epoch(prepared: dict, t: float, trig=math) -> Affine:
+    dt = t - prepared["t_epoch"]
+    translation, rotation, scale = prepared["parameters"]
+    dtranslation, drotation, dscale = prepared["rates"]
+    m = helmert_matrix(
+        [r + dr * dt for r, dr in zip(rotation, drotation)],
+        scale + dscale * dt,
+        prepared["exact"],
+        prepared["position_vector"],
+        trig,
+    )
+    return Affine(m, tuple(x + dx * dt for x, dx in zip(translation, dtranslation)))
+
+
+# Apply an affine transformation to each coordinate tuple of the operands
+def transform_operands(operands: CoordinateSet, affine: Affine) -> int:
+    k = min(operands.dim(), 3)
+    m, t = affine.matrix, affine.translation
+
+    # The plain 3 parameter case: Translation only
+    if m == IDENTITY:
+        for i, operand in enumerate(operands):
+            operands[i] = tuple(operand[j] + t[j] for j in range(k))
+        return len(operands)
+
+    terms = _terms(m, k)
+    if all(len(row) == k for row in terms):
+        for i, operand in enumerate(operands):
+            x, y, z = (*operand[0:k], 0.0, 0.0)[0:3]
+            operands[i] = tuple(
+                m[j][0] * x + m[j][1] * y + m[j][2] * z + t[j] for j in range(k)
+            )
+        return len(operands)
+
     for i, operand in enumerate(operands):
-        operands[i] = tuple(operand[j] + xyz[j] for j in dimensions_affected)
+        result = []
+        for j, row in enumerate(terms):
+            value = 0.0
+            for column, coefficient in row:
+                value += coefficient * operand[column]
+            result.append(value + t[j])
+        operands[i] = result
     return len(operands)
 
 
-def helmert_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
-    xyz = op.parameter_as_floats("translation", (0, 0, 0))
+# The nonzero terms of the first k rows of the matrix `m`, as (column, coefficient)
+# pairs. Zero terms are skipped by the kernels, rather than multiplied, so a NaN
+# element does not spread to elements not depending on it, e.g. a NaN height to
+# the horizontal coordinates, when `m` swaps or scales axes
+def _terms(m, k: int) -> list[list[tuple[int, float]]]:
+    return [[(i, m[j][i]) for i in range(k) if m[j][i] != 0.0] for j in range(k)]
+
+
+# The array-at-a-time version of `transform_operands`: All points are transformed
+# in one matrix multiplication, or term by term, if the matrix has zero terms. The
+# affine may also hold per-point arrays, rather than plain floats, in which case we
+# multiply element-wise
+def transform_columns(columns: list, affine: Affine) -> int:
+    n = len(columns[0])
+    k = min(len(columns), 3)
+    m, t = affine.matrix, affine.translation
+    per_point = not isinstance(m[0][0], float)
+
+    # The plain 3 parameter case: Translation only
+    if not per_point and m == IDENTITY:
+        for j in range(k):
+            columns[j] += t[j]
+        return n
+
+    terms = None if per_point else _terms(m, k)
+    if terms is None or all(len(row) == k for row in terms):
+        xyz = np.zeros((3, n))
+        for j in range(k):
+            xyz[j] = columns[j]
+        xyz = transform(m, xyz) if per_point else np.array(m) @ xyz
+    else:
+        xyz = []
+        for row in terms:
+            result = np.zeros(n)
+            for column, coefficient in row:
+                result += coefficient * columns[column]
+            xyz.append(result)
+
+    for j in range(k):
+        columns[j][...] = xyz[j] + t[j]
+    return n
+
+
+def _helmert(op: Operator, operands: CoordinateSet, inverse: bool) -> int:
+    prepared = op.prepared
+    if not (prepared["time_dependent"] and operands.dim() > 3):
+        return transform_operands(
+            operands, prepared["inverse" if inverse else "affine"]
+        )
 
-    dimensions_affected = tuple(range(min(operands.dim(), len(xyz))))
+    # For time dependent transformations, the parameters may change from point
+    # to point. But typically they don't, so we only recompute on change
+    epoch = prepared["t_epoch"]
+    affine = prepared["inverse" if inverse else "affine"]
     for i, operand in enumerate(operands):
-        operands[i] = tuple(operand[j] - xyz[j] for j in dimensions_affected)
+        t = prepared["t_epoch"] if isnan(operand[3]) else operand[3]
+        if t != epoch:
+            epoch = t
+            affine = _at_epoch(prepared, t)
+            if inverse:
+                affine = affine.inverse()
+        m, tr = affine.matrix, affine.translation
+        x, y, z = operand[0:3]
+        operands[i] = tuple(
+            m[j][0] * x + m[j][1] * y + m[j][2] * z + tr[j] for j in range(3)
+        )
     return len(operands)
 
 
+def helmert_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return _helmert(op, operands, inverse=False)
+
+
+def helmert_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return _helmert(op, operands, inverse=True)
+
+
+# The array-at-a-time version of `_helmert`
+def _helmert_batch(op: Operator, columns: list, inverse: bool) -> int:
+    prepared = op.prepared
+    if not (prepared["time_dependent"] and len(columns) > 3):
+        return transform_columns(columns, prepared["inverse" if inverse else "affine"])
+
+    # Time dependent: Each point has its own matrix, so we build the
+    # transformation from arrays of per-point matrix elements
+    t = np.where(np.isnan(columns[3]), prepared["t_epoch"], columns[3])
+    affine = _at_epoch(prepared, t, trig=np)
+    if inverse:
+        affine = affine.inverse()
+    return transform_columns(columns, affine)
+
+
+def helmert_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _helmert_batch(op, columns, inverse=False)
+
+
+def helmert_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _helmert_batch(op, columns, inverse=True)
+
+
+# The affine representation of a static helmert, for the pipeline optimizer
+def helmert_affine(op: Operator) -> Affine | None:
+    if op.prepared["time_dependent"]:
+        return None
+    return op.prepared["affine"]
+
+
 def helmert_prepare(parameters: dict[str, str]) -> dict[str, (float)]:
-    xyz = OperatorMethod.parameter_as_floats(parameters, "translation", (0, 0, 0))
+    def floats(param: str, mask):
+        return OperatorMethod.parameter_as_floats(parameters, param, mask)
+
+    translation = floats("translation", (0, 0, 0))
+    rotation = floats("rotation", (0, 0, 0))
+    scale = floats("scale", (0,))[0]
+    dtranslation = floats("dtranslation", (0, 0, 0))
+    drotation = floats("drotation", (0, 0, 0))
+    dscale = floats("dscale", (0,))[0]
+
+    rotates = any(rotation) or any(drotation)
+    convention = parameters.get("convention", "")
+    if convention not in ("position_vector", "coordinate_frame", ""):
+        raise ValueError(f"helmert: Unknown convention '{convention}'")
+    if rotates and convention == "":
+        raise ValueError("helmert: Rotations require a convention")
+
+    time_varying = any(dtranslation) or any(drotation) or dscale != 0
+    if time_varying and "t_epoch" not in parameters:
+        raise ValueError("helmert: Rates of change require a t_epoch")
+
     prepared = {}
-    prepared["translation"] = xyz
+    prepared["parameters"] = (translation, rotation, scale)
+    prepared["rates"] = (dtranslation, drotation, dscale)
+    prepared["t_epoch"] = floats("t_epoch", (0,))[0]
+    prepared["exact"] = "exact" in parameters
+    prepared["position_vector"] = convention == "position_vector"
+
+    # The parameters are constant if they do not vary, or if the observation
+    # epoch is fixed. In that case, we can resolve the matrices once and for all.
+    # Otherwise, they are resolved at the reference epoch, but recomputed
+    # for each point having a time coordinate
+    prepared["time_dependent"] = time_varying and "t_obs" not in parameters
+    t = floats("t_obs", (prepared["t_epoch"],))[0]
+    affine = _at_epoch(prepared, t)
+    prepared["affine"] = affine
+    prepared["inverse"] = affine.inverse()
+    prepared["translation"] = affine.translation
     return prepared
 
 
@@ -36,4 +255,7 @@ helmert = OperatorMethod(
     fwd=helmert_forward,
     inv=helmert_inverse,
     prep=helmert_prepare,
+    fwd_batch=helmert_forward_batch,
+    inv_batch=helmert_inverse_batch,
+    affine=helmert_affine,
 )
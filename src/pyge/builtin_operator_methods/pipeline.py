@@ -10,10 +10,14 @@ def pipeline_forward_function(
     op: Operator, ctx: Context, operands: CoordinateSet
 ) -> int:
     n = len(operands)
-    for step in op.steps:
-        if step.omit_forward:
-            continue
-        m = step.fwd(ctx, operands)
+    profiler = ctx.profiler
+    if profiler is None:
+        for step in op.plan.forward_steps:
+            m = step(ctx, operands)
+            n = min(n, m)
+        return n
+    for label, step in zip(op.plan.forward_labels, op.plan.forward_steps):
+        m = profiler.run(label, step, ctx, operands)
         n = min(n, m)
     return n
 
@@ -22,10 +26,14 @@ def pipeline_inverse_function(
     op: Operator, ctx: Context, operands: CoordinateSet
 ) -> int:
     n = len(operands)
-    for step in reversed(op.steps):
-        if step.omit_inverse:
-            continue
-        m = step.inv(ctx, operands)
+    profiler = ctx.profiler
+    if profiler is None:
+        for step in op.plan.inverse_steps:
+            m = step(ctx, operands)
+            n = min(n, m)
+        return n
+    for label, step in zip(op.plan.inverse_labels, op.plan.inverse_steps):
+        m = profiler.run(label, step, ctx, operands)
         n = min(n, m)
     return n
 
@@ -6,9 +6,10 @@ from ..context import Context
 from ..coordinateset import CoordinateSet
 from ..operator_method import OperatorMethod
 from ..operator import Operator
+from .._numpy import np
 from ..ellipsoid import Ellipsoid
 from typing import Any
-from math import sin, sinh, cos, radians, atan2, atan, atanh, nan
+from math import sin, sinh, cos, radians, atan2, atan, atanh, isnan
 
 
 # Forward transverse mercator, following Bowring (1989)
@@ -16,15 +17,16 @@ def tmerc_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     if operands.dim() < 2:
         raise ValueError("tmerc: Cannot project 1D data")
 
-    ellps = Ellipsoid.named(op.parameters.get("ellps", "GRS80"))
-    eps = ellps.second_eccentricity_squared()
+    ellps = op.prepared["ellps"]
+    eps = ellps.eps
 
-    x_0, y_0, lon_0, lat_0 = op.prepared["offsets"]
+    x_0, y_0, lon_0, _ = op.prepared["offsets"]
     k_0 = op.prepared["k_0"]
+    m_0 = op.prepared["m_0"]
 
     successes = 0
     for i, operand in enumerate(operands):
-        lat = operand[1] + lat_0
+        lat = operand[1]
         s = sin(lat)
         c = cos(lat)
         cc = c * c
@@ -51,31 +53,77 @@ def tmerc_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
         znos4 = z * N * dlon * s / 4.0
         ecc = 4.0 * eps * cc
         northing = y_0 + k_0 * (
-            m + N * theta_2 + znos4 * (9.0 + ecc + oo * (20.0 * cc - 11.0))
+            m - m_0 + N * theta_2 + znos4 * (9.0 + ecc + oo * (20.0 * cc - 11.0))
         )
         operands[i] = (easting, northing)
-        if (easting is not nan) and (northing is not nan):
+        if not (isnan(easting) or isnan(northing)):
             successes += 1
 
     return successes
 
 
+# The array-at-a-time version of `tmerc_forward`
+def tmerc_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    if len(columns) < 2:
+        raise ValueError("tmerc: Cannot project 1D data")
+
+    ellps = op.prepared["ellps"]
+    eps = ellps.eps
+
+    x_0, y_0, lon_0, _ = op.prepared["offsets"]
+    k_0 = op.prepared["k_0"]
+    m_0 = op.prepared["m_0"]
+
+    lat = columns[1]
+    s = np.sin(lat)
+    c = np.cos(lat)
+    cc = c * c
+    ss = s * s
+
+    dlon = columns[0] - lon_0
+    oo = dlon * dlon
+
+    N = ellps.prime_vertical_radius_of_curvature_array(lat)
+    z = eps * dlon**3 * c**5 / 6.0
+    sd2 = np.sin(dlon / 2.0)
+    theta_2 = np.arctan2(2.0 * s * c * sd2 * sd2, ss + cc * np.cos(dlon))
+
+    # Easting
+    sd = np.sin(dlon)
+    easting = x_0 + k_0 * N * (
+        np.arctanh(c * sd) + z * (1.0 + oo * (36.0 * cc - 29.0) / 10.0)
+    )
+
+    # Northing
+    m = ellps.meridian_latitude_to_distance_array(lat)
+    znos4 = z * N * dlon * s / 4.0
+    ecc = 4.0 * eps * cc
+    northing = y_0 + k_0 * (
+        m - m_0 + N * theta_2 + znos4 * (9.0 + ecc + oo * (20.0 * cc - 11.0))
+    )
+
+    columns[0][...] = easting
+    columns[1][...] = northing
+    return int(np.count_nonzero(np.isfinite(easting) & np.isfinite(northing)))
+
+
 # Inverse transverse mercator, following Bowring (1989)
 def tmerc_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
     if operands.dim() < 2:
         raise ValueError("tmerc: Cannot project 1D data")
 
-    ellps = Ellipsoid.named(op.parameters.get("ellps", "GRS80"))
-    eps = ellps.second_eccentricity_squared()
+    ellps = op.prepared["ellps"]
+    eps = ellps.eps
 
-    x_0, y_0, lon_0, lat_0 = op.prepared["offsets"]
+    x_0, y_0, lon_0, _ = op.prepared["offsets"]
     k_0 = op.prepared["k_0"]
+    m_0 = op.prepared["m_0"]
 
     successes = 0
     for i, operand in enumerate(operands):
         # Footpoint latitude, i.e. the latitude of a point on the central meridian
         # having the same northing as the point of interest
-        lat = ellps.meridian_distance_to_latitude((operand[1] - y_0) / k_0)
+        lat = ellps.meridian_distance_to_latitude((operand[1] - y_0) / k_0 + m_0)
         N = ellps.prime_vertical_radius_of_curvature(lat)
         s = sin(lat)
         c = cos(lat)
@@ -89,11 +137,7 @@ def tmerc_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
 
         # Latitude
         xet = xx * xx * eps * t / 24.0
-        lat = (
-            lat_0
-            + (1.0 + cc * eps) * (theta_5 - xet * (9.0 - 10.0 * cc))
-            - eps * cc * lat
-        )
+        lat = (1.0 + cc * eps) * (theta_5 - xet * (9.0 - 10.0 * cc)) - eps * cc * lat
 
         # Longitude
         approx = lon_0 + theta_4
@@ -101,16 +145,54 @@ def tmerc_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
         lon = approx - coef * (10.0 - 4.0 * xx / cc + xx * cc)
 
         operands[i] = (lon, lat)
-        if (lon is not nan) and (lat is not nan):
+        if not (isnan(lon) or isnan(lat)):
             successes += 1
 
     return successes
 
 
+# The array-at-a-time version of `tmerc_inverse`
+def tmerc_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    if len(columns) < 2:
+        raise ValueError("tmerc: Cannot project 1D data")
+
+    ellps = op.prepared["ellps"]
+    eps = ellps.eps
+
+    x_0, y_0, lon_0, _ = op.prepared["offsets"]
+    k_0 = op.prepared["k_0"]
+    m_0 = op.prepared["m_0"]
+
+    # Footpoint latitude
+    lat = ellps.meridian_distance_to_latitude_array((columns[1] - y_0) / k_0 + m_0)
+    N = ellps.prime_vertical_radius_of_curvature_array(lat)
+    s = np.sin(lat)
+    c = np.cos(lat)
+    t = s / c
+    cc = c * c
+
+    x = (columns[0] - x_0) / (k_0 * N)
+    xx = x * x
+    theta_4 = np.arctan2(np.sinh(x), c)
+    theta_5 = np.arctan(t * np.cos(theta_4))
+
+    # Latitude
+    xet = xx * xx * eps * t / 24.0
+    lat = (1.0 + cc * eps) * (theta_5 - xet * (9.0 - 10.0 * cc)) - eps * cc * lat
+
+    # Longitude
+    approx = lon_0 + theta_4
+    coef = eps / 60.0 * xx * x * c
+    lon = approx - coef * (10.0 - 4.0 * xx / cc + xx * cc)
+
+    columns[0][...] = lon
+    columns[1][...] = lat
+    return int(np.count_nonzero(np.isfinite(lon) & np.isfinite(lat)))
+
+
 def tmerc_prepare(parameters: dict[str, str]) -> dict[str, (float)]:
     prepared = {}
-    ellps = Ellipsoid.named(parameters.get("ellps", "GRS80"))
-    prepared["ellps"] = (ellps.a, ellps.f)
+    prepared["ellps"] = Ellipsoid.named(parameters.get("ellps", "GRS80"))
     prepared["offsets"] = (
         OperatorMethod.parameter_as_floats(parameters, "x_0", (0,))[0],
         OperatorMethod.parameter_as_floats(parameters, "y_0", (0,))[0],
@@ -119,6 +201,11 @@ def tmerc_prepare(parameters: dict[str, str]) -> dict[str, (float)]:
     )
     prepared["k_0"] = OperatorMethod.parameter_as_floats(parameters, "k_0", (1,))[0]
 
+    # The northing is counted from the base parallel, lat_0, so we need its
+    # meridional distance from the equator
+    lat_0 = prepared["offsets"][3]
+    prepared["m_0"] = prepared["ellps"].meridian_latitude_to_distance(lat_0)
+
     return prepared
 
 
@@ -127,6 +214,8 @@ tmerc = OperatorMethod(
     fwd=tmerc_forward,
     inv=tmerc_inverse,
     prep=tmerc_prepare,
+    fwd_batch=tmerc_forward_batch,
+    inv_batch=tmerc_inverse_batch,
 )
 
 
@@ -154,6 +243,15 @@ def utm_prepare(parameters: dict[str, str]) -> dict[str, Any]:
     else:
         prepared["y_0"] = 0.0
 
+    # The tmerc functions expect the offsets in the tmerc_prepare format
+    prepared["offsets"] = (
+        prepared["x_0"],
+        prepared["y_0"],
+        radians(prepared["lon_0"]),
+        radians(prepared["lat_0"]),
+    )
+    prepared["m_0"] = 0.0
+
     return prepared
 
 
@@ -162,4 +260,6 @@ utm = OperatorMethod(
     fwd=tmerc_forward,
     inv=tmerc_inverse,
     prep=utm_prepare,
+    fwd_batch=tmerc_forward_batch,
+    inv_batch=tmerc_inverse_batch,
 )
@@ -0,0 +1,106 @@
+"""The unitconvert operator method: Conversion between the units of `pyge.units.UNITS`
+
+Parameters:
+
+- `xy_in=unit`, `xy_out=unit`: Units of the first two coordinates
+- `z_in=unit`, `z_out=unit`: Unit of the third coordinate
+- `t_in=unit`, `t_out=unit`: Unit of the fourth coordinate
+
+An omitted input or output unit defaults to its counterpart, so columns not mentioned
+are left as they are. Each column is converted by one scale and offset, so the
+pipeline optimizer can merge the conversion with neighbouring affine steps, e.g.
+`unitconvert xy_in=gon xy_out=deg | geo` into a single affine step.
+"""
+
+from ..affine import Affine
+from ..context import Context
+from ..coordinateset import CoordinateSet
+from ..operator import Operator
+from ..operator_method import OperatorMethod
+from ..units import conversion
+
+# The (scale, offset) pair of a column left as it is
+UNCHANGED = (1.0, 0.0)
+
+
+# Convert each coordinate tuple, touching only the columns actually converted
+def _convert_operands(operands: CoordinateSet, conversions: tuple) -> int:
+    dim = operands.dim()
+    active = [
+        (j, scale, offset)
+        for j, (scale, offset) in enumerate(conversions)
+        if j < dim and (scale, offset) != UNCHANGED
+    ]
+    if not active:
+        return len(operands)
+    for i, operand in enumerate(operands):
+        operand = list(operand)
+        for j, scale, offset in active:
+            operand[j] = operand[j] * scale + offset
+        operands[i] = operand
+    return len(operands)
+
+
+# Convert each column in place. The offset pass is skipped when there is no offset
+def _convert_columns(columns: list, conversions: tuple) -> int:
+    for column, (scale, offset) in zip(columns, conversions):
+        if scale != 1.0:
+            column *= scale
+        if offset != 0.0:
+            column += offset
+    return len(columns[0]) if columns else 0
+
+
+def unitconvert_forward(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return _convert_operands(operands, op.prepared["forward"])
+
+
+def unitconvert_inverse(op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    return _convert_operands(operands, op.prepared["inverse"])
+
+
+def unitconvert_forward_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _convert_columns(columns, op.prepared["forward"])
+
+
+def unitconvert_inverse_batch(op: Operator, _ctx: Context, columns: list) -> int:
+    return _convert_columns(columns, op.prepared["inverse"])
+
+
+def unitconvert_affine(op: Operator) -> Affine | None:
+    # The affine representation covers three dimensions, so a time conversion
+    # cannot be merged
+    (sx, ox), _, (sz, oz), t = op.prepared["forward"]
+    if t != UNCHANGED:
+        return None
+    return Affine(((sx, 0.0, 0.0), (0.0, sx, 0.0), (0.0, 0.0, sz)), (ox, ox, oz))
+
+
+def unitconvert_prepare(parameters: dict[str, str]) -> dict:
+    def column(name: str) -> tuple[float, float]:
+        source = parameters.get(f"{name}_in") or parameters.get(f"{name}_out")
+        target = parameters.get(f"{name}_out") or source
+        if source is None:
+            return UNCHANGED
+        try:
+            return conversion(source, target)
+        except ValueError as error:
+            raise ValueError(f"unitconvert: {error} ({name}_in, {name}_out)")
+
+    xy, z, t = column("xy"), column("z"), column("t")
+    forward = (xy, xy, z, t)
+    prepared = {}
+    prepared["forward"] = forward
+    prepared["inverse"] = tuple((1 / s, -o / s) for s, o in forward)
+    return prepared
+
+
+unitconvert = OperatorMethod(
+    id="unitconvert",
+    fwd=unitconvert_forward,
+    inv=unitconvert_inverse,
+    prep=unitconvert_prepare,
+    fwd_batch=unitconvert_forward_batch,
+    inv_batch=unitconvert_inverse_batch,
+    affine=unitconvert_affine,
+)
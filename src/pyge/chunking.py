@@ -0,0 +1,58 @@
+"""
+Adaptive chunk sizing for processing large coordinate sets piecemeal
+
+Small chunks waste time on per-call overhead, while large chunks spill the
+temporaries of the batch kernels out of the CPU caches (and need more memory).
+Where the sweet spot lies depends on the operator, the operands, and the machine,
+so rather than guessing, we measure: The chunk size climbs towards higher
+throughput, doubling or halving as long as that pays off, and stays put once it
+no longer makes a difference. As the sweet spot may move, e.g. when the operands
+change, it probes a step further every `PROBE_INTERVAL` chunks while staying put.
+"""
+
+from math import inf
+
+# Changes in throughput smaller than this are considered noise
+TOLERANCE = 0.05
+
+# Number of chunks without significant difference before probing again
+PROBE_INTERVAL = 16
+
+
+class AdaptiveChunkSize:
+    """Hill climbing on measured throughput, in powers of two between `minimum`
+    and `maximum`. Use `size` for the next chunk, then report back how it went,
+    using `record()`"""
+
+    def __init__(self, initial: int = 4096, minimum: int = 256, maximum: int = 1 << 20):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = min(max(initial, minimum), maximum)
+        self.factor = 2.0
+        self.rate = None
+        # Chunks since the last step
+        self.steady = 0
+
+    def record(self, n: int, seconds: float):
+        """Report that a chunk of `n` coordinate tuples took `seconds` to process"""
+        # Partial chunks, e.g. at the end of a block, tell us nothing
+        if n < self.size:
+            return
+        rate = n / seconds if seconds > 0 else inf
+
+        if self.rate is not None:
+            # Worse than before: Turn around
+            if rate < self.rate * (1.0 - TOLERANCE):
+                self.factor = 1.0 / self.factor
+            # No significant difference: Stay here, for a while
+            elif rate <= self.rate * (1.0 + TOLERANCE):
+                self.rate = rate
+                self.steady += 1
+                if self.steady < PROBE_INTERVAL:
+                    return
+
+        self.steady = 0
+
+        self.rate = rate
+        size = int(self.size * self.factor)
+        self.size = min(max(size, self.minimum), self.maximum)
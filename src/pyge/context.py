@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
 
 from .coordinateset import CoordinateSet
 from .operator_method import OperatorMethod
@@ -38,6 +39,9 @@ class Context(ABC):
     world (i.e. resources like grids, transformation definitions,
     or ellipsoid parameters)."""
 
+    # The `pyge.profiling.Profiler` recording statistics for `stats()`, if any
+    profiler = None
+
     @abstractmethod
     def __init__(self): ...
 
@@ -61,9 +65,56 @@ class Context(ABC):
         """Instantiate the operator given by `definition`"""
         ...
 
+    @abstractmethod
+    def release(self, op: OpHandle):
+        """Give back a reference to `op`, obtained from `op()`. The handle may be
+        invalid afterwards"""
+        ...
+
     @abstractmethod
     def apply(
         self, op: OpHandle, direction: OpDirection, operands: CoordinateSet
     ) -> int:
         """Apply operator `op` to `operands` in direction `FWD` or `INV`"""
         ...
+
+    @abstractmethod
+    async def op_async(self, definition: str) -> OpHandle | None:
+        """Instantiate the operator given by `definition`, without blocking the
+        event loop"""
+        ...
+
+    @abstractmethod
+    async def apply_async(
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        operands: CoordinateSet,
+        chunk_size: int | None = None,
+    ) -> int:
+        """Apply operator `op` to `operands` in direction `FWD` or `INV`, without
+        blocking the event loop. Large sets may be transformed in chunks of
+        `chunk_size` coordinate tuples, or an automatically determined size if
+        None, yielding to the event loop between chunks"""
+        ...
+
+    @abstractmethod
+    def apply_stream(
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        blocks: Iterable[CoordinateSet],
+        chunk_size: int | None = None,
+    ) -> Iterator[tuple[CoordinateSet, int]]:
+        """Apply operator `op` in direction `FWD` or `INV` to a stream of coordinate
+        sets, e.g. blocks read from a file too large to fit in memory. The blocks
+        are transformed in place, in chunks of `chunk_size` coordinate tuples, or
+        an automatically determined size if None, and each chunk is yielded
+        when done, along with its number of successfully transformed tuples"""
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Statistics per operator applied, and per pipeline step, as recorded by
+        the `profiler`, or empty if there is none"""
+        ...
@@ -20,7 +20,8 @@ class CoordinateSet(ABC):
 
     @abstractmethod
     def get(self, idx: int) -> list[float]:
-        """Access the `index`th coordinate tuple"""
+        """Access the `idx`th coordinate tuple. Indices out of range must raise
+        IndexError, as iteration over the set relies on it"""
         ...
 
     @abstractmethod
@@ -28,6 +29,22 @@ class CoordinateSet(ABC):
         """Overwrite the `idx`th coordinate tuple"""
         ...
 
+    def columns(self) -> list | None:
+        """Array views of the coordinate columns, one per dimension, for use by
+        batch kernels. Writes to the views must go straight to the underlying
+        storage.
+
+        Implementations without array based storage return None, which makes
+        operators fall back to the tuple-by-tuple `get`/`set` protocol.
+        """
+        return None
+
+    def slice(self, start: int, stop: int) -> "CoordinateSet":
+        """The coordinate tuples from `start` up to, but not including, `stop`, as a
+        CoordinateSet sharing storage with this one. Out of range bounds are
+        clipped, as for Python slices"""
+        return CoordinateSetSlice(self, start, stop)
+
     def promoted(
         self, idx: int, mask: list[float] | tuple[float] = [nan, nan, 0, nan]
     ) -> list[float]:
@@ -64,6 +81,44 @@ class CoordinateSet(ABC):
         return self.len()
 
 
+class CoordinateSetSlice(CoordinateSet):
+    """A contiguous range of the coordinate tuples of another CoordinateSet,
+    reading from and writing to the storage of the parent set"""
+
+    def __init__(self, parent: CoordinateSet, start: int, stop: int):
+        span = range(len(parent))[start:stop]
+        self.parent = parent
+        self.start = span.start
+        self.stop = max(span.stop, span.start)
+        self.crs_id = getattr(parent, "crs_id", "unknown")
+
+    def len(self) -> int:
+        return self.stop - self.start
+
+    def dim(self) -> int:
+        return self.parent.dim()
+
+    def get(self, idx: int) -> list[float]:
+        if not 0 <= idx < self.len():
+            raise IndexError(f"CoordinateSetSlice: Index {idx} out of range")
+        return self.parent.get(self.start + idx)
+
+    def set(self, idx: int, value: list[float] | tuple[float]):
+        if not 0 <= idx < self.len():
+            raise IndexError(f"CoordinateSetSlice: Index {idx} out of range")
+        self.parent.set(self.start + idx, value)
+
+    def columns(self) -> list | None:
+        columns = self.parent.columns()
+        if columns is None:
+            return None
+        return [column[self.start : self.stop] for column in columns]
+
+    def slice(self, start: int, stop: int) -> CoordinateSet:
+        span = range(self.start, self.stop)[start:stop]
+        return CoordinateSetSlice(self.parent, span.start, max(span.stop, span.start))
+
+
 #
 # Demo implementations
 #
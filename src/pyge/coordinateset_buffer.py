@@ -0,0 +1,124 @@
+"""
+A CoordinateSet over any object supporting the buffer protocol, such as
+`array.array("d")`, `bytearray`, `mmap` or `memoryview`.
+
+This gives compact storage, at 8 bytes per coordinate rather than the 24+ of a
+Python float in a list, without depending on NumPy. The values are float64 (or
+float32, for buffers of format "f") in native byte order, and are operated on in
+place: Nothing is copied.
+
+The layout is given by the distances (in values, not bytes) between consecutive
+coordinate tuples, and between consecutive coordinates of a tuple. By default,
+these describe a packed row-wise layout, as in `[x0, y0, x1, y1, ...]`, or, with
+`columnwise=True`, a packed column-wise layout, as in `[x0, x1, ..., y0, y1, ...]`.
+"""
+
+from .coordinateset import CoordinateSet
+
+# NumPy is optional, and only needed for the array views returned by `columns()`
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class CoordinateSetBuffer(CoordinateSet):
+    """A CoordinateSet of `n` coordinate tuples of dimension `dim`, in `buffer`.
+
+    Tuple `idx` starts at value number `offset + idx * stride`, and its coordinates
+    are `step` values apart. For the row-wise layout, `stride` defaults to `dim` and
+    `step` to 1. For the column-wise layout, `stride` defaults to 1 and `step` to
+    `n`. If `n` is not given, it is the number of tuples the buffer can hold.
+    """
+
+    def __init__(
+        self,
+        buffer,
+        dim: int,
+        n: int | None = None,
+        columnwise: bool = False,
+        stride: int | None = None,
+        step: int | None = None,
+        offset: int = 0,
+        crs_id: str = "unknown",
+    ):
+        view = memoryview(buffer)
+        format = view.format if view.format in ("d", "f") else "d"
+        if view.ndim != 1 or view.format != format:
+            try:
+                view = view.cast("B").cast(format)
+            except TypeError as error:
+                raise ValueError(f"CoordinateSetBuffer: {error}") from None
+        size = len(view) - offset
+
+        if columnwise:
+            n = size // dim if n is None else n
+            stride = 1 if stride is None else stride
+            step = n if step is None else step
+        else:
+            stride = dim if stride is None else stride
+            step = 1 if step is None else step
+            n = max(0, (size - (dim - 1) * step - 1) // stride + 1) if n is None else n
+        if n > 0 and offset + (n - 1) * stride + (dim - 1) * step >= len(view):
+            raise ValueError("CoordinateSetBuffer: Buffer too small for the layout")
+
+        self.buffer = view
+        self.n = n
+        self.dimension = dim
+        self.stride = stride
+        self.step = step
+        self.offset = offset
+        self.columnwise = columnwise
+        self.crs_id = crs_id
+
+    def len(self) -> int:
+        return self.n
+
+    def dim(self) -> int:
+        return self.dimension
+
+    def get(self, idx: int) -> list[float]:
+        if not 0 <= idx < self.n:
+            raise IndexError(f"CoordinateSetBuffer: Index {idx} out of range")
+        start = self.offset + idx * self.stride
+        stop = start + (self.dimension - 1) * self.step + 1
+        return self.buffer[start : stop : self.step].tolist()
+
+    def set(self, idx: int, value: list[float] | tuple[float]):
+        if not 0 <= idx < self.n:
+            raise IndexError(f"CoordinateSetBuffer: Index {idx} out of range")
+        start = self.offset + idx * self.stride
+        for i in range(min(self.dimension, len(value))):
+            self.buffer[start + i * self.step] = float(value[i])
+
+    def columns(self) -> list | None:
+        """Strided views (not copies) of the coordinate columns of the buffer"""
+        if np is None:
+            return None
+        values = np.frombuffer(self.buffer, dtype=self.buffer.format)
+        columns = []
+        for i in range(self.dimension):
+            start = self.offset + i * self.step
+            stop = start + (self.n - 1) * self.stride + 1 if self.n else start
+            columns.append(values[start : stop : self.stride])
+        return columns
+
+    def slice(self, start: int, stop: int) -> "CoordinateSetBuffer":
+        """The coordinate tuples from `start` up to, but not including, `stop`, as a
+        CoordinateSetBuffer over the same buffer"""
+        start, stop, _ = slice(start, stop).indices(self.n)
+        return CoordinateSetBuffer(
+            self.buffer,
+            self.dimension,
+            max(0, stop - start),
+            self.columnwise,
+            self.stride,
+            self.step,
+            self.offset + start * self.stride,
+            self.crs_id,
+        )
+
+    def release(self):
+        """Release the view of the underlying buffer, which may then be resized or
+        closed. The set is unusable afterwards"""
+        self.buffer.release()
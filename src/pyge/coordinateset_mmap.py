@@ -0,0 +1,135 @@
+"""
+A CoordinateSet over a memory-mapped binary file, for data sets larger than RAM.
+
+The file holds a small header, followed by the coordinate tuples as consecutive
+records of `dim` little-endian float64 (or float32) values. The header is:
+
+    magic     8 bytes   b"PYGECOOR"
+    version   u8        1
+    dtype     1 byte    b"d" for float64, b"f" for float32
+    dim       u16       Number of coordinates per tuple
+    count     u64       Number of coordinate tuples
+    offset    u64       Start of the records, counted from the start of the file
+    crs_len   u32       Length of the crs_id, which follows as UTF-8 text
+
+All integers are little-endian. The records start at a 64 byte aligned offset.
+
+Operators transform the file in place, either tuple-by-tuple, or - if NumPy is
+available - through the batch kernels, operating on strided views of the mapped
+file. Either way, paging is left to the operating system.
+"""
+
+import mmap
+import struct
+import sys
+from typing import TYPE_CHECKING
+
+from .coordinateset import CoordinateSet
+
+if TYPE_CHECKING:
+    # typing.Self is new in Python 3.11
+    if sys.version_info >= (3, 11):
+        from typing import Self
+    else:
+        from typing_extensions import Self
+
+# NumPy is optional, and only needed for the array views returned by `columns()`
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"PYGECOOR"
+VERSION = 1
+HEADER = struct.Struct("<8sBcHQQI")
+DTYPES = {"float64": b"d", "float32": b"f"}
+
+
+class CoordinateSetMmap(CoordinateSet):
+    """A CoordinateSet backed by a memory-mapped file in the format described
+    above. Use `create()` to make a new file. Writes go straight to the file, and
+    are flushed on `flush()` and `close()`"""
+
+    def __init__(self, path, writable: bool = True):
+        with open(path, "r+b" if writable else "rb") as file:
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self.map = mmap.mmap(file.fileno(), 0, access=access)
+
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"CoordinateSetMmap: '{path}' is too short")
+        magic, version, code, dim, count, offset, crs_len = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or code not in DTYPES.values():
+            raise ValueError(f"CoordinateSetMmap: '{path}' is not a coordinate file")
+
+        self.path = path
+        self.dimension = dim
+        self.count = count
+        self.offset = offset
+        self.dtype = "float64" if code == b"d" else "float32"
+        self.crs_id = bytes(self.map[HEADER.size : HEADER.size + crs_len]).decode()
+        self.record = struct.Struct(f"<{dim}{code.decode()}")
+        if len(self.map) < offset + count * self.record.size:
+            raise ValueError(f"CoordinateSetMmap: '{path}' is truncated")
+
+    @staticmethod
+    def create(
+        path,
+        count: int,
+        dim: int,
+        crs_id: str = "unknown",
+        dtype: str = "float64",
+    ) -> "CoordinateSetMmap":
+        """Create a coordinate file of `count` tuples of dimension `dim`, all zero,
+        and return it, opened for writing"""
+        if dtype not in DTYPES:
+            raise ValueError(f"CoordinateSetMmap: Unsupported dtype '{dtype}'")
+        crs = crs_id.encode()
+        offset = -(-(HEADER.size + len(crs)) // 64) * 64
+        itemsize = 8 if dtype == "float64" else 4
+        header = HEADER.pack(
+            MAGIC, VERSION, DTYPES[dtype], dim, count, offset, len(crs)
+        )
+        with open(path, "wb") as file:
+            file.write(header + crs)
+            file.truncate(offset + count * dim * itemsize)
+        return CoordinateSetMmap(path)
+
+    def len(self) -> int:
+        return self.count
+
+    def dim(self) -> int:
+        return self.dimension
+
+    def get(self, idx: int) -> list[float]:
+        if not 0 <= idx < self.count:
+            raise IndexError(f"CoordinateSetMmap: Index {idx} out of range")
+        position = self.offset + idx * self.record.size
+        return list(self.record.unpack_from(self.map, position))
+
+    def set(self, idx: int, value: list[float] | tuple[float]):
+        values = self.get(idx)
+        for i in range(min(self.dimension, len(value))):
+            values[i] = float(value[i])
+        self.record.pack_into(self.map, self.offset + idx * self.record.size, *values)
+
+    def columns(self) -> list | None:
+        """Strided views (not copies) of the coordinate columns of the file. These
+        must be dropped before the set can be closed"""
+        if np is None:
+            return None
+        dtype = np.dtype("<f8" if self.dtype == "float64" else "<f4")
+        rows = np.ndarray((self.count, self.dimension), dtype, self.map, self.offset)
+        return [rows[:, i] for i in range(self.dimension)]
+
+    def flush(self):
+        """Write any changes back to the file"""
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,71 @@
+"""
+A NumPy backed implementation of the CoordinateSet interface.
+
+NumPy is an optional dependency of PyGe, so this lives in a module of its own:
+Importing `pyge.coordinateset` never drags in NumPy, while importing this module
+requires it.
+"""
+
+import numpy as np
+
+from .coordinateset import CoordinateSet
+
+
+class CoordinateSetNumpy(CoordinateSet):
+    """A CoordinateSet backed by a single two dimensional float64 NumPy array.
+
+    By default, the array is interpreted as row-wise, i.e. of shape (n, dim), with
+    one coordinate tuple per row. With `columnwise=True`, the array is interpreted
+    as being of shape (dim, n), with one coordinate dimension per row.
+
+    Arrays of dtype float64 are wrapped as-is, without copying, so the caller's
+    array is the one being operated on. Anything else (lists of lists, integer
+    arrays, ...) is converted once, into a fresh contiguous float64 array.
+    """
+
+    def __init__(self, args, crs_id: str = "unknown", columnwise: bool = False):
+        coords = np.asarray(args, dtype=np.float64)
+        if coords.ndim != 2:
+            raise ValueError(
+                f"CoordinateSetNumpy: Expected a 2D array, got {coords.ndim}D"
+            )
+        self.coords = coords
+        self.columnwise = columnwise
+        self.crs_id = crs_id
+
+    def len(self) -> int:
+        return self.coords.shape[1 if self.columnwise else 0]
+
+    def dim(self) -> int:
+        return self.coords.shape[0 if self.columnwise else 1]
+
+    def get(self, idx: int) -> list[float]:
+        if self.columnwise:
+            return self.coords[:, idx].tolist()
+        return self.coords[idx].tolist()
+
+    def set(self, idx: int, value: list[float] | tuple[float]):
+        n = min(self.dim(), len(value))
+        if self.columnwise:
+            self.coords[:n, idx] = value[:n]
+        else:
+            self.coords[idx, :n] = value[:n]
+
+    def column(self, dim: int) -> np.ndarray:
+        """A view (not a copy) of all coordinate values along dimension `dim`"""
+        if self.columnwise:
+            return self.coords[dim]
+        return self.coords[:, dim]
+
+    def columns(self) -> list[np.ndarray]:
+        """Views (not copies) of all coordinate columns, in dimension order"""
+        return [self.column(i) for i in range(self.dim())]
+
+    def slice(self, start: int, stop: int) -> "CoordinateSetNumpy":
+        """The coordinate tuples from `start` up to, but not including, `stop`, as a
+        CoordinateSetNumpy wrapping a view (not a copy) of the array"""
+        if self.columnwise:
+            coords = self.coords[:, start:stop]
+        else:
+            coords = self.coords[start:stop]
+        return CoordinateSetNumpy(coords, self.crs_id, self.columnwise)
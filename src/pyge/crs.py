@@ -23,7 +23,15 @@ class CrsBase(ABC):
 
 
 class Crs(CrsBase, RegisterItem):
-    """Attempt at a potentially simplified CRS class"""
+    """
+    Attempt at a potentially simplified CRS class
+
+    `to_parent` is the operator definition taking coordinates referred to this CRS,
+    to the CRS given by `parent_id`. For the parts of a compound CRS, it operates
+    on the full coordinate tuple of the compound, leaving the axes of the other
+    parts alone. See `pyge.planner` for how these are combined into
+    transformations between any two CRSs.
+    """
 
     def __init__(
         self,
@@ -33,9 +41,11 @@ class Crs(CrsBase, RegisterItem):
         units: tuple[str] = (),
         norvis: tuple[int] = (1, 2, 3, 4),
         attrs: dict[str, str] = {},
+        to_parent: str | None = None,
     ):
         self.id = id
         self.parent_id = parent_id
+        self.to_parent = to_parent
         self.parts = parts
         self.units = units
         self.norvis = norvis
@@ -1,69 +1,135 @@
-from math import sqrt, hypot, atan2, sin, cos, copysign, pi, pow
-
-
+from dataclasses import InitVar, dataclass, field
+from math import sqrt, hypot, atan2, sin, cos, copysign, pi, pow, inf
+
+from ._numpy import np
+
+
+# The built in ellipsoids, by name, as (a, 1/f), mostly following the PROJ catalogue
+ELLIPSOIDS = {
+    "GRS80": (6378137.0, 298.2572221008827),
+    "WGS84": (6378137.0, 298.257223563),
+    "WGS72": (6378135.0, 298.26),
+    "WGS66": (6378145.0, 298.25),
+    "GRS67": (6378160.0, 298.247167427),
+    "intl": (6378388.0, 297.0),
+    "krass": (6378245.0, 298.3),
+    "bessel": (6377397.155, 299.1528128),
+    "bess_nam": (6377483.865, 299.1528128),
+    "clrk66": (6378206.4, 294.9786982138982),
+    "clrk80": (6378249.145, 293.4663),
+    "clrk80ign": (6378249.2, 293.4660212936269),
+    "airy": (6377563.396, 299.3249646),
+    "mod_airy": (6377340.189, 299.3249646),
+    "evrst30": (6377276.345, 300.8017),
+    "helmert": (6378200.0, 298.3),
+    "hough": (6378270.0, 297.0),
+    "aust_SA": (6378160.0, 298.25),
+    "sphere": (6370997.0, inf),
+}
+
+
+@dataclass(frozen=True, slots=True)
 class Ellipsoid:
     """
     An ellipsoid class with fundamental geometric primitives
 
     Based on the ellipsoid trait from Rust Geodesy
+
+    Ellipsoids are immutable values, given by the semimajor axis, `a`, and the
+    reciprocal flattening, `rf` (infinite for a sphere). The derived constants
+    used by the geometric primitives are computed once, at construction.
+    Use `Ellipsoid.named()` to obtain the shared instance of a named ellipsoid.
     """
 
-    def __init__(self, a: float, rf: float):
-        self.a = a
-        self.f = 1.0 / rf
-
-    def named(name: str):
-        match name:
-            case "GRS80":
-                return Ellipsoid(6378137.0, 298.2572221008827)
-            case "WGS84":
-                return Ellipsoid(6378137.0, 298.257223563)
-            case "intl":
-                return Ellipsoid(6378388.0, 297.0)
-
-        # Not a known ellipsoid - try to interpret is as an (a,1/f) pair
-        af = name.split(",")
-        if len(af) != 2:
-            raise NameError(f"Unknown ellipsoid '{name}'")
-        try:
-            a, f = float(af[0]), float(af[1])
-        except ValueError:
-            raise NameError(f"Unknown ellipsoid '{name}'")
-        return Ellipsoid(a, f)
+    a: float
+    rf: InitVar[float]
+    f: float = field(init=False)
+    es: float = field(init=False, repr=False)
+    eps: float = field(init=False, repr=False)
+    n: float = field(init=False, repr=False)
+    b: float = field(init=False, repr=False)
+    A: float = field(init=False, repr=False)
+
+    def __post_init__(self, rf: float):
+        f = 1.0 / rf
+        es = f * (2.0 - f)
+        n = f / (2.0 - f)
+        m = 1.0 + n * n / 8.0
+
+        # Frozen, so we must bypass the dataclass __setattr__
+        set = object.__setattr__
+        set(self, "f", f)
+        set(self, "es", es)
+        set(self, "eps", es / (1.0 - es))
+        set(self, "n", n)
+        set(self, "b", self.a * (1.0 - f))
+        # The rectifying radius, truncated after the n⁴ term, cf.
+        # `rectifying_radius_bowring()`
+        set(self, "A", self.a * m * m / (1.0 + n))
+
+    @staticmethod
+    def named(name: str) -> "Ellipsoid":
+        """The ellipsoid named `name`, or given as an `a,rf` pair. Repeated lookups
+        of the same ellipsoid return the same instance"""
+        ellps = _registry.get(name)
+        if ellps is not None:
+            return ellps
+
+        if name in ELLIPSOIDS:
+            ellps = Ellipsoid(*ELLIPSOIDS[name])
+        else:
+            # Not a known ellipsoid - try to interpret is as an (a,1/f) pair
+            af = name.split(",")
+            if len(af) != 2:
+                raise NameError(f"Unknown ellipsoid '{name}'")
+            try:
+                a, rf = float(af[0]), float(af[1])
+            except ValueError:
+                raise NameError(f"Unknown ellipsoid '{name}'")
+            # Differently formatted, but numerically identical, pairs share
+            # one instance
+            ellps = _registry.setdefault((a, rf), Ellipsoid(a, rf))
+
+        _registry[name] = ellps
+        return ellps
 
     def eccentricity_squared(self):
         """The squared eccentricity *e² = (a² - b²) / a²*"""
-        return self.f * (2 - self.f)
+        return self.es
 
     def eccentricity(self):
         """The eccentricity *e*"""
-        return sqrt(self.f * (2 - self.f))
+        return sqrt(self.es)
 
     def second_eccentricity_squared(self) -> float:
         """The squared second eccentricity *e'² = (a² - b²) / b² = e² / (1 - e²)*"""
-        es = self.eccentricity_squared()
-        return es / (1.0 - es)
+        return self.eps
 
     def second_eccentricity(self) -> float:
         """The second eccentricity *e'*"""
-        return sqrt(self.second_eccentricity_squared())
+        return sqrt(self.eps)
 
     def semimajor_axis(self):
         return self.a
 
     def semiminor_axis(self):
         """The semiminor axis, *b*"""
-        return self.a * (1.0 - self.f)
+        return self.b
 
     def prime_vertical_radius_of_curvature(self, latitude: float) -> float:
         """The radius of curvature in the prime vertical, *N*"""
         s = sin(latitude)
-        return self.a / sqrt(1.0 - s * s * self.eccentricity_squared())
+        return self.a / sqrt(1.0 - s * s * self.es)
+
+    def prime_vertical_radius_of_curvature_array(self, latitude):
+        """The radius of curvature in the prime vertical, *N*, for an array of latitudes"""
+        s = np.sin(latitude)
+        return self.a / np.sqrt(1.0 - s * s * self.es)
 
     def meridian_radius_of_curvature(self, latitude: float) -> float:
         """The meridian radius of curvature, *M*"""
-        es = self.eccentricity_squared()
-        num = self.semimajor_axis() * (1.0 - es)
+        es = self.es
+        num = self.a * (1.0 - es)
         denom = 1.0 - sin(latitude) ** 2 * pow(es, 1.5)
         return num / denom
 
@@ -73,17 +139,15 @@ class Ellipsoid:
 
     def second_flattening(self) -> float:
         """The second flattening, *g  =  (a - b) / b*"""
-        b = self.semiminor_axis()
-        return (self.semimajor_axis() - b) / b
+        return (self.a - self.b) / self.b
 
     def third_flattening(self) -> float:
         """The third flattening, *n  =  (a - b) / (a + b)  =  f / (2 - f)*"""
-        flattening = self.flattening()
-        return flattening / (2.0 - flattening)
+        return self.n
 
     def aspect_ratio(self) -> float:
         """The aspect ratio, *a / b  =  1 / ( 1 - f )  =  1 / sqrt(1 - e²)*"""
-        return 1.0 / (1.0 - self.flattening())
+        return 1.0 / (1.0 - self.f)
 
     def rectifying_radius_bowring(self) -> float:
         """
@@ -94,10 +158,9 @@ class Ellipsoid:
         [Karney (2010)](crate::Bibliography::Kar10) eq. (29), as elaborated in
         [Deakin et al (2012)](crate::Bibliography::Dea12) eq. (41)
         """
-        # A is the rectifying radius - truncated after the n⁴ term
-        n = self.third_flattening()
-        m = 1.0 + n * n / 8.0
-        return self.a * m * m / (1.0 + n)
+        # A is the rectifying radius - truncated after the n⁴ term, and
+        # precomputed at construction
+        return self.A
 
     def meridian_latitude_to_distance(self, latitude: float) -> float:
         """
@@ -108,12 +171,7 @@ class Ellipsoid:
         https://en.wikipedia.org/wiki/Transverse_Mercator:_Bowring_series.
         Deakin et al (2012) provide a higher order (*n⁸*) implementation.
         """
-        n = self.third_flattening()
-
-        # A = self.rectifying_radius_bowring()
-        # Inlining since we already have n
-        m = 1.0 + n * n / 8.0
-        A = self.a * m * m / (1.0 + n)
+        n, A = self.n, self.A
 
         B = 9.0 * (1.0 - 3.0 * n * n / 8.0)
         s = sin(2.0 * latitude)
@@ -125,6 +183,18 @@ class Ellipsoid:
         theta = latitude - B * pow(r, -2.0 / 13.0) * sin(2.0 * v / 13.0)
         return A * theta
 
+    def meridian_latitude_to_distance_array(self, latitude):
+        """The array-at-a-time version of `meridian_latitude_to_distance`"""
+        n, A = self.n, self.A
+
+        B = 9.0 * (1.0 - 3.0 * n * n / 8.0)
+        x = 1.0 + 13.0 / 12.0 * n * np.cos(2.0 * latitude)
+        y = 13.0 / 12.0 * n * np.sin(2.0 * latitude)
+        r = np.hypot(x, y)
+        v = np.arctan2(y, x)
+        theta = latitude - B * r ** (-2.0 / 13.0) * np.sin(2.0 * v / 13.0)
+        return A * theta
+
     def meridian_distance_to_latitude(self, distance_from_equator: float) -> float:
         # Compute the latitude of a point, given *M*, its distance from the equator,
         # along its local meridian.
@@ -134,12 +204,7 @@ class Ellipsoid:
         #
         # See also
         # [meridian_latitude_to_distance](Meridians::meridian_latitude_to_distance)
-        n = self.third_flattening()
-
-        # A = self.rectifying_radius_bowring()
-        # Inlining since we already have n
-        m = 1.0 + n * n / 8.0
-        A = self.a * m * m / (1.0 + n)
+        n, A = self.n, self.A
 
         theta = distance_from_equator / A
         s = sin(2.0 * theta)
@@ -152,6 +217,19 @@ class Ellipsoid:
         C = 1.0 - 9.0 * n * n / 16.0
         return theta + 63.0 / 4.0 * C * pow(r, 8.0 / 155.0) * sin(8.0 / 155.0 * v)
 
+    def meridian_distance_to_latitude_array(self, distance_from_equator):
+        """The array-at-a-time version of `meridian_distance_to_latitude`"""
+        n, A = self.n, self.A
+
+        theta = distance_from_equator / A
+        x = 1.0 - 155.0 / 84.0 * n * np.cos(2.0 * theta)
+        y = 155.0 / 84.0 * n * np.sin(2.0 * theta)
+        r = np.hypot(x, y)
+        v = np.arctan2(y, x)
+
+        C = 1.0 - 9.0 * n * n / 16.0
+        return theta + 63.0 / 4.0 * C * r ** (8.0 / 155.0) * np.sin(8.0 / 155.0 * v)
+
     def cartesian(
         self, longitude: float, latitude: float, height: float
     ) -> tuple[float, float, float]:
@@ -164,15 +242,13 @@ class Ellipsoid:
 
         X = (N + height) * coslat * coslon
         Y = (N + height) * coslat * sinlon
-        Z = (N * (1.0 - self.eccentricity_squared()) + height) * sinlat
+        Z = (N * (1.0 - self.es) + height) * sinlat
         return (X, Y, Z)
 
     def geographic(self, X: float, Y: float, Z: float) -> tuple[float, float, float]:
         """Cartesian to geographic conversion"""
         # We need a few additional ellipsoidal parameters
-        b = self.semiminor_axis()
-        eps = self.second_eccentricity_squared()
-        es = self.eccentricity_squared()
+        a, b, eps, es = self.a, self.b, self.eps, self.es
 
         # The longitude is straightforward: Plain geometry in the equatoreal plane
         lam = atan2(Y, X)
@@ -183,13 +259,12 @@ class Ellipsoid:
         # For p < 1 picometer, we simplify things to avoid numerical havoc.
         if p < 1.0e-12:
             # The sign of Z determines the hemisphere
-            phi = copysign(pi, Z)
+            phi = copysign(pi / 2.0, Z)
             # We have forced phi to one of the poles, so the height is |Z| - b
-            h = abs(Z) - self.semiminor_axis()
+            h = abs(Z) - b
             return (lam, phi, h)
 
         # Fukushima (1999)
-        a = self.semimajor_axis()
         T = (Z * a) / (p * b)
         c = 1.0 / sqrt(1.0 + T * T)
         s = c * T
@@ -202,10 +277,59 @@ class Ellipsoid:
         sinphi = phi_num / lenphi
         cosphi = phi_denom / lenphi
 
-        a = self.semimajor_axis()
-        N = self.prime_vertical_radius_of_curvature(phi)
+        # The prime vertical radius of curvature, N, from the sine we already have
+        N = a / sqrt(1.0 - sinphi * sinphi * es)
 
         # Bowring (1985), as quoted by Burtch (2006), suggests this expression
         # as more accurate than the commonly used h = p / cosphi - N
         h = p * cosphi + Z * sinphi - a * a / N
         return (lam, phi, h)
+
+    def cartesian_array(self, longitude, latitude, height):
+        """The array-at-a-time version of `cartesian`"""
+        es = self.es
+        sinlat = np.sin(latitude)
+        coslat = np.cos(latitude)
+        N = self.a / np.sqrt(1.0 - sinlat * sinlat * es)
+
+        r = (N + height) * coslat
+        X = r * np.cos(longitude)
+        Y = r * np.sin(longitude)
+        Z = (N * (1.0 - es) + height) * sinlat
+        return (X, Y, Z)
+
+    def geographic_array(self, X, Y, Z):
+        """The array-at-a-time version of `geographic`"""
+        a, b, eps, es = self.a, self.b, self.eps, self.es
+
+        lam = np.arctan2(Y, X)
+        p = np.hypot(X, Y)
+
+        # Fukushima (1999). At the poles, p == 0 makes T infinite. We let that
+        # slide here, and patch up the polar points below
+        with np.errstate(divide="ignore", invalid="ignore"):
+            T = (Z * a) / (p * b)
+            c = 1.0 / np.sqrt(1.0 + T * T)
+            s = c * T
+
+            phi_num = Z + eps * b * s * s * s
+            phi_denom = p - es * a * c * c * c
+            phi = np.arctan2(phi_num, phi_denom)
+
+            lenphi = np.hypot(phi_num, phi_denom)
+            sinphi = phi_num / lenphi
+            cosphi = phi_denom / lenphi
+
+            N = a / np.sqrt(1.0 - sinphi * sinphi * es)
+            h = p * cosphi + Z * sinphi - a * a / N
+
+        # For p < 1 picometer, the sign of Z determines the pole, and |Z| - b the height
+        polar = p < 1.0e-12
+        if polar.any():
+            phi = np.where(polar, np.copysign(pi / 2.0, Z), phi)
+            h = np.where(polar, np.abs(Z) - b, h)
+        return (lam, phi, h)
+
+
+# Interned ellipsoids, keyed by name, and by (a, rf) for those given as pairs
+_registry: dict = {}
@@ -1,8 +1,59 @@
+import sys
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from functools import partial
+from threading import Lock
+from time import perf_counter
+from typing import TYPE_CHECKING, NamedTuple
+
+from .chunking import AdaptiveChunkSize
 from .context import Context, OpHandle, OpDirection
 from .operator import Operator
+from .parser import normalize_definition
 from .operator_method import OperatorMethod
 from .coordinateset import CoordinateSet
+from .profiling import Profiler, StepStats
 from .builtin_operator_methods import builtin_operator_methods
+from .registry import plugin_operator_methods
+
+# asyncio, concurrent.futures and pickle take longer to import than all of the
+# rest, and are only needed for the async and threaded modes of operation, and for
+# warm-starting, so they are imported on first use of those
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+    # typing.Self is new in Python 3.11
+    if sys.version_info >= (3, 11):
+        from typing import Self
+    else:
+        from typing_extensions import Self
+
+
+# The largest chunk size chosen automatically by threaded `apply()`, large enough to
+# amortize the per chunk overhead, and small enough to keep the kernel temporaries
+# in cache
+DEFAULT_CHUNK_SIZE = 65536
+
+
+# Operand sets of up to this many coordinate tuples are transformed inline by
+# `apply_async()`, since handing them to an executor costs more than it saves
+ASYNC_INLINE_SIZE = 1024
+
+# The chunk size used by `apply_async()` for larger sets. Each chunk blocks an
+# executor thread, but not the event loop
+ASYNC_CHUNK_SIZE = 16384
+
+# Identifies the format of the warm-start data written by `dumps()` and `save()`
+WARM_START_FORMAT = "pyge.warm_start.1"
+
+
+class CacheInfo(NamedTuple):
+    """Statistics for the operator cache of a MinimalContext"""
+
+    hits: int
+    misses: int
+    size: int
+    capacity: int
 
 
 class MinimalContext(Context):
@@ -12,41 +63,379 @@ class MinimalContext(Context):
     Modes of communication between the PyGe internals and the external
     world (i.e. resources like grids, transformation definitions,
     or ellipsoid parameters).
+
+    Operators are cached by their normalized definition, so instantiating
+    the same definition repeatedly returns the same handle, without
+    re-parsing. Each call to `op()` counts as a reference to the handle,
+    to be given back by `release()`. When the cache grows beyond `capacity`
+    entries, the least recently used unreferenced operators are evicted.
+
+    The context may be used from several threads concurrently. Lookups of
+    operators and operator methods take no locks: The `ops` and `methods`
+    dicts are never modified, but replaced by modified copies, which readers
+    pick up on their next lookup. Writers are serialized by `lock`, which also
+    guards the cache bookkeeping.
+
+    Instrumentation is opt-in: With a `profiler`, each application of an
+    operator, and each step of each pipeline, is timed and counted, for
+    `stats()`. The profiler may also be attached and detached later on, by
+    assigning to `profiler`.
+
+    The cached operators can be saved, fully instantiated and prepared, to a
+    warm-start file, from which a new context, e.g. in a worker process, loads
+    them in one read, rather than instantiating them anew.
     """
 
-    def __init__(self):
+    def __init__(self, capacity: int = 1024, profiler: Profiler | None = None):
         self.ops: dict[OpHandle, Operator] = {}
-        self.methods: dict[str, OperatorMethod] = dict(builtin_operator_methods)
+        # The user defined methods. Builtin and plugin methods are looked up in
+        # their registries, which import them on first use
+        self.methods: dict[str, OperatorMethod] = {}
+        self.capacity = capacity
+        # Normalized definition -> handle, least recently used first
+        self.handles: OrderedDict[str, OpHandle] = OrderedDict()
+        self.references: dict[OpHandle, int] = {}
+        self.hits = 0
+        self.misses = 0
+        # Thread pools for `apply(..., threads=n)`, by number of threads
+        self.thread_pools: dict[int, ThreadPoolExecutor] = {}
+        self.lock = Lock()
+        # Incremented when registering methods, to detect concurrent invalidation
+        self.generation = 0
+        self.profiler = profiler
 
     def register_operator_method(self, user_defined_method: OperatorMethod):
         """Add a user defined method to the gamut of built-ins"""
-        self.methods[user_defined_method.id] = user_defined_method
+        with self.lock:
+            methods = dict(self.methods)
+            methods[user_defined_method.id] = user_defined_method
+            self.methods = methods
+
+            # Cached definitions may refer to a method of the same name, which is
+            # now shadowed, so from here on, they must be instantiated anew.
+            # Operators still referenced stay alive until released
+            self.generation += 1
+            self._forget(h for h in self.handles.values() if self.references[h] == 0)
+            self.handles.clear()
 
     def operator_method(self, id) -> OperatorMethod | None:
-        """The OperatorMethod representation of the operator method named `id`"""
-        if id in self.methods:
-            return self.methods[id]
-        return None
+        """The OperatorMethod representation of the operator method named `id`.
+        User defined methods take precedence over the builtins, which take
+        precedence over methods provided by plugins"""
+        method = self.methods.get(id)
+        if method is None:
+            method = builtin_operator_methods.get(id)
+        if method is None:
+            method = plugin_operator_methods.get(id)
+        return method
 
     def builtins(self) -> set[str]:
         """The names of all built in operator methods"""
         return set(builtin_operator_methods.keys())
 
     def op(self, definition: str) -> OpHandle | None:
-        """Instantiate the operator given by `definition`"""
-        thehandle = OpHandle()
-        theop = Operator(definition, self)
-        if theop is None:
-            return None
-        self.ops[thehandle] = theop
+        """Instantiate the operator given by `definition`, or reuse the cached
+        instantiation of an identical definition.
+
+        Each call takes a reference to the operator, to be given back by
+        `release()` when done with the handle. Referenced operators are never
+        evicted, so the cache holds at most `capacity` operators only as long as
+        the callers release what they are done with"""
+        key = normalize_definition(definition)
+        while True:
+            with self.lock:
+                thehandle = self._hit(key)
+                if thehandle is not None:
+                    return thehandle
+                generation = self.generation
+
+            # Instantiate outside of the lock, so other threads are not held up
+            theop = Operator(definition, self)
+            if theop is None:
+                return None
+
+            with self.lock:
+                # Methods registered meanwhile may change the meaning of the
+                # definition, so we must start over
+                if self.generation != generation:
+                    continue
+                # Another thread may have beaten us to it
+                thehandle = self._hit(key)
+                if thehandle is not None:
+                    return thehandle
+
+                self.misses += 1
+                thehandle = OpHandle()
+                self.ops = {**self.ops, thehandle: theop}
+                self.references[thehandle] = 1
+                self.handles[key] = thehandle
+                self._evict()
+                return thehandle
+
+    def release(self, op: OpHandle):
+        """Give back a reference to `op`, obtained from `op()`. When all references
+        are given back, the operator may be evicted from the cache, after which
+        the handle is invalid"""
+        with self.lock:
+            if self.references.get(op, 0) == 0:
+                return
+            self.references[op] -= 1
+            # Operators no longer in the cache go as soon as they are unreferenced
+            cached = self.handles.get(self.ops[op].normalized_definition) == op
+            if self.references[op] == 0 and not cached:
+                self._forget((op,))
+            self._evict()
+
+    async def op_async(self, definition: str) -> OpHandle | None:
+        """Instantiate the operator given by `definition`, without blocking the
+        event loop. Cached definitions are looked up inline, while new ones are
+        parsed and instantiated in the event loop's default executor"""
+        if normalize_definition(definition) in self.handles:
+            return self.op(definition)
+        from asyncio import get_running_loop
+
+        loop = get_running_loop()
+        return await loop.run_in_executor(None, self.op, definition)
+
+    async def apply_async(
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        operands: CoordinateSet,
+        chunk_size: int | None = None,
+    ) -> int:
+        """Apply operator `op` to `operands` in direction `FWD` or `INV`, without
+        blocking the event loop. Small sets are transformed inline. Larger sets
+        are transformed in the event loop's default executor, in chunks of
+        `chunk_size` coordinate tuples, yielding to the loop between chunks"""
+        n = len(operands)
+        if n <= ASYNC_INLINE_SIZE:
+            return self.apply(op, direction, operands)
+
+        from asyncio import get_running_loop
+
+        loop = get_running_loop()
+        chunk_size = max(chunk_size or ASYNC_CHUNK_SIZE, 1)
+        successes = 0
+        for start in range(0, n, chunk_size):
+            chunk = operands.slice(start, start + chunk_size)
+            successes += await loop.run_in_executor(
+                None, self.apply, op, direction, chunk
+            )
+        return successes
+
+    def apply_stream(
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        blocks: Iterable[CoordinateSet],
+        chunk_size: int | None = None,
+    ) -> Iterator[tuple[CoordinateSet, int]]:
+        """Apply operator `op` in direction `FWD` or `INV` to a stream of coordinate
+        sets, yielding the transformed chunks, as views of the blocks, along with
+        the number of successfully transformed coordinate tuples of each. Unless
+        given, the chunk size adapts to the throughput measured along the way"""
+        if chunk_size is None:
+            sizer = AdaptiveChunkSize()
+        elif chunk_size < 1:
+            raise ValueError(
+                f"apply_stream: chunk_size must be positive, not {chunk_size}"
+            )
+        else:
+            sizer = AdaptiveChunkSize(chunk_size, chunk_size, chunk_size)
+        return self._stream(op, direction, blocks, sizer)
+
+    # The generator behind `apply_stream()`, which checks its arguments up front,
+    # rather than on the first iteration
+    def _stream(
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        blocks: Iterable[CoordinateSet],
+        sizer: AdaptiveChunkSize,
+    ) -> Iterator[tuple[CoordinateSet, int]]:
+        # Only one block at a time is alive here, so if `blocks` is a generator,
+        # memory use is bounded by the block size
+        for block in blocks:
+            n = len(block)
+            start = 0
+            while start < n:
+                stop = min(start + sizer.size, n)
+                chunk = block.slice(start, stop)
+                t = perf_counter()
+                successes = self.apply(op, direction, chunk)
+                sizer.record(stop - start, perf_counter() - t)
+                yield chunk, successes
+                start = stop
+
+    def stats(self) -> dict[tuple[str, ...], StepStats]:
+        """Statistics per operator applied, and per pipeline step, keyed by path
+        through the pipeline tree, as recorded by the `profiler`, if any"""
+        profiler = self.profiler
+        return {} if profiler is None else profiler.stats()
+
+    def dumps(self, ops: Iterable[OpHandle] | None = None) -> bytes:
+        """The operators `ops` (by default, all cached ones), instantiated and
+        prepared, as warm-start data for `loads()`"""
+        import pickle
+
+        with self.lock:
+            handles = list(self.handles.values()) if ops is None else list(ops)
+            operators = {
+                self.ops[h].normalized_definition: self.ops[h] for h in handles
+            }
+        data = {"format": WARM_START_FORMAT, "operators": operators}
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> int:
+        """Add the operators of the warm-start data `data`, from `dumps()`, to the
+        cache, so `op()` finds them ready for use. Returns the number of operators
+        added. The data is unpickled, so it must come from a trusted source"""
+        import pickle
+
+        data = pickle.loads(data)
+        if not isinstance(data, dict) or data.get("format") != WARM_START_FORMAT:
+            raise ValueError("MinimalContext: Not warm-start data")
+        added = 0
+        with self.lock:
+            for key, theop in data["operators"].items():
+                if key in self.handles:
+                    continue
+                _attach(theop, self)
+                thehandle = OpHandle()
+                self.ops = {**self.ops, thehandle: theop}
+                self.references[thehandle] = 0
+                self.handles[key] = thehandle
+                added += 1
+            self._evict()
+        return added
+
+    def save(self, path, ops: Iterable[OpHandle] | None = None):
+        """Write the operators `ops` (by default, all cached ones) to the
+        warm-start file `path`, for `load()`"""
+        with open(path, "wb") as file:
+            file.write(self.dumps(ops))
+
+    def load(self, path) -> int:
+        """Add the operators of the warm-start file `path`, written by `save()`, to
+        the cache. Returns the number of operators added"""
+        with open(path, "rb") as file:
+            return self.loads(file.read())
+
+    def cache_info(self) -> CacheInfo:
+        """Hit/miss statistics and current size of the operator cache"""
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, len(self.handles), self.capacity)
+
+    # A cache hit for the normalized definition `key` gives a new reference to the
+    # cached handle. Call with the lock held
+    def _hit(self, key: str) -> OpHandle | None:
+        thehandle = self.handles.get(key)
+        if thehandle is not None:
+            self.hits += 1
+            self.handles.move_to_end(key)
+            self.references[thehandle] += 1
         return thehandle
 
+    # Evict the least recently used unreferenced operators, until we are within
+    # capacity. Referenced operators are never evicted, so if there are more
+    # of them than the capacity, the cache stays over capacity until released.
+    # Call with the lock held
+    def _evict(self):
+        excess = len(self.handles) - self.capacity
+        if excess <= 0:
+            return
+        evicted = []
+        for key, handle in list(self.handles.items()):
+            if self.references[handle] == 0:
+                del self.handles[key]
+                evicted.append(handle)
+                if len(evicted) == excess:
+                    break
+        self._forget(evicted)
+
+    # Call with the lock held
+    def _forget(self, handles: Iterable[OpHandle]):
+        handles = set(handles)
+        if not handles:
+            return
+        self.ops = {h: op for h, op in self.ops.items() if h not in handles}
+        for handle in handles:
+            del self.references[handle]
+
     def apply(
-        self, op: OpHandle, direction: OpDirection, operands: CoordinateSet
+        self,
+        op: OpHandle,
+        direction: OpDirection,
+        operands: CoordinateSet,
+        threads: int | None = None,
+        chunk_size: int | None = None,
     ) -> int:
-        """Apply operator `op` to `operands` in direction Fwd or Inv"""
-        if op not in self.ops:
+        """Apply operator `op` to `operands` in direction Fwd or Inv
+
+        With `threads`, the operands are split into chunks of `chunk_size`
+        coordinate tuples (by default, at most 65536, and at least one chunk per
+        thread), which are transformed concurrently, by a pool of `threads`
+        threads. This pays off for array backed operands, where the batch kernels
+        spend most of their time in NumPy, which releases the interpreter lock.
+        Operators, including their `prepared` state, are shared read-only by the
+        threads. With `chunk_size` but no `threads`, the chunks are transformed
+        one by one. The thread pools are kept for reuse, until `close()`."""
+        if threads is not None and threads < 1:
+            raise ValueError(f"apply: threads must be positive, not {threads}")
+        theop = self.ops.get(op)
+        if theop is None:
             return 0
         if direction == OpDirection.FWD:
-            return self.ops[op].fwd(self, operands)
-        return self.ops[op].inv(self, operands)
+            run = theop.plan.fwd
+        else:
+            run = theop.plan.inv
+        profiler = self.profiler
+        if profiler is not None:
+            label = f"{direction.name.lower()}: {theop.normalized_definition}"
+            run = partial(profiler.run, label, run)
+        if threads is None and chunk_size is None:
+            return run(self, operands)
+
+        n = len(operands)
+        if chunk_size is None:
+            chunk_size = min(-(-n // threads), DEFAULT_CHUNK_SIZE)
+        chunk_size = max(chunk_size, 1)
+        chunks = [
+            operands.slice(start, start + chunk_size)
+            for start in range(0, n, chunk_size)
+        ]
+        if threads is None or threads < 2 or len(chunks) < 2:
+            return sum(run(self, chunk) for chunk in chunks)
+
+        pool = self.thread_pools.get(threads)
+        if pool is None:
+            with self.lock:
+                pool = self.thread_pools.get(threads)
+                if pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    pool = ThreadPoolExecutor(threads)
+                    self.thread_pools = {**self.thread_pools, threads: pool}
+        return sum(pool.map(lambda chunk: run(self, chunk), chunks))
+
+    def close(self):
+        """Shut down the thread pools used by threaded `apply()`. Later threaded
+        applications start new pools"""
+        with self.lock:
+            pools, self.thread_pools = self.thread_pools, {}
+        for pool in pools.values():
+            pool.shutdown()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+# Bind an unpickled operator, and its steps, to the context `ctx`
+def _attach(theop: Operator, ctx: MinimalContext):
+    theop.ctx = ctx
+    for step in (*theop.steps, *theop.forward_steps, *theop.inverse_steps):
+        _attach(step, ctx)
@@ -1,7 +1,38 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+from types import MappingProxyType
+
 from .registeritem import RegisterItem
 from .coordinateset import CoordinateSet
-from .context import Context
+from .context import Context, OpDirection
 from .operator_method import OperatorMethod
+from . import optimizer
+from .parser import Step, parse_definition
+
+# Formerly defined here, and still importable from here
+from .parser import normalize_definition, split_definition  # noqa: F401
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """
+    An Operator compiled for execution
+
+    `fwd` and `inv` carry out the operator in each direction, as callables taking
+    `(ctx, operands)`. All decisions not depending on the operands (inversion,
+    omission, parameter parsing) are made when compiling, and for pipelines,
+    `forward_steps` and `inverse_steps` hold the compiled steps in order of
+    execution, and `forward_labels` and `inverse_labels` their labels, for
+    profiling.
+    """
+
+    fwd: Callable[[Context, CoordinateSet], int]
+    inv: Callable[[Context, CoordinateSet], int]
+    forward_steps: tuple[Callable[[Context, CoordinateSet], int], ...] = ()
+    inverse_steps: tuple[Callable[[Context, CoordinateSet], int], ...] = ()
+    forward_labels: tuple[str, ...] = ()
+    inverse_labels: tuple[str, ...] = ()
 
 
 class Operator(RegisterItem):
@@ -36,93 +67,100 @@ class Operator(RegisterItem):
 
     In Python, however, this is not the case, so for conceptual clarity, we
     represent operators as instantiations of the class **Operator**.
+
+    Operators, including their prepared state, can be pickled, e.g. for shipping
+    to worker processes, which then need not instantiate them anew. Unpickled
+    operators are not bound to any context.
     """
 
-    def __init__(self, definition: str, ctx: Context):
+    def __init__(self, definition: str | Step, ctx: Context, optimize: bool = True):
+        # Steps of pipelines are instantiated from their parsed form, as given
+        # by `parse_definition()`, to avoid parsing them again
+        if isinstance(definition, Step):
+            steps = [definition]
+            definition = definition.definition
+        else:
+            steps = parse_definition(definition)
         self.definition = definition
         self.steps: tuple[Operator] = ()
         self.parameters: dict[str, str] = {}
         self.forward_function = None
         self.inverse_function = None
+        self.forward_batch_function = None
+        self.inverse_batch_function = None
+        self.affine_function = None
+        self.forward_steps: tuple[Operator] = ()
+        self.inverse_steps: tuple[Operator] = ()
         self.ctx = ctx
 
-        # Remove end-of-line comments
-        # definition = definition.strip().split("#")
-
-        # We use the Rust Geodesy syntax, where steps are separated by the
-        # vertical bar ("pipe") character, and we strip out empty steps.
-        # This may lead to empty definitions, which is OK: An operator consists
-        # of zero or more steps. An empty definition is represented as a pipeline
-        # with zero steps. Hence the `len(definitions != 1)`, rather than
-        # `len(definitions > 1)` in the condition for detecting pipelines below
-
-        # Remove all comments - block and inline
-        lines = definition.replace("\r", "\n").split("\n")
-        trimmed = ""
-        for line in lines:
-            trimmed += " "
-            trimmed += (list(line.strip().split("#")) + [""])[0]
-
-        # Collapse repeated whitespace
-        trimmed = " ".join(trimmed.split())
-
-        # Trim all whitespace around the syntactical elements {'=', ',', '.', ':'}
-        # Whitespace around '|' is handled in the next step, definitions = [...]
-        for splitter in "|=,.:":
-            trimmed = splitter.join((d.strip() for d in trimmed.split(splitter)))
-
-        # Split into an array of non-empty steps
-        definitions = [
-            stripped for d in trimmed.split("|") if len(stripped := d.strip()) > 0
-        ]
-        self.normalized_definition = " | ".join(definitions)
+        # An empty definition is represented as a pipeline with zero steps, hence
+        # `len(steps) != 1`, rather than `len(steps) > 1`, for detecting pipelines
+        self.normalized_definition = " | ".join(step.definition for step in steps)
 
         # For a pipeline of operators, recursively call the constructor for each step
-        if len(definitions) != 1:
+        if len(steps) != 1:
             method = ctx.operator_method("pipeline")
             if method is None:
                 raise NameError(f"Unknown OperatorMethod 'pipeline' in '{definition}'")
             self.parameters["_name"] = "pipeline"
             self.forward_function = method.fwd
             self.inverse_function = method.inv
-            self.steps = tuple(Operator(d, ctx) for d in definitions)
+            self.steps = tuple(Operator(step, ctx) for step in steps)
+
+            # The steps actually executed in each direction. Unless asked not to,
+            # we optimize away any redundancy in the pipeline
+            if optimize:
+                self.forward_steps = optimizer.optimize(
+                    self.steps, OpDirection.FWD, ctx
+                )
+                self.inverse_steps = optimizer.optimize(
+                    self.steps, OpDirection.INV, ctx
+                )
+            else:
+                self.forward_steps = self.steps
+                self.inverse_steps = self.steps
+            self.plan = self._compile()
             return
 
-        # Not a pipeline, so parse the definition into arguments and build the object
-        theargs = definitions[0].split()
-
-        # The potentially-prefix modifiers, and the operator method name,
-        # need special treatment: All modifiers are moved to the back, to
-        # ensure that the operator name is at the front. Once that is done,
-        # the operator name foo is handled as if given as "_name=foo", in
-        # alignment with the general style of the argument list
-        modifiers = "inv", "omit_fwd", "omit_inv"
-        for modifier in modifiers:
-            if modifier in theargs:
-                del theargs[theargs.index(modifier)]
-                self.parameters[modifier] = ""
-
-        id = theargs[0]
-        self.parameters["_name"] = id
-        del theargs[0]
-
-        # Build the rest of the argument list
-        for arg in theargs:
-            argval = arg.split("=")
-            # Flags get an empty value
-            if len(argval) == 1:
-                argval.append("")
-            self.parameters[argval[0]] = argval[1]
+        # Not a pipeline, so build the object from the parsed parameters
+        step = steps[0]
+        self.parameters = dict(step.parameters)
+        id = self.parameters["_name"]
 
         method = ctx.operator_method(id)
         if method is None:
-            raise NameError(f"Unknown OperatorMethod '{id}'  in '{definition}'")
+            where = step.location()
+            raise NameError(
+                f"Unknown OperatorMethod '{id}' at {where} in '{step.source}'"
+            )
         self.forward_function = method.forward()
         self.inverse_function = method.inverse()
-        self.prepared = method.prepare(self.parameters)
+        self.forward_batch_function = method.forward_batch()
+        self.inverse_batch_function = method.inverse_batch()
+        self.affine_function = method.affine
+        # Read-only, since operators may be shared by several threads
+        self.prepared = MappingProxyType(method.prepare(self.parameters))
+        self.plan = self._compile()
 
         return
 
+    # Operators are pickled without their context, and without their plan, which
+    # is compiled anew when unpickling. The kernels are pickled by reference, so
+    # they must be importable, i.e. defined at module level
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state["ctx"], state["plan"]
+        if "prepared" in state:
+            state["prepared"] = dict(state["prepared"])
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.ctx = None
+        if "prepared" in state:
+            self.prepared = MappingProxyType(state["prepared"])
+        self.plan = self._compile()
+
     @property
     def is_noop(self) -> bool:
         return self.parameters["_name"] == "pipeline" and len(self.steps) == 0
@@ -160,15 +198,58 @@ class Operator(RegisterItem):
         return OperatorMethod.parameter_as_strs(self.parameters, param, mask)
 
     def fwd(self, ctx: Context, operands: CoordinateSet) -> int:
-        if self.omit_forward:
-            return len(operands)
-        if self.inverted:
-            return self.inverse_function(self, ctx, operands)
-        return self.forward_function(self, ctx, operands)
+        return self.plan.fwd(ctx, operands)
 
     def inv(self, ctx: Context, operands: CoordinateSet) -> int:
-        if self.omit_inverse:
-            return len(operands)
+        return self.plan.inv(ctx, operands)
+
+    def _compile(self) -> Plan:
+        """Resolve the callables carrying out the operator in each direction"""
+        forward = self._bind(self.forward_function, self.forward_batch_function)
+        inverse = self._bind(self.inverse_function, self.inverse_batch_function)
         if self.inverted:
-            return self.forward_function(self, ctx, operands)
-        return self.inverse_function(self, ctx, operands)
+            forward, inverse = inverse, forward
+        # Omission refers to the direction of the step, after inversion
+        if self.omit_forward:
+            forward = _skip
+        if self.omit_inverse:
+            inverse = _skip
+        forward_steps = self.forward_steps
+        inverse_steps = tuple(reversed(self.inverse_steps))
+        return Plan(
+            forward,
+            inverse,
+            tuple(step.plan.fwd for step in forward_steps),
+            tuple(step.plan.inv for step in inverse_steps),
+            tuple(_label(i, step) for i, step in enumerate(forward_steps)),
+            tuple(_label(i, step) for i, step in enumerate(inverse_steps)),
+        )
+
+    def _bind(self, function: Callable | None, batch_function: Callable | None):
+        """Bind the kernel functions to the operator. If we have a batch kernel, it
+        is used whenever the operands provide array storage for it to work on.
+        Otherwise we fall back to the tuple-by-tuple one"""
+        if function is None:
+            return partial(_not_invertible, self.parameters["_name"])
+        if batch_function is None:
+            return partial(function, self)
+
+        def dispatch(ctx: Context, operands: CoordinateSet) -> int:
+            columns = operands.columns()
+            if columns is not None:
+                return batch_function(self, ctx, columns)
+            return function(self, ctx, operands)
+
+        return dispatch
+
+
+def _label(position: int, step: "Operator") -> str:
+    return f"{position}: {step.normalized_definition}"
+
+
+def _skip(_ctx: Context, operands: CoordinateSet) -> int:
+    return len(operands)
+
+
+def _not_invertible(name: str, _ctx: Context, _operands: CoordinateSet) -> int:
+    raise ValueError(f"{name}: Operator has no inverse")
@@ -6,13 +6,28 @@ from math import isnan
 
 @dataclass(frozen=True, kw_only=True)
 class OperatorMethod(RegisterItem):
-    """For description and representation of the fwd/inv functionality of an operator method"""
+    """For description and representation of the fwd/inv functionality of an operator method
+
+    The `fwd` and `inv` functions operate on a CoordinateSet through its tuple-by-tuple
+    `get`/`set` protocol. Optionally, `fwd_batch` and `inv_batch` provide batch kernels,
+    operating on the list of column arrays returned by `CoordinateSet.columns()`.
+    The batch kernels are used whenever the operands provide array storage, and the
+    plain functions otherwise.
+
+    Methods which are affine in the first three coordinates may provide `affine`,
+    returning the `Affine` representation of an instantiated operator's forward
+    operation (or None, if not affine for the given parameters). This allows the
+    pipeline optimizer to merge consecutive affine steps into one.
+    """
 
     id: str
     description: str = ""
     fwd: Callable
     inv: Callable | None = None
     prep: Callable | None = None
+    fwd_batch: Callable | None = None
+    inv_batch: Callable | None = None
+    affine: Callable | None = None
 
     @property
     def invertible(self) -> bool:
@@ -24,6 +39,12 @@ class OperatorMethod(RegisterItem):
     def inverse(self) -> Callable | None:
         return self.inv
 
+    def forward_batch(self) -> Callable | None:
+        return self.fwd_batch
+
+    def inverse_batch(self) -> Callable | None:
+        return self.inv_batch
+
     def prepare(self, parameters: dict[str, str]) -> dict[str, Any]:
         if self.prep is not None:
             return self.prep(parameters)
@@ -0,0 +1,177 @@
+"""
+Pipeline optimization
+
+Machine generated pipelines, e.g. chaining CRS conversions, are typically full of
+redundancies, each costing a full pass over the data. Here we remove them by
+rewriting the list of steps, separately for each direction of execution:
+
+- Steps omitted in the given direction are dropped, as are empty sub-pipelines
+- Adjacent pairs of mutually inverse steps (e.g. `cart inv | cart`, with identical
+  parameters) cancel each other out
+- Runs of consecutive affine steps (e.g. `helmert`, `geo`, `ne`) are merged into
+  one `affine` step. If that turns out to be the identity, it is dropped entirely
+
+The optimized pipeline is mathematically equivalent to the original, but not
+necessarily bit-for-bit identical, as merging affine steps changes the rounding.
+The affine kernels skip the zero terms of the matrix, so NaN coordinate elements
+do not spread to elements not depending on them: A NaN height stays in the height,
+also when the merged steps swap or scale the horizontal axes.
+"""
+
+from .affine import Affine
+from .context import Context, OpDirection
+
+# Modifiers are not part of what defines the operation of a step
+MODIFIERS = ("inv", "omit_fwd", "omit_inv")
+
+
+def optimize(steps: tuple, direction: OpDirection, ctx: Context) -> tuple:
+    """The optimized version of the pipeline `steps`, for execution in `direction`.
+
+    Steps are returned in pipeline order, i.e. for execution in reverse order
+    in the inverse direction."""
+    steps = _live(steps, direction)
+
+    # Merging may drop identities, exposing new inverse pairs, hence the loop
+    while True:
+        n = len(steps)
+        steps = _merge(_cancel(steps), direction, ctx)
+        if len(steps) == n:
+            return tuple(steps)
+
+
+# Drop dead steps and empty sub-pipelines, flatten the non-empty ones
+def _live(steps, direction: OpDirection) -> list:
+    live = []
+    for step in steps:
+        if step.omit_forward if direction == OpDirection.FWD else step.omit_inverse:
+            continue
+        if step.parameters["_name"] == "pipeline":
+            if step.is_noop:
+                continue
+            if not step.inverted:
+                live.extend(_live(step.steps, direction))
+                continue
+        live.append(step)
+    return live
+
+
+# Are `a` and `b` each other's inverses?
+def _inverse_pair(a, b) -> bool:
+    if a.parameters["_name"] == "pipeline" or a.inverted == b.inverted:
+        return False
+    if a.forward_function is None or a.inverse_function is None:
+        return False
+    return _definition(a) == _definition(b)
+
+
+def _definition(step) -> dict:
+    return {k: v for k, v in step.parameters.items() if k not in MODIFIERS}
+
+
+# Cancel out adjacent inverse pairs. Cancellation may expose new adjacent pairs,
+# as in `a | b | inv b | inv a`, hence the stack
+def _cancel(steps: list) -> list:
+    stack = []
+    for step in steps:
+        if stack and _inverse_pair(stack[-1], step):
+            stack.pop()
+            continue
+        stack.append(step)
+    return stack
+
+
+# The affine transformation actually carried out by `step`, when executed in
+# `direction`, or None if not affine
+def _effective_affine(step, direction: OpDirection) -> Affine | None:
+    if step.affine_function is None:
+        return None
+    affine = step.affine_function(step)
+    if affine is None:
+        return None
+    if (direction == OpDirection.INV) != step.inverted:
+        try:
+            return affine.inverse()
+        except ZeroDivisionError:
+            return None
+    return affine
+
+
+# Merge runs of consecutive affine steps into single `affine` steps
+def _merge(steps: list, direction: OpDirection, ctx: Context) -> list:
+    # Work in order of execution
+    if direction == OpDirection.INV:
+        steps = steps[::-1]
+
+    merged = []
+    run = []
+    for step in steps + [None]:
+        affine = None if step is None else _effective_affine(step, direction)
+        if affine is not None:
+            run.append((step, affine))
+            continue
+        merged.extend(_merged_run(run, direction, ctx))
+        run = []
+        if step is not None:
+            merged.append(step)
+
+    if direction == OpDirection.INV:
+        merged.reverse()
+    return merged
+
+
+def _merged_run(run: list, direction: OpDirection, ctx: Context) -> list:
+    if len(run) == 0:
+        return []
+    if len(run) == 1:
+        step, affine = run[0]
+        return [] if affine.is_identity else [step]
+
+    # Looked up only now, as loading the method costs more than most pipelines
+    # without a run to merge take to instantiate
+    if ctx.operator_method("affine") is None:
+        return [step for step, _ in run]
+
+    # Data of fewer than 3 dimensions see each step as the restricted version of
+    # the full 3D affine. So for these, we compose the restricted versions
+    composed = {}
+    for k in (3, 2, 1):
+        total = Affine()
+        for _, affine in run:
+            total = total.then(affine if k == 3 else affine.restricted(k))
+        composed[k] = total
+
+    full = composed[3]
+    if (
+        composed[3].is_identity
+        and composed[2].is_identity
+        and (full.planar or composed[1].is_identity)
+    ):
+        return []
+
+    definition = ["affine", _parameter("matrix", full.matrix, 3)]
+    definition.append(_parameter("translation", [full.translation], 3))
+    for k in (2,) if full.planar else (2, 1):
+        if composed[k] != full.restricted(k):
+            definition.append(_parameter(f"matrix_{k}d", composed[k].matrix, k))
+            translation = [composed[k].translation]
+            definition.append(_parameter(f"translation_{k}d", translation, k))
+    if full.planar:
+        definition.append("planar")
+
+    # In the inverse direction, the step is executed using its inverse operation,
+    # so we must give it in inverted form
+    if direction == OpDirection.INV:
+        definition.insert(0, "inv")
+
+    step = run[0][0]
+    return [type(step)(" ".join(definition), step.ctx)]
+
+
+# Render the upper left k x k part of `rows` as a parameter. For a translation,
+# `rows` is a single row, of which we render the first k elements
+def _parameter(name: str, rows, k: int) -> str:
+    values = [
+        repr(float(rows[i][j])) for i in range(min(k, len(rows))) for j in range(k)
+    ]
+    return f"{name}={','.join(values)}"
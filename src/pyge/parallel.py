@@ -0,0 +1,137 @@
+"""
+Parallel application of operators, using a pool of worker processes
+
+The interpreter lock confines the tuple-by-tuple kernels to a single core, so to
+put more cores to work, we need more processes. A `ProcessPool` runs one operator
+in a pool of workers, each instantiating the operator once, at startup. For each
+`apply()`, the coordinates are copied into a block of shared memory, split into
+row ranges, transformed by the workers in place, and copied back. If NumPy is
+available, the copying is column-wise, and the workers use the batch kernels.
+
+    with ProcessPool(ctx, ctx.op("utm zone=32")) as pool:
+        pool.apply(OpDirection.FWD, operands)
+
+The operator is shipped to the workers fully instantiated, as warm-start data
+(see `MinimalContext.dumps()`), so the kernels of user defined operator methods
+must be picklable, i.e. defined at module level.
+"""
+
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from os import cpu_count
+from typing import TYPE_CHECKING
+
+from .context import OpDirection, OpHandle
+from .coordinateset import CoordinateSet
+from .coordinateset_buffer import CoordinateSetBuffer
+from .minimal import MinimalContext
+
+if TYPE_CHECKING:
+    # typing.Self is new in Python 3.11
+    if sys.version_info >= (3, 11):
+        from typing import Self
+    else:
+        from typing_extensions import Self
+
+# Each worker is given this many row ranges per apply, on average, to even out
+# differences in progress
+RANGES_PER_WORKER = 4
+
+# The context and operator of the current worker process, set by `_initialize()`
+_worker_ctx = None
+_worker_op = None
+
+
+class ProcessPool:
+    """A pool of `processes` (default: one per core) worker processes, each
+    holding its own instantiation of the operator `op` of the context `ctx`"""
+
+    def __init__(self, ctx: MinimalContext, op: OpHandle, processes: int | None = None):
+        if op not in ctx.ops:
+            raise ValueError("ProcessPool: Unknown operator handle")
+        self.processes = processes or cpu_count() or 1
+        definition = ctx.ops[op].normalized_definition
+        self.executor = ProcessPoolExecutor(
+            self.processes,
+            initializer=_initialize,
+            initargs=(ctx.dumps([op]), definition),
+        )
+
+    def apply(self, direction: OpDirection, operands: CoordinateSet) -> int:
+        """Apply the operator to `operands` in direction `FWD` or `INV`"""
+        n, dim = len(operands), operands.dim()
+        if n == 0:
+            return 0
+
+        block = shared_memory.SharedMemory(create=True, size=n * dim * 8)
+        shared = CoordinateSetBuffer(block.buf, dim, n)
+        try:
+            _copy(operands, shared)
+
+            ranges = self.processes * RANGES_PER_WORKER
+            step = -(-n // ranges)
+            futures = [
+                self.executor.submit(
+                    _apply, block.name, n, dim, start, min(start + step, n), direction
+                )
+                for start in range(0, n, step)
+            ]
+            successes = sum(future.result() for future in futures)
+
+            _copy(shared, operands)
+            return successes
+        finally:
+            _close(block, shared)
+            block.unlink()
+
+    def close(self):
+        """Shut down the worker processes"""
+        self.executor.shutdown()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+# Copy all coordinate tuples from `source` to `target`, array-at-a-time if possible
+def _copy(source: CoordinateSet, target: CoordinateSet):
+    source_columns, target_columns = source.columns(), target.columns()
+    if source_columns is not None and target_columns is not None:
+        for s, t in zip(source_columns, target_columns):
+            t[...] = s
+        return
+    for i in range(len(source)):
+        target[i] = source[i]
+
+
+def _initialize(warm_start: bytes, definition: str):
+    global _worker_ctx, _worker_op
+    _worker_ctx = MinimalContext()
+    _worker_ctx.loads(warm_start)
+    _worker_op = _worker_ctx.op(definition)
+
+
+def _apply(
+    name: str, n: int, dim: int, start: int, stop: int, direction: OpDirection
+) -> int:
+    block = shared_memory.SharedMemory(name=name)
+    shared = CoordinateSetBuffer(block.buf, dim, n)
+    try:
+        return _worker_ctx.apply(_worker_op, direction, shared.slice(start, stop))
+    finally:
+        _close(block, shared)
+
+
+# Close our mapping of a shared memory block, and the view of it. That fails while
+# views of the view are still alive, as when an exception is on its way up, holding
+# on to the stack frames of the kernels. Then we leave the mapping to the garbage
+# collector, rather than masking the exception
+def _close(block: shared_memory.SharedMemory, shared: CoordinateSetBuffer):
+    try:
+        shared.release()
+        block.close()
+    except BufferError:
+        pass
@@ -0,0 +1,165 @@
+"""
+Parsing of operator definitions
+
+We use the Rust Geodesy syntax: A definition consists of zero or more steps,
+separated by the vertical bar ("pipe") character. Each step consists of an
+operator method name, and parameters, separated by whitespace. Parameters are
+either flags (`south`), or key-value pairs (`zone=32`), where whitespace around
+the syntactical elements `=`, `,`, `.` and `:` is insignificant. The modifiers
+`inv`, `omit_fwd` and `omit_inv` may go anywhere in a step. Text from `#` to the
+end of the line is a comment. Empty steps are dropped, so the empty definition
+has zero steps.
+
+`parse_definition()` turns a definition into the normalized form of each step,
+along with its parameters, in one go, so pipelines need not parse their steps
+again. The normalization itself is carried out by the `str` methods, which are
+implemented in C, and outrun any character-by-character scanner written in
+Python. The positions needed for error messages are only worked out when there
+is an error to report, by scanning the definition once more, token by token.
+"""
+
+import re
+from dataclasses import dataclass
+
+# The modifiers, which may be given anywhere in a step
+MODIFIERS = ("inv", "omit_fwd", "omit_inv")
+
+# The characters joining their neighbours, ignoring any whitespace in between
+JOINERS = "=,.:"
+
+# Comments, step separators, joiners, and runs of anything else but whitespace.
+# Whitespace is skipped by not being matched
+_TOKENS = re.compile(r"#[^\n\r]*|\||[=,.:]|[^\s|#=,.:]+")
+
+
+@dataclass(frozen=True, slots=True)
+class Step:
+    """One step of a parsed definition: Its normalized form, its parameters,
+    including the operator method name as `_name`, and its index among the steps
+    of the `source` definition"""
+
+    definition: str
+    parameters: dict[str, str]
+    index: int
+    source: str
+
+    def location(self, word: int = 0) -> str:
+        """Human readable location of word number `word` of the step, in the
+        source definition"""
+        return location(self.source, _positions(self.source)[self.index][word])
+
+
+def parse_definition(definition: str) -> list[Step]:
+    """Parse `definition` into its non-empty steps"""
+    return [
+        _parse_step(step, index, definition)
+        for index, step in enumerate(split_definition(definition))
+    ]
+
+
+def split_definition(definition: str) -> list[str]:
+    """Split `definition` into its non-empty steps, each in normalized form"""
+    text = definition
+    if "#" in text:
+        lines = text.replace("\r", "\n").split("\n")
+        text = "\n".join(line.split("#", 1)[0] for line in lines)
+
+    # Collapse whitespace to single spaces, so there is at most one space on
+    # either side of the separators and joiners
+    text = " ".join(text.split())
+    for separator in "|" + JOINERS:
+        if separator in text:
+            text = text.replace(" " + separator, separator)
+            text = text.replace(separator + " ", separator)
+    return [step for step in text.split("|") if step]
+
+
+def normalize_definition(definition: str) -> str:
+    """The normalized form of `definition`: Comments removed, whitespace collapsed,
+    and the steps separated by `" | "`. Definitions differing only in layout
+    normalize to the same string"""
+    return " | ".join(split_definition(definition))
+
+
+def invert_definition(definition: str) -> str:
+    """The normalized definition of the inverse of `definition`: The steps in
+    reverse order, each with `inv` toggled, and `omit_fwd` and `omit_inv` swapped"""
+    swapped = {"omit_fwd": "omit_inv", "omit_inv": "omit_fwd"}
+    steps = []
+    for step in reversed(split_definition(definition)):
+        words = [swapped.get(word, word) for word in step.split(" ")]
+        if "inv" in words:
+            words.remove("inv")
+        else:
+            words.insert(0, "inv")
+        steps.append(" ".join(words))
+    return " | ".join(steps)
+
+
+def location(source: str, position: int) -> str:
+    """Human readable description of `position` in `source`"""
+    column = position - source.rfind("\n", 0, position)
+    if "\n" not in source:
+        return f"column {column}"
+    line = source.count("\n", 0, position) + 1
+    return f"line {line}, column {column}"
+
+
+def _parse_step(definition: str, index: int, source: str) -> Step:
+    words = definition.split(" ")
+    numbers = list(range(len(words)))
+
+    def fail(message: str, word: int):
+        where = location(source, _positions(source)[index][word])
+        raise ValueError(f"{message} at {where} in '{source}'")
+
+    # All modifiers are moved out of the way, to ensure that the operator name is
+    # the first of the remaining words. The operator name foo is then handled
+    # as if given as "_name=foo", in alignment with the general style of the
+    # argument list
+    parameters = {}
+    for modifier in MODIFIERS:
+        if modifier in words:
+            i = words.index(modifier)
+            del words[i], numbers[i]
+            parameters[modifier] = ""
+    if not words:
+        fail("Missing operator name", 0)
+    if "=" in words[0]:
+        fail("Expected operator name", numbers[0])
+    parameters["_name"] = words[0]
+
+    for word, number in zip(words[1:], numbers[1:]):
+        key, _, value = word.partition("=")
+        if "=" in value:
+            fail(f"Repeated '=' in '{word}'", number)
+        # Flags get an empty value
+        parameters[key] = value
+
+    return Step(definition, parameters, index, source)
+
+
+# The positions in `definition` of the words of each step. This scans the
+# definition token by token, and is only used for error messages
+def _positions(definition: str) -> list[list[int]]:
+    steps = []
+    words = []
+    # Whether the next token continues the current word, i.e. follows a joiner
+    glue = False
+    for match in _TOKENS.finditer(definition):
+        token = match.group()
+        if token[0] == "#":
+            continue
+        if token == "|":
+            if words:
+                steps.append(words)
+                words = []
+            glue = False
+            continue
+        joiner = token in JOINERS
+        if not words or not (glue or joiner):
+            words.append(match.start())
+        glue = joiner
+    if words:
+        steps.append(words)
+    return steps
@@ -0,0 +1,161 @@
+"""
+Planning of transformations between CRSs
+
+Each `Crs` may name a parent CRS, and give the operator definition taking its
+coordinates to the parent (`to_parent`). The CRSs thereby form a forest, in which
+the route from a source to a target CRS goes up from the source to the nearest
+common ancestor, and back down to the target, using the inverse definitions on
+the way down.
+
+Compound CRSs with their own parent are handled as any other CRS. Otherwise, the
+route between two compound CRSs with the same number of parts is the routes
+between the corresponding parts, one after the other. As each part's definitions
+operate on the full coordinate tuple, touching only the axes of the part, this
+amounts to the concatenation of the part pipelines.
+
+Planning, and parsing the resulting definition, are done only once per pair of
+registered CRSs: The compiled operators are cached by `(source, target)`, so
+services handling the same few CRS pairs request after request go straight to
+`apply()`.
+"""
+
+from collections.abc import Iterable
+from threading import Lock
+
+from .context import Context, OpHandle
+from .crs import Crs
+from .parser import invert_definition, normalize_definition
+
+
+class Planner:
+    """
+    Transformations between the CRSs registered with the planner, instantiated in
+    the context `ctx`.
+
+    `op(source, target)` gives the handle of the operator taking coordinates
+    referred to `source`, to `target`. The handles are owned by the planner, and
+    stay valid until `clear()`, or until a CRS is registered anew, after which
+    the pairs involved are planned anew. Like the context, the planner may be used
+    from several threads concurrently: Lookups take no locks, as the `plans` dict
+    is never modified, but replaced by modified copies.
+    """
+
+    def __init__(self, ctx: Context, crss: Iterable[Crs] = ()):
+        self.ctx = ctx
+        self.crss: dict[str, Crs] = {}
+        # (source id, target id) -> handle
+        self.plans: dict[tuple[str, str], OpHandle] = {}
+        self.lock = Lock()
+        # Incremented when registering CRSs, to detect concurrent invalidation
+        self.generation = 0
+        for crs in crss:
+            self.register(crs)
+
+    def register(self, crs: Crs):
+        """Add `crs`, or replace the CRS of the same id"""
+        with self.lock:
+            self.crss = {**self.crss, crs.id: crs}
+            self.generation += 1
+            # A replaced CRS may change any route through it
+            if self.plans:
+                self._clear()
+
+    def crs(self, id: str) -> Crs:
+        """The registered CRS named `id`"""
+        crs = self.crss.get(id)
+        if crs is None:
+            raise NameError(f"Unknown CRS '{id}'")
+        return crs
+
+    def definition(self, source: Crs | str, target: Crs | str) -> str:
+        """The normalized operator definition taking coordinates referred to
+        `source`, to `target`, where the CRSs are given as ids, or as CRSs,
+        possibly unregistered, whose ancestors are registered"""
+        source, target = self._resolve(source), self._resolve(target)
+        return normalize_definition(" | ".join(self._route(source, target)))
+
+    def op(self, source: Crs | str, target: Crs | str) -> OpHandle | None:
+        """The handle of the operator taking coordinates referred to `source`, to
+        `target`, planned and instantiated on first use, and cached by the ids of
+        the CRSs. Hence, the CRSs must be registered, and given by id, or as the
+        registered instances. For other CRSs, use `ctx.op(definition(...))`"""
+        key = (self._registered(source), self._registered(target))
+        while True:
+            handle = self.plans.get(key)
+            if handle is not None:
+                return handle
+            generation = self.generation
+
+            # Plan and instantiate outside of the lock, so other threads are not
+            # held up
+            handle = self.ctx.op(self.definition(source, target))
+            if handle is None:
+                return None
+            with self.lock:
+                # CRSs registered meanwhile may change the route, and another
+                # thread may have beaten us to it. Either way, we give back ours
+                cached = self.plans.get(key)
+                if cached is None and self.generation == generation:
+                    self.plans = {**self.plans, key: handle}
+                    return handle
+            self.ctx.release(handle)
+
+    def clear(self):
+        """Forget all plans, and give back their operators to the context"""
+        with self.lock:
+            self._clear()
+
+    # Call with the lock held
+    def _clear(self):
+        plans, self.plans = self.plans, {}
+        for handle in plans.values():
+            self.ctx.release(handle)
+
+    # The id of `crs`, which must be registered
+    def _registered(self, crs: Crs | str) -> str:
+        if isinstance(crs, str):
+            return self.crs(crs).id
+        if self.crss.get(crs.id) is not crs:
+            raise ValueError(f"CRS '{crs.id}' is not the one registered by that id")
+        return crs.id
+
+    def _resolve(self, crs: Crs | str) -> Crs:
+        return self.crs(crs) if isinstance(crs, str) else crs
+
+    # The CRS itself, and its ancestors, nearest first
+    def _lineage(self, crs: Crs) -> list[Crs]:
+        lineage = [crs]
+        ids = {crs.id}
+        while crs.parent_id is not None:
+            if crs.parent_id in ids:
+                raise ValueError(f"Circular parent_id of CRS '{crs.id}'")
+            crs = self.crs(crs.parent_id)
+            lineage.append(crs)
+            ids.add(crs.id)
+        return lineage
+
+    # The definitions making up the route from `source` to `target`
+    def _route(self, source: Crs, target: Crs) -> list[str]:
+        up = self._lineage(source)
+        down = self._lineage(target)
+        ids = [crs.id for crs in up]
+        for j, crs in enumerate(down):
+            if crs.id in ids:
+                i = ids.index(crs.id)
+                return [_to_parent(c) for c in up[0:i]] + [
+                    invert_definition(_to_parent(c)) for c in reversed(down[0:j])
+                ]
+
+        # No common ancestor, so we try part by part
+        if source.len() > 0 and source.len() == target.len():
+            steps = []
+            for a, b in zip(source.parts, target.parts):
+                steps += self._route(self._resolve(a), self._resolve(b))
+            return steps
+        raise ValueError(f"No route from CRS '{source.id}' to '{target.id}'")
+
+
+def _to_parent(crs: Crs) -> str:
+    if crs.to_parent is None:
+        raise ValueError(f"CRS '{crs.id}' has no definition for its parent_id")
+    return crs.to_parent
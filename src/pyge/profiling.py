@@ -0,0 +1,95 @@
+"""
+Opt-in instrumentation of operator application
+
+A `Profiler` attached to a context records, for each operator applied and for
+each step of each pipeline, the number of calls, the number of coordinate tuples
+operated on, the number of failures (tuples not successfully transformed), and
+the wall time spent.
+
+    ctx = MinimalContext(profiler=Profiler())
+    ctx.apply(ctx.op("geo | utm zone=32 | ne"), OpDirection.FWD, operands)
+    for path, stats in ctx.stats().items():
+        print(" / ".join(path), stats)
+
+The statistics are keyed by their path through the pipeline tree: The operator
+applied, with its direction, followed by the steps leading to the one measured,
+as in `("fwd: geo | utm zone=32 | ne", "1: utm zone=32")`. Steps are labelled by
+their position in order of execution, and their definition, after optimization.
+
+Without a profiler, nothing is recorded, and the cost is a single attribute
+lookup per application of an operator, and per pipeline.
+"""
+
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from threading import Lock
+from time import perf_counter
+
+from .context import Context
+from .coordinateset import CoordinateSet
+
+
+@dataclass(slots=True)
+class StepStats:
+    """Accumulated statistics for one node of the pipeline tree"""
+
+    calls: int = 0
+    points: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+
+
+class Profiler:
+    """Collects `StepStats` by path through the pipeline tree. If given, the
+    `callback` is called with the path and the `StepStats` of each individual call,
+    e.g. for exporting them to a metrics system. Safe for concurrent use"""
+
+    def __init__(
+        self, callback: Callable[[tuple[str, ...], StepStats], None] | None = None
+    ):
+        self.callback = callback
+        self.lock = Lock()
+        self.records: dict[tuple[str, ...], StepStats] = {}
+        # The path of the step currently being carried out, per thread and task
+        self.path: ContextVar[tuple[str, ...]] = ContextVar("path", default=())
+
+    def run(
+        self,
+        label: str,
+        function: Callable[[Context, CoordinateSet], int],
+        ctx: Context,
+        operands: CoordinateSet,
+    ) -> int:
+        """Carry out `function(ctx, operands)`, recording its statistics under
+        `label`, below the path of the step currently being carried out"""
+        path = self.path.get() + (label,)
+        token = self.path.set(path)
+        start = perf_counter()
+        try:
+            successes = function(ctx, operands)
+        finally:
+            self.path.reset(token)
+        seconds = perf_counter() - start
+
+        n = len(operands)
+        record = StepStats(1, n, max(n - successes, 0), seconds)
+        with self.lock:
+            total = self.records.setdefault(path, StepStats())
+            total.calls += 1
+            total.points += record.points
+            total.failures += record.failures
+            total.seconds += record.seconds
+        if self.callback is not None:
+            self.callback(path, record)
+        return successes
+
+    def stats(self) -> dict[tuple[str, ...], StepStats]:
+        """A snapshot of the statistics recorded so far"""
+        with self.lock:
+            return {path: replace(stats) for path, stats in self.records.items()}
+
+    def reset(self):
+        """Forget the statistics recorded so far"""
+        with self.lock:
+            self.records = {}
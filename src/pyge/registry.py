@@ -0,0 +1,87 @@
+"""
+Lazy registries of operator methods
+
+Importing an operator method means importing its module, and whatever that
+module imports (NumPy, for the batch kernels). Short-lived processes using only
+a few methods should not pay for all of them, so the registries map method names
+to where the methods live, and import them on first use.
+
+The builtin methods are listed in `pyge.builtin_operator_methods`. Methods from
+third party packages are discovered through the `pyge.operator_methods` entry
+point group, e.g. in the `pyproject.toml` of the package:
+
+    [project.entry-points."pyge.operator_methods"]
+    molodensky = "pyge_extras.molodensky:molodensky"
+
+where the entry point name is the method id, and the object referenced is its
+`OperatorMethod`. Entry points are only looked for when a method name is not
+found among the user defined and builtin methods.
+"""
+
+from collections.abc import Callable, Iterator, Mapping
+from importlib import import_module
+
+from .operator_method import OperatorMethod
+
+ENTRY_POINT_GROUP = "pyge.operator_methods"
+
+
+class LazyRegistry(Mapping):
+    """A read-only mapping of method ids to OperatorMethods, where `discover()`
+    gives, for each id, a function loading the method. Discovery is deferred to
+    the first use of the registry, and loading to the first lookup of each id"""
+
+    def __init__(self, discover: Callable[[], dict[str, Callable[[], OperatorMethod]]]):
+        self.discover = discover
+        self.loaders: dict[str, Callable[[], OperatorMethod]] | None = None
+        self.loaded: dict[str, OperatorMethod] = {}
+
+    def _loaders(self) -> dict[str, Callable[[], OperatorMethod]]:
+        if self.loaders is None:
+            self.loaders = self.discover()
+        return self.loaders
+
+    def __getitem__(self, id: str) -> OperatorMethod:
+        method = self.loaded.get(id)
+        if method is None:
+            method = self._loaders()[id]()
+            self.loaded[id] = method
+        return method
+
+    def __contains__(self, id: object) -> bool:
+        return id in self._loaders()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._loaders())
+
+    def __len__(self) -> int:
+        return len(self._loaders())
+
+
+def module_attributes(
+    package: str, attributes: dict[str, tuple[str, str]]
+) -> Callable[[], dict[str, Callable[[], OperatorMethod]]]:
+    """Discovery of methods given as `id: (module, attribute)`, with the modules
+    relative to `package`"""
+
+    def load(module: str, attribute: str) -> OperatorMethod:
+        return getattr(import_module(f".{module}", package), attribute)
+
+    def discover() -> dict[str, Callable[[], OperatorMethod]]:
+        return {
+            id: (lambda m=module, a=attribute: load(m, a))
+            for id, (module, attribute) in attributes.items()
+        }
+
+    return discover
+
+
+def entry_point_methods() -> dict[str, Callable[[], OperatorMethod]]:
+    """Discovery of methods through the `pyge.operator_methods` entry point group"""
+    from importlib.metadata import entry_points
+
+    return {ep.name: ep.load for ep in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+# Operator methods provided by third party packages
+plugin_operator_methods = LazyRegistry(entry_point_methods)
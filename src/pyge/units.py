@@ -28,9 +28,44 @@ class Unit:
 
 
 UNITS: dict[str, Unit] = {
+    # Linear units, with the US survey units as defined by the Mendenhall order
+    "km": Unit("kilometer", Dimension.LINEAR, 1000),
     "m": Unit("meter", Dimension.LINEAR, 1),
+    "dm": Unit("decimeter", Dimension.LINEAR, 0.1),
+    "cm": Unit("centimeter", Dimension.LINEAR, 0.01),
+    "mm": Unit("millimeter", Dimension.LINEAR, 0.001),
+    "in": Unit("inch", Dimension.LINEAR, 0.0254),
     "ft": Unit("foot", Dimension.LINEAR, 0.3048),
+    "yd": Unit("yard", Dimension.LINEAR, 0.9144),
+    "ch": Unit("chain", Dimension.LINEAR, 20.1168),
+    "mi": Unit("mile", Dimension.LINEAR, 1609.344),
+    "nmi": Unit("nautical mile", Dimension.LINEAR, 1852),
+    "us-in": Unit("US survey inch", Dimension.LINEAR, 100 / 3937),
+    "us-ft": Unit("US survey foot", Dimension.LINEAR, 1200 / 3937),
+    "us-yd": Unit("US survey yard", Dimension.LINEAR, 3600 / 3937),
+    "us-ch": Unit("US survey chain", Dimension.LINEAR, 79200 / 3937),
+    "us-mi": Unit("US survey mile", Dimension.LINEAR, 6336000 / 3937),
+    # Angular units
+    "rad": Unit("radian", Dimension.ANGULAR, 1),
+    "mrad": Unit("milliradian", Dimension.ANGULAR, 1e-3),
+    "urad": Unit("microradian", Dimension.ANGULAR, 1e-6),
     "deg": Unit("degree", Dimension.ANGULAR, pi / 180),
+    "arcmin": Unit("arc minute", Dimension.ANGULAR, pi / 10_800),
+    "arcsec": Unit("arc second", Dimension.ANGULAR, pi / 648_000),
     "gon": Unit("grad", Dimension.ANGULAR, pi / 200),
+    # Temporal units
     "a": Unit("year", Dimension.TEMPORAL, 1),
 }
+
+
+def conversion(source: str, target: str) -> tuple[float, float]:
+    """The scale and offset converting values in the unit `source` into the unit
+    `target`, as `value * scale + offset`, for units given by their keys in UNITS"""
+    for unit in (source, target):
+        if unit not in UNITS:
+            raise ValueError(f"Unknown unit '{unit}'")
+    a, b = UNITS[source], UNITS[target]
+    if a.kind != b.kind:
+        raise ValueError(f"Cannot convert '{source}' into '{target}'")
+    scale = a.scale / b.scale
+    return scale, b.offset - a.offset * scale
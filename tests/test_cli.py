@@ -0,0 +1,65 @@
+from io import StringIO
+from math import dist
+
+from pytest import raises
+
+from cli import kp
+
+
+def test_kp(tmp_path, capsys, monkeypatch):
+    # Whitespace and comma separated input, with comments and blank lines
+    # passed through, so the output lines up with the input
+    geo = tmp_path / "geo.txt"
+    geo.write_text("# Copenhagen\n55 12\n\n55.5, 12.5, 100  # with height\n")
+    kp(["geo | utm zone=32 | ne", "-d", "3", str(geo)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "# Copenhagen"
+    assert lines[1] == "6098907.825 691875.632"
+    assert lines[2] == ""
+    assert len(lines[3].split()) == 3 and lines[3].endswith(" 100.000")
+
+    # The roundtrip, from stdin to a file
+    monkeypatch.setattr("sys.stdin", StringIO("\n".join(lines) + "\n"))
+    utm = tmp_path / "utm.txt"
+    kp(["--inv", "geo | utm zone=32 | ne", "-o", str(utm)])
+    lines = utm.read_text().splitlines()
+    assert dist([float(v) for v in lines[1].split()], [55, 12]) < 1e-8
+    assert dist([float(v) for v in lines[3].split()], [55.5, 12.5, 100]) < 1e-8
+
+    # Errors are reported with the line number
+    geo.write_text("55 12\n55 twelve\n")
+    with raises(SystemExit) as error:
+        kp(["utm zone=32", str(geo)])
+    assert error.value.code == 1
+    assert "line 2" in capsys.readouterr().err
+
+    with raises(SystemExit):
+        kp(["no_such_operator", str(geo)])
+
+
+def test_kp_mixed_dimensions(tmp_path, capsys):
+    # Lines of different dimensions are transformed as if each was on its own,
+    # also when they share a block: A 3D line is not taken to be at t=0
+    definition = "helmert translation=1,2,3 dtranslation=0.1,0.2,0.3 t_epoch=2010"
+    lines = ["3657459.66 3657459.66", "3657459.66 3657459.66 100", "1 2 3 2020"]
+    alone = []
+    for line in lines:
+        single = tmp_path / "single.txt"
+        single.write_text(line + "\n")
+        kp([definition, "-d", "3", str(single)])
+        alone.append(capsys.readouterr().out)
+
+    mixed = tmp_path / "mixed.txt"
+    mixed.write_text("\n".join(lines + lines[::-1]) + "\n")
+    kp([definition, "-d", "3", str(mixed)])
+    out = capsys.readouterr().out
+    assert out == "".join(alone + alone[::-1])
+    assert out.splitlines()[1] == "3657460.660 3657461.660 103.000"
+
+    # ... and 2D lines stay 2D, also through operators treating 3D differently
+    mixed.write_text("55 12\n55 12 100\n")
+    kp(["geo | cart | inv cart | inv geo", "-d", "6", str(mixed)])
+    assert (
+        capsys.readouterr().out
+        == "55.000000 12.000000\n55.000000 12.000000 100.000000\n"
+    )
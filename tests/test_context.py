@@ -1,9 +1,15 @@
+from pyge.chunking import PROBE_INTERVAL, AdaptiveChunkSize
 from pyge.context import Context, OpHandle, OpDirection
 from pyge.coordinateset import CoordinateSet, CoordinateSetRowWise
 from pyge.operator_method import OperatorMethod
 from pyge.operator import Operator
 from pyge.minimal import MinimalContext
-from pytest import raises
+from pyge.profiling import Profiler
+from pytest import raises, importorskip
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pickle
+from math import nan
 
 
 def test_op_handle():
@@ -111,6 +117,375 @@ def test_register_method():
         ctx.op("non_existing_method")
 
 
+def test_operator_cache():
+    ctx = MinimalContext(capacity=2)
+
+    # Definitions differing only in layout share one handle
+    a = ctx.op("addone | inv  addone # a comment")
+    assert a == ctx.op("addone|inv addone")
+    assert ctx.cache_info() == (1, 1, 1, 2)
+
+    # Referenced operators are never evicted, even when over capacity
+    b = ctx.op("addone")
+    c = ctx.op("subone")
+    assert ctx.cache_info().size == 3
+    assert all(handle in ctx.ops for handle in (a, b, c))
+
+    # Released operators stay cached while there is room...
+    ctx.release(c)
+    assert ctx.cache_info().size == 2
+    ctx.release(b)
+    assert ctx.op("addone") == b
+    assert ctx.cache_info().hits == 2
+
+    # ... but once unreferenced, the least recently used ones go first
+    ctx.release(b)
+    ctx.release(a)
+    assert a in ctx.ops
+    ctx.release(a)
+    d = ctx.op("inv subone")
+    assert ctx.cache_info() == (2, 4, 2, 2)
+    assert a not in ctx.ops and b in ctx.ops and d in ctx.ops
+
+    # Releasing unknown handles is harmless
+    ctx.release(a)
+    ctx.release(OpHandle())
+
+    # Registering a method invalidates the cache, but not the live handles
+    ctx.register_operator_method(
+        OperatorMethod(id="addone", fwd=addtwo_forward_function)
+    )
+    assert ctx.op("inv subone") != d
+    assert d in ctx.ops
+    ctx.release(d)
+    assert d not in ctx.ops
+    coord = CoordinateSetRowWise([[1, 2]])
+    ctx.apply(ctx.op("addone"), OpDirection.FWD, coord)
+    assert coord[0][0] == 3
+
+
+def test_batch_dispatch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+    # (the global `addtwo` is overwritten by test_register_method)
+    ctx.register_operator_method(
+        OperatorMethod(
+            id="addtwo", fwd=addtwo_forward_function, inv=addtwo_inverse_function
+        )
+    )
+    addone = ctx.op("addone")
+
+    # Array backed operands go through the batch kernel, everything else
+    # through the tuple-by-tuple kernel. The results are identical
+    rows = np.array([[1, 2, 3, 4], [5, 6, 7, 8]], dtype=np.float64)
+    coord = CoordinateSetNumpy(rows)
+    assert coord.columns() is not None
+    assert CoordinateSetRowWise([[1, 2]]).columns() is None
+    assert 2 == ctx.apply(addone, OpDirection.FWD, coord)
+    assert rows[:, 0].tolist() == [2, 6]
+    assert 2 == ctx.apply(addone, OpDirection.INV, coord)
+    assert rows[:, 0].tolist() == [1, 5]
+
+    # User defined methods without batch kernels still work on array backed
+    # operands, also when mixed with batch enabled steps in a pipeline
+    pipeline = ctx.op("addtwo | inv addone")
+    ctx.apply(pipeline, OpDirection.FWD, coord)
+    assert rows[:, 0].tolist() == [2, 6]
+    ctx.apply(pipeline, OpDirection.INV, coord)
+    assert rows[:, 0].tolist() == [1, 5]
+    assert rows[:, 1].tolist() == [2, 6]
+
+
+def test_apply_stream():
+    ctx = MinimalContext()
+    op = ctx.op("addone | addone")
+
+    # Blocks come from a generator, and are transformed in place, chunk by chunk
+    blocks = [CoordinateSetRowWise([[i, 0.0] for i in range(n)]) for n in (3, 0, 5)]
+    stream = ctx.apply_stream(op, OpDirection.FWD, iter(blocks), chunk_size=2)
+    chunks = [chunk for chunk, _ in stream]
+    assert [len(chunk) for chunk in chunks] == [2, 1, 2, 2, 1]
+    assert [chunk[0][0] for chunk in chunks] == [2, 4, 2, 4, 6]
+    assert blocks[2][4] == [6, 0]
+
+    # Each chunk comes with its number of successes
+    utm = ctx.op("utm zone=32")
+    block = CoordinateSetRowWise([[0.2, 1.0], [nan, 1.0], [0.2, nan], [0.1, 1.0]])
+    stream = ctx.apply_stream(utm, OpDirection.FWD, [block], chunk_size=3)
+    assert [successes for _, successes in stream] == [1, 1]
+
+    # The chunk size must be positive, which is checked before any streaming
+    for chunk_size in (0, -1):
+        with raises(ValueError):
+            ctx.apply_stream(op, OpDirection.FWD, iter(blocks), chunk_size=chunk_size)
+
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    # With automatic chunk sizing, and a mix of storage types
+    def blocks():
+        for i in range(10):
+            yield CoordinateSetNumpy(np.full((10_000, 3), float(i)))
+        yield CoordinateSetRowWise([[1.0, 1.0]])
+
+    n = 0
+    for chunk, successes in ctx.apply_stream(op, OpDirection.INV, blocks()):
+        assert successes == len(chunk)
+        first = chunk[0][0]
+        assert all(chunk[i][0] == first for i in range(len(chunk)))
+        assert chunk[0][1] == chunk[0][0] + 2
+        n += len(chunk)
+    assert n == 100_001
+
+
+def test_threaded_apply():
+    ctx = MinimalContext()
+    op = ctx.op("geo | utm zone=32 | ne")
+    rows = [[55.0 + i / 1000, 12.0 - i / 1000] for i in range(1000)]
+
+    # Chunked and threaded application agree with plain application, also for
+    # operands without array storage
+    plain = CoordinateSetRowWise([list(row) for row in rows])
+    assert 1000 == ctx.apply(op, OpDirection.FWD, plain)
+    for threads, chunk_size in ((None, 300), (4, 300), (4, None), (1, 7)):
+        coord = CoordinateSetRowWise([list(row) for row in rows])
+        assert 1000 == ctx.apply(op, OpDirection.FWD, coord, threads, chunk_size)
+        assert coord.coords == plain.coords
+
+    with raises(ValueError):
+        ctx.apply(op, OpDirection.FWD, plain, threads=0)
+
+    # Closing shuts down the thread pools, and later threaded applications
+    # start new ones
+    pools = list(ctx.thread_pools.values())
+    assert pools
+    ctx.close()
+    assert ctx.thread_pools == {}
+    with raises(RuntimeError):
+        pools[0].submit(print)
+    with MinimalContext() as other:
+        addone = other.op("addone")
+        coord = CoordinateSetRowWise([[1.0, 2.0]] * 10)
+        assert 10 == other.apply(addone, OpDirection.FWD, coord, 2, 5)
+        pool = other.thread_pools[2]
+    assert other.thread_pools == {}
+    with raises(RuntimeError):
+        pool.submit(print)
+
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    array = np.array(rows)
+    expected = array.copy()
+    ctx.apply(op, OpDirection.FWD, CoordinateSetNumpy(expected))
+    assert 1000 == ctx.apply(
+        op, OpDirection.FWD, CoordinateSetNumpy(array), threads=3, chunk_size=100
+    )
+    assert (array == expected).all()
+
+    # Operators are shared read-only
+    with raises(TypeError):
+        ctx.ops[op].steps[1].prepared["k_0"] = 1
+
+
+def test_concurrent_use():
+    ctx = MinimalContext(capacity=4)
+    definitions = [
+        ("addone", 1),
+        ("addone | addone", 2),
+        ("addone|addone", 2),
+        ("inv addone", -1),
+        ("subone | inv subone | addone", 1),
+        ("addone # comment", 1),
+        ("helmert translation=3", 3),
+        ("addone | helmert translation=2 | inv addone", 2),
+    ]
+
+    # Many threads instantiating, applying and releasing operators, while
+    # methods are being registered and the cache is being churned
+    def work(seed: int):
+        for i in range(300):
+            definition, shift = definitions[(seed * 7 + i) % len(definitions)]
+            op = ctx.op(definition)
+            coord = CoordinateSetRowWise([[1.0, 2.0], [3.0, 4.0]])
+            assert 2 == ctx.apply(op, OpDirection.FWD, coord)
+            assert [coord[0][0], coord[1][0]] == [1.0 + shift, 3.0 + shift]
+            ctx.release(op)
+            if seed == 0 and i % 10 == 0:
+                ctx.register_operator_method(
+                    OperatorMethod(id=f"method{i}", fwd=addtwo_forward_function)
+                )
+
+    # Any failure in a worker is re-raised here, by `result()`
+    with ThreadPoolExecutor(16) as pool:
+        futures = [pool.submit(work, seed) for seed in range(16)]
+    for future in futures:
+        future.result()
+
+    info = ctx.cache_info()
+    assert info.size <= info.capacity
+    assert set(ctx.references.values()) <= {0}
+    assert set(ctx.ops) == set(ctx.handles.values())
+    assert ctx.operator_method("method290") is not None
+    assert info.hits + info.misses == 16 * 300
+
+
+def test_async_api():
+    ctx = MinimalContext()
+
+    async def main():
+        op = await ctx.op_async("geo | utm zone=32 | ne")
+        assert op == await ctx.op_async("geo|utm zone=32|ne")
+        rows = [[55.0 + i / 10000, 12.0 - i / 10000] for i in range(20_000)]
+        expected = CoordinateSetRowWise([list(row) for row in rows])
+        ctx.apply(op, OpDirection.FWD, expected)
+
+        # Large sets are transformed in chunks, letting other tasks run meanwhile
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        coord = CoordinateSetRowWise([list(row) for row in rows])
+        n = await ctx.apply_async(op, OpDirection.FWD, coord, chunk_size=1000)
+        task.cancel()
+        assert n == 20_000 and coord.coords == expected.coords
+        assert ticks >= 10
+
+        # Small sets are transformed inline
+        coord = CoordinateSetRowWise([list(row) for row in rows[0:10]])
+        assert 10 == await ctx.apply_async(op, OpDirection.FWD, coord)
+        assert coord.coords == expected.coords[0:10]
+
+        with raises(NameError):
+            await ctx.op_async("non_existing_method")
+
+    asyncio.run(main())
+
+
+def test_adaptive_chunk_size():
+    # Throughput rising with chunk size up to 64k, then falling
+    def seconds(n):
+        return n / min(n, 65536) if n <= 65536 else n / (65536 - (n - 65536) / 8)
+
+    sizer = AdaptiveChunkSize(initial=1024)
+    sizes = []
+    for _ in range(20):
+        n = sizer.size
+        sizer.record(n, seconds(n))
+        sizes.append(sizer.size)
+    assert sizes[5] == 65536
+    assert all(size in (32768, 65536, 131072) for size in sizes[5:])
+
+    # Staying put while the throughput does not change, but probing again now and
+    # then, so the sweet spot is found when it moves
+    sizer = AdaptiveChunkSize(initial=1024)
+    for _ in range(PROBE_INTERVAL):
+        sizer.record(sizer.size, sizer.size / 1e6)
+    assert sizer.size == 2048
+    for _ in range(PROBE_INTERVAL + 5):
+        sizer.record(sizer.size, seconds(sizer.size))
+    assert sizer.size == 65536
+
+    # Partial chunks are not taken into account
+    sizer = AdaptiveChunkSize(initial=1024)
+    sizer.record(10, 1)
+    assert sizer.size == 1024
+
+    # The limits are respected
+    sizer = AdaptiveChunkSize(initial=1024, maximum=2048)
+    for _ in range(5):
+        sizer.record(sizer.size, 1e-6)
+    assert sizer.size == 2048
+
+
+def test_profiling():
+    # Without a profiler, nothing is recorded
+    ctx = MinimalContext()
+    op = ctx.op("geo | utm zone=32 | ne")
+    ctx.apply(op, OpDirection.FWD, CoordinateSetRowWise([[55.0, 12.0]]))
+    assert ctx.stats() == {}
+
+    calls = []
+    ctx.profiler = Profiler(lambda path, stats: calls.append((path, stats)))
+    coords = CoordinateSetRowWise([[55.0, 12.0], [56.0, 13.0], [float("nan"), 0]])
+    ctx.apply(op, OpDirection.FWD, coords)
+    ctx.apply(op, OpDirection.INV, coords)
+    ctx.apply(op, OpDirection.FWD, coords.slice(0, 2))
+
+    # Statistics are recorded per operator applied and direction, and per step,
+    # in order of execution
+    fwd = ("fwd: geo | utm zone=32 | ne",)
+    inv = ("inv: geo | utm zone=32 | ne",)
+    stats = ctx.stats()
+    assert list(stats) == [
+        fwd + ("0: geo",),
+        fwd + ("1: utm zone=32",),
+        fwd + ("2: ne",),
+        fwd,
+        inv + ("0: ne",),
+        inv + ("1: utm zone=32",),
+        inv + ("2: geo",),
+        inv,
+    ]
+    assert (stats[fwd].calls, stats[fwd].points, stats[fwd].failures) == (2, 5, 1)
+    assert stats[fwd + ("1: utm zone=32",)].failures == 1
+    assert stats[fwd + ("2: ne",)].failures == 0
+    assert stats[fwd].seconds >= stats[fwd + ("1: utm zone=32",)].seconds > 0
+
+    # The callback gets the individual calls, inner steps first
+    assert len(calls) == 12
+    assert calls[3][0] == fwd and calls[3][1].points == 3
+
+    # Threaded application is recorded per chunk, under the same path
+    ctx.profiler.reset()
+    ctx.apply(op, OpDirection.FWD, coords, threads=3, chunk_size=1)
+    assert ctx.stats()[fwd].calls == 3
+
+    # ... and the profiler may be detached again
+    ctx.profiler = None
+    ctx.apply(op, OpDirection.FWD, coords)
+    assert ctx.stats() == {}
+
+
+def test_warm_start(tmp_path):
+    ctx = MinimalContext()
+    definitions = ["geo | utm zone=32 | ne", "cart | helmert translation=1,2,3"]
+    for definition in definitions:
+        ctx.op(definition)
+    path = tmp_path / "operators.pickle"
+    ctx.save(path)
+
+    # The operators come back ready for use, without being instantiated anew
+    warm = MinimalContext()
+    assert warm.load(path) == 2
+    op = warm.op("geo|utm zone=32|ne")
+    assert warm.cache_info() == (1, 0, 2, 1024)
+    assert warm.ops[op].ctx is warm
+
+    coords = CoordinateSetRowWise([[55.0, 12.0]])
+    expected = CoordinateSetRowWise([[55.0, 12.0]])
+    warm.apply(op, OpDirection.FWD, coords)
+    ctx.apply(ctx.op(definitions[0]), OpDirection.FWD, expected)
+    assert coords[0] == expected[0]
+
+    # Loaded operators are unreferenced, so they may be evicted, and operators
+    # already cached are kept
+    small = MinimalContext(capacity=1)
+    kept = small.op(definitions[1])
+    assert small.loads(ctx.dumps()) == 1
+    assert small.op(definitions[1]) == kept and len(small.handles) == 1
+
+    with raises(ValueError):
+        warm.loads(pickle.dumps({"format": "cheese"}))
+
+
 # A user defined OperationMethod, for testing the register_method functionality
 
 
@@ -2,8 +2,14 @@ from pyge.coordinateset import (
     CoordinateSet,
     CoordinateSetColumnWise,
     CoordinateSetRowWise,
+    CoordinateSetSlice,
 )
-from math import nan
+from math import dist, nan
+
+from pytest import importorskip, raises
+
+from pyge.context import OpDirection
+from pyge.minimal import MinimalContext
 
 # Canonical dataset for testing of implementers of abstract base class
 # CoordinateSet
@@ -75,6 +81,181 @@ def test_coordinateset_column_wise():
     assert soa.promoted(1) == [12, 22, 0, nan]
 
 
+# NumPy is an optional dependency, so the NumPy backed implementation is
+# only tested where NumPy is available
+def test_coordinateset_numpy():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    # Row-wise, from a list of lists: converted once, into float64
+    coords = CoordinateSetNumpy([list(c) for c in coordinate_tuples])
+    assert coords.coords.dtype == np.float64
+    abstract_test_coordinateset(coords)
+
+    # Column-wise, wrapping a caller supplied array without copying
+    array = np.array(coordinate_tuples, dtype=np.float64).T.copy()
+    coords = CoordinateSetNumpy(array, columnwise=True)
+    assert coords.coords is array
+    abstract_test_coordinateset(coords)
+
+    # Columns are views into the caller's array, in both layouts
+    coords.column(0)[1] = 1000
+    assert array[0][1] == 1000
+    assert coords[1][0] == 1000
+    rows = np.array(coordinate_tuples, dtype=np.float64)
+    coords = CoordinateSetNumpy(rows)
+    _, y, _, _ = coords.columns()
+    y *= 2
+    assert rows[4][1] == 104
+    assert coords[4] == [51, 104, 53, 54]
+
+    # Default promotion in the 2D case
+    soa = CoordinateSetNumpy(
+        [[11, 12, 13, 14, 15], [21, 22, 23, 24, 25]], columnwise=True
+    )
+    assert soa.len() == 5
+    assert soa.promoted(1)[0:3] == [12, 22, 0]
+
+
+def test_coordinateset_mmap(tmp_path):
+    from pyge.coordinateset_mmap import CoordinateSetMmap
+
+    path = tmp_path / "coords.bin"
+    with CoordinateSetMmap.create(path, 5, 4, crs_id="EPSG:4326") as coords:
+        for i, t in enumerate(coordinate_tuples):
+            coords[i] = t
+        abstract_test_coordinateset(coords)
+
+    # Changes persist, and so does the header
+    coords = CoordinateSetMmap(path, writable=False)
+    assert (len(coords), coords.dim(), coords.crs_id) == (5, 4, "EPSG:4326")
+    assert coords[4] == [51, 52, 53, 54]
+    coords.close()
+
+    # Operators transform the file in place, on the batch path, if available
+    ctx = MinimalContext()
+    op = ctx.op("geo | utm zone=32 | ne")
+    rows = [[55.0 + i / 100, 12.0 - i / 100, 100.0] for i in range(100)]
+    expected = CoordinateSetRowWise([list(row) for row in rows])
+    ctx.apply(op, OpDirection.FWD, expected)
+
+    # float32 resolves projected coordinates of this size to about half a metre
+    for dtype, tolerance in (("float64", 1e-6), ("float32", 2.0)):
+        path = tmp_path / f"{dtype}.bin"
+        with CoordinateSetMmap.create(path, 100, 3, dtype=dtype) as coords:
+            for i, row in enumerate(rows):
+                coords[i] = row
+            assert ctx.apply(op, OpDirection.FWD, coords) == 100
+        with CoordinateSetMmap(path) as coords:
+            assert coords.dtype == dtype
+            assert all(dist(coords[i], expected[i]) < tolerance for i in range(100))
+
+    # Files that are not coordinate files are rejected
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"PYGECOOR")
+    with raises(ValueError):
+        CoordinateSetMmap(path)
+    path.write_bytes(b"\0" * 64)
+    with raises(ValueError):
+        CoordinateSetMmap(path)
+    with raises(ValueError):
+        CoordinateSetMmap.create(path, 1, 2, dtype="float16")
+
+    # ... as are truncated ones
+    CoordinateSetMmap.create(path, 10, 2).close()
+    path.write_bytes(path.read_bytes()[:-8])
+    with raises(ValueError):
+        CoordinateSetMmap(path)
+
+
+def test_coordinateset_buffer():
+    from array import array
+
+    from pyge.coordinateset_buffer import CoordinateSetBuffer
+
+    # Row-wise, in an array.array, operated on in place
+    values = array("d", [v for t in coordinate_tuples for v in t])
+    coords = CoordinateSetBuffer(values, 4)
+    abstract_test_coordinateset(coords)
+    coords[4] = [-1]
+    assert values[16] == -1
+
+    # Column-wise, in a bytearray, e.g. as received from a socket
+    columns = array("d", [t[i] for i in range(4) for t in coordinate_tuples])
+    coords = CoordinateSetBuffer(bytearray(columns.tobytes()), 4, columnwise=True)
+    abstract_test_coordinateset(coords)
+
+    # Strided: Row-wise, with a padding value between tuples, and a header
+    padded = array("d", [0.0] + [v for t in coordinate_tuples for v in t + [0]])
+    coords = CoordinateSetBuffer(padded, 4, stride=5, offset=1)
+    abstract_test_coordinateset(coords)
+    assert padded[0] == 0 and padded[5] == 0
+
+    # Slices are views into the same buffer
+    coords = coords.slice(3, 10)
+    assert len(coords) == 2 and coords[1] == [51, 52, 53, 54]
+    coords[0] = [0]
+    assert padded[16] == 0
+
+    # float32 buffers are supported too, while other layouts must fit the buffer
+    assert CoordinateSetBuffer(array("f", [1.5, 2.5]), 2)[0] == [1.5, 2.5]
+    with raises(ValueError):
+        CoordinateSetBuffer(bytearray(12), 1)
+    with raises(ValueError):
+        CoordinateSetBuffer(values, 4, 6)
+
+    # With NumPy, the columns are strided views into the buffer
+    importorskip("numpy")
+    coords = CoordinateSetBuffer(padded, 4, stride=5, offset=1)
+    _, y, _, _ = coords.columns()
+    y *= 2
+    assert padded[2] == 24 and coords[4] == [51, 104, 53, 54]
+    coords = CoordinateSetBuffer(columns, 4, columnwise=True).slice(1, 3)
+    assert coords.columns()[3].tolist() == [24, 34]
+
+
+def test_coordinateset_slice():
+    # A slice of a larger set behaves like any other CoordinateSet...
+    padding = [[0, 0, 0, 0]]
+    rows = padding + [list(t) for t in coordinate_tuples] + padding
+    parent = CoordinateSetRowWise(rows)
+    coords = parent.slice(1, 6)
+    abstract_test_coordinateset(coords)
+    assert coords.columns() is None
+    assert len(list(coords)) == 5
+
+    # ... while writing through to the parent
+    coords[4] = [1, 2, 3, 4]
+    assert parent[5] == [1, 2, 3, 4]
+    assert parent[6] == [0, 0, 0, 0]
+
+    # Bounds are clipped, as for Python slices, and so are slices of slices
+    assert len(parent.slice(5, 100)) == 2
+    assert len(parent.slice(-2, 100)) == 2
+    assert len(parent.slice(4, 2)) == 0
+    assert coords.slice(1, 3)[0] == parent[2]
+    assert len(coords.slice(3, 10)) == 2
+
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    # Slices of array backed sets are array backed views
+    for columnwise in (False, True):
+        array = np.array(rows, dtype=np.float64)
+        if columnwise:
+            array = array.T.copy()
+        parent = CoordinateSetNumpy(array, columnwise=columnwise)
+        coords = parent.slice(1, 6)
+        assert len(coords) == 5 and coords[0] == [11, 12, 13, 14]
+        coords.columns()[0][:] = -1
+        assert parent[1][0] == -1 and parent[0][0] == 0 and parent[6][0] == 0
+
+        # Also when sliced through the generic slice class
+        coords = CoordinateSetSlice(parent, 2, 4)
+        coords.columns()[1][:] = -2
+        assert [parent[i][1] for i in range(1, 5)] == [12, -2, -2, 42]
+
+
 # This test takes ownership of coordinate_tuples, so changes persist
 def test_coordinateset_row_wise():
     coords = CoordinateSetRowWise(coordinate_tuples)
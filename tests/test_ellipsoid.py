@@ -32,3 +32,63 @@ def test_ellipsoid():
     lat = degrees(lat)
     assert hypot(lon - 12, lat - 55) < 1e-12
     assert abs(h - 100) < 1e-5
+
+    # At the poles, the height is measured from the semiminor axis
+    b = e.semiminor_axis()
+    (lon, lat, h) = e.geographic(0, 0, -b - 100)
+    assert (lat, h) == (radians(-90), 100)
+
+
+def test_ellipsoid_catalogue():
+    # Named ellipsoids, and (a, rf) pairs, are interned
+    assert Ellipsoid.named("GRS80") is Ellipsoid.named("GRS80")
+    assert Ellipsoid.named("6378137, 298.25") is Ellipsoid.named("6378137.0, 298.25")
+    assert Ellipsoid.named("6378137, 298.25") == Ellipsoid(6378137, 298.25)
+
+    # ... and immutable
+    e = Ellipsoid.named("GRS80")
+    with pytest.raises(AttributeError):
+        e.a = 1
+
+    # The derived constants agree with the getters' definitions
+    assert e.third_flattening() == e.f / (2 - e.f)
+    assert e.second_eccentricity_squared() == pytest.approx(
+        e.eccentricity_squared() / (1 - e.eccentricity_squared()), rel=1e-15
+    )
+    assert e.rectifying_radius_bowring() == pytest.approx(6367449.146, abs=1e-3)
+
+    # Some classics, with their defining semiminor axes
+    assert Ellipsoid.named("clrk66").b == pytest.approx(6356583.8, abs=1e-3)
+    assert Ellipsoid.named("airy").b == pytest.approx(6356256.909, abs=1e-3)
+    assert Ellipsoid.named("bessel").b == pytest.approx(6356078.963, abs=1e-3)
+
+    # The sphere is a (degenerate) ellipsoid
+    s = Ellipsoid.named("sphere")
+    assert (s.f, s.es, s.b) == (0, 0, s.a)
+    lon, lat, h = s.geographic(*s.cartesian(radians(12), radians(55), 100))
+    assert hypot(degrees(lon) - 12, degrees(lat) - 55) < 1e-12
+    assert abs(h - 100) < 1e-8
+
+
+def test_ellipsoid_arrays():
+    np = pytest.importorskip("numpy")
+    e = Ellipsoid.named("GRS80")
+
+    lon = np.radians([12.0, -6.0, 180.0, 0.0, 0.0])
+    lat = np.radians([55.0, -45.0, 0.0, 90.0, -90.0])
+    h = np.array([100.0, -10.0, 0.0, 1000.0, 10.0])
+
+    # The array versions agree with the scalar ones
+    X, Y, Z = e.cartesian_array(lon, lat, h)
+    for i in range(len(lon)):
+        assert (X[i], Y[i], Z[i]) == pytest.approx(
+            e.cartesian(lon[i], lat[i], h[i]), abs=1e-9
+        )
+
+    # Also for the roundtrip, including the polar special case
+    X[3:] = Y[3:] = 0
+    lam, phi, hh = e.geographic_array(X, Y, Z)
+    for i in range(len(lon)):
+        assert (lam[i], phi[i], hh[i]) == e.geographic(X[i], Y[i], Z[i])
+    assert np.abs(phi - lat).max() < 1e-12
+    assert np.abs(hh - h).max() < 1e-6
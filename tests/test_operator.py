@@ -1,10 +1,12 @@
 from pyge.context import OpDirection
 from pyge.operator import Operator
+from pyge.operator_method import OperatorMethod
 from pyge.minimal import MinimalContext
 from pyge.coordinateset import CoordinateSetRowWise
 
-from pytest import raises
-from math import nan, dist
+from pytest import raises, importorskip
+from math import nan, dist, radians
+import pickle
 
 # There are additional Operator-related tests in test_context.py
 
@@ -109,7 +111,8 @@ def test_tmerc():
         ctx.op("tmerc ellps=1, 2, 3")
 
     op = Operator("tmerc ellps=1, 2", ctx)
-    assert op.prepared["ellps"] == (1.0, 0.5)
+    ellps = op.prepared["ellps"]
+    assert (ellps.a, ellps.f) == (1.0, 0.5)
 
     # Other tmerc parameters
     with raises(ValueError):
@@ -152,6 +155,17 @@ def test_tmerc():
         # PROJ. Closer to the central meridian, the difference is immaterial
         assert dist(geo[i], projected[i]) < 3e-6
 
+    # A base parallel other than the equator: The Ordnance Survey's worked example
+    # for the British National Grid, with airy, lat_0=49 and negative false northing
+    osgb = "tmerc lat_0=49 lon_0=-2 k_0=0.9996012717 x_0=400000 y_0=-100000"
+    op = ctx.op(f"geo | {osgb} ellps=airy | ne")
+    lat, lon = 52 + 39 / 60 + 27.2531 / 3600, 1 + 43 / 60 + 4.5177 / 3600
+    coord = CoordinateSetRowWise([[lat, lon]])
+    ctx.apply(op, OpDirection.FWD, coord)
+    assert dist(coord[0], [313_177.270, 651_409.903]) < 0.001
+    ctx.apply(op, OpDirection.INV, coord)
+    assert dist(coord[0], [lat, lon]) < 1e-9
+
 
 def test_utm():
     ctx = MinimalContext()
@@ -161,6 +175,42 @@ def test_utm():
     assert op.prepared["lat_0"] == 0
     assert op.prepared["lon_0"] == 9.0
 
+    # UTM zone 32 is identical to the corresponding tmerc
+    utm = ctx.op("geo | utm zone=32 | ne")
+    tmerc = ctx.op("geo | tmerc x_0=500000 lon_0=9 k_0=0.9996 | ne")
+    a = CoordinateSetRowWise([[55.0, 12.0], [-55.0, 12.0]])
+    b = CoordinateSetRowWise([[55.0, 12.0], [-55.0, 12.0]])
+    assert 2 == ctx.apply(utm, OpDirection.FWD, a)
+    ctx.apply(tmerc, OpDirection.FWD, b)
+    assert a[0] == b[0] and a[1] == b[1]
+
+
+def test_tmerc_batch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+
+    # A grid covering the full UTM zone 32 plus a margin, in radians
+    lon, lat = np.meshgrid(np.linspace(3, 15, 25), np.linspace(-80, 84, 83))
+    geo = np.radians(np.column_stack((lon.ravel(), lat.ravel())))
+
+    for definition in ("utm zone=32", "tmerc lon_0=9 x_0=3 y_0=7 k_0=0.99"):
+        op = ctx.op(definition)
+
+        # The batch kernel (NumPy) must match the scalar one (lists) to sub-mm
+        scalar = CoordinateSetRowWise(geo.tolist())
+        batch = CoordinateSetNumpy(geo.copy())
+        assert len(geo) == ctx.apply(op, OpDirection.FWD, scalar)
+        assert len(geo) == ctx.apply(op, OpDirection.FWD, batch)
+        assert np.abs(batch.coords - np.array(scalar.coords)).max() < 1e-4
+
+        # ... also in the inverse direction, and the roundtrip must hold
+        ctx.apply(op, OpDirection.INV, scalar)
+        ctx.apply(op, OpDirection.INV, batch)
+        assert np.abs(batch.coords - np.array(scalar.coords)).max() < radians(1e-9)
+        assert np.abs(batch.coords - geo).max() < radians(1e-7)
+
 
 def test_helmert():
     ctx = MinimalContext()
@@ -191,6 +241,97 @@ def test_helmert():
     assert [coord[0], coord[1]] == [[1, 2, 3, 4], [5, 6, 7, 8]]
 
 
+def test_helmert_7_and_14_parameters():
+    ctx = MinimalContext()
+
+    # The EPSG Guidance Note 7-2 example: WGS72 to WGS84, as position vector
+    # and as coordinate frame transformation
+    wgs72 = [3657660.66, 255768.55, 5201382.11]
+    wgs84 = [3657660.78, 255778.43, 5201387.75]
+    for definition in (
+        "helmert translation=0,0,4.5 rotation=0,0,0.554 scale=0.219 convention=position_vector",
+        "helmert translation=0,0,4.5 rotation=0,0,-0.554 scale=0.219 convention=coordinate_frame",
+        "helmert exact translation=0,0,4.5 rotation=0,0,0.554 scale=0.219 convention=position_vector",
+    ):
+        op = ctx.op(definition)
+        coord = CoordinateSetRowWise([list(wgs72)])
+        ctx.apply(op, OpDirection.FWD, coord)
+        assert dist(coord[0], wgs84) < 0.01
+        ctx.apply(op, OpDirection.INV, coord)
+        assert dist(coord[0], wgs72) < 1e-8
+
+    # Rotations require a convention, and rates require a reference epoch
+    with raises(ValueError):
+        ctx.op("helmert rotation=0,0,1")
+    with raises(ValueError):
+        ctx.op("helmert rotation=0,0,1 convention=cheese")
+    with raises(ValueError):
+        ctx.op("helmert dtranslation=0,0,1")
+
+    # Time dependent: The time is taken from the 4th coordinate, unless
+    # fixed by `t_obs`. Missing time coordinates are read as `t_epoch`
+    parameters = "translation=1,2,3 rotation=1,2,3 scale=1 dtranslation=0.1,0.2,0.3 drotation=0.1,0.2,0.3 dscale=0.1 t_epoch=2010 convention=position_vector"
+    variable = ctx.op(f"helmert {parameters}")
+    fixed = ctx.op(f"helmert {parameters} t_obs=2020")
+    static = ctx.op(f"helmert {parameters} t_obs=2010")
+    a = CoordinateSetRowWise([[3657660.66, 255768.55, 5201382.11, 2020.0]])
+    b = CoordinateSetRowWise([[3657660.66, 255768.55, 5201382.11]])
+    c = CoordinateSetRowWise([[3657660.66, 255768.55, 5201382.11, nan]])
+    d = CoordinateSetRowWise([[3657660.66, 255768.55, 5201382.11]])
+    ctx.apply(variable, OpDirection.FWD, a)
+    ctx.apply(fixed, OpDirection.FWD, b)
+    ctx.apply(variable, OpDirection.FWD, c)
+    ctx.apply(static, OpDirection.FWD, d)
+    assert dist(a[0][0:3], b[0]) < 1e-9
+    assert dist(c[0][0:3], d[0]) < 1e-9
+    assert dist(a[0][0:3], c[0][0:3]) > 1
+    ctx.apply(variable, OpDirection.INV, a)
+    assert dist(a[0], [3657660.66, 255768.55, 5201382.11, 2020.0]) < 1e-8
+
+
+def test_helmert_batch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+    n = 100
+    xyz = np.column_stack(
+        (
+            np.linspace(3e6, 4e6, n),
+            np.linspace(-1e6, 1e6, n),
+            np.linspace(5e6, 4e6, n),
+            np.linspace(2000, 2030, n),
+        )
+    )
+    xyz[7, 3] = nan
+    parameters = "translation=1,2,3 rotation=1,2,3 scale=1 convention=coordinate_frame"
+    rates = "dtranslation=0.1,0.2,0.3 drotation=0.1,0.2,0.3 dscale=0.1 t_epoch=2010"
+
+    # The batch kernels (NumPy) must match the scalar ones (lists)
+    for definition, data in (
+        ("helmert translation=1,2,3", xyz),
+        (f"helmert {parameters}", xyz[:, 0:2]),
+        (f"helmert {parameters}", xyz[:, 0:3]),
+        (f"helmert exact {parameters} {rates}", xyz),
+        (f"helmert {parameters} {rates}", xyz),
+        (f"helmert {parameters} {rates} t_obs=2020", xyz),
+    ):
+        op = ctx.op(definition)
+        scalar = CoordinateSetRowWise(data.tolist())
+        batch = CoordinateSetNumpy(data.copy())
+        ctx.apply(op, OpDirection.FWD, scalar)
+        ctx.apply(op, OpDirection.FWD, batch)
+        assert np.nanmax(np.abs(batch.coords - np.array(scalar.coords))) < 1e-8
+        assert np.nanmax(np.abs(batch.coords - data)) > 0.5
+        ctx.apply(op, OpDirection.INV, scalar)
+        ctx.apply(op, OpDirection.INV, batch)
+        assert np.nanmax(np.abs(batch.coords - np.array(scalar.coords))) < 1e-8
+
+        # In 2D, the z coordinate is lost on the way, so only 3D+ roundtrips
+        if data.shape[1] > 2:
+            assert np.nanmax(np.abs(batch.coords - data)) < 1e-8
+
+
 def test_cart():
     ctx = MinimalContext()
     assert "cart" in ctx.builtins()
@@ -222,3 +363,299 @@ def test_cart():
     ctx.apply(cart, OpDirection.FWD, ego)
     for i in range(len(ego)):
         assert dist(ego[i], geo[i]) < 1e-10
+
+
+def test_cart_batch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+    lon, lat = np.meshgrid(np.linspace(-180, 180, 37), np.linspace(-89, 89, 21))
+    lon, lat = np.radians(lon.ravel()), np.radians(lat.ravel())
+    h = np.linspace(-100, 10000, len(lon))
+
+    # The batch kernels (NumPy) must match the scalar ones (lists), for 2D and 3D
+    for definition, geo in (
+        ("cart", np.column_stack((lon, lat, h))),
+        ("cart ellps=intl", np.column_stack((lon, lat, h, h))),
+        ("cart", np.column_stack((lon, np.abs(lat)))),
+        ("cart south", np.column_stack((lon, -np.abs(lat)))),
+    ):
+        op = ctx.op(definition)
+        scalar = CoordinateSetRowWise(geo.tolist())
+        batch = CoordinateSetNumpy(geo.copy())
+        ctx.apply(op, OpDirection.FWD, scalar)
+        ctx.apply(op, OpDirection.FWD, batch)
+        assert np.abs(batch.coords - np.array(scalar.coords)).max() < 1e-8
+
+        assert len(geo) == ctx.apply(op, OpDirection.INV, batch)
+        ctx.apply(op, OpDirection.INV, scalar)
+        assert np.abs(batch.coords - np.array(scalar.coords)).max() < 1e-8
+        # The 2D case degrades gracefully towards the poles: 1e-8 at 89 degrees
+        assert np.abs(batch.coords[:, :2] - geo[:, :2]).max() < 1e-7
+
+    # The batch and scalar kernels report the same number of successes, also
+    # for coordinates which cannot be transformed
+    op = ctx.op("cart")
+    cartesian = [[nan, 0.0, 0.0], [6378137.0, 0.0, 0.0]]
+    scalar = CoordinateSetRowWise(cartesian)
+    batch = CoordinateSetNumpy(np.array(cartesian))
+    assert ctx.apply(op, OpDirection.INV, scalar) == 2
+    assert ctx.apply(op, OpDirection.INV, batch) == 2
+
+
+def test_conventions_batch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+
+    # Enough points to exercise the chunking of the batch axis swapping
+    n = 100_000
+    data = np.column_stack(
+        (
+            np.linspace(-90, 90, n),
+            np.linspace(-180, 180, n),
+            np.linspace(0, 100, n),
+            np.linspace(2000, 2030, n),
+        )
+    )
+
+    # The batch kernels (NumPy) must match the scalar ones (lists) exactly
+    for definition in ("geo", "gis", "ne", "geo | ne | inv gis"):
+        op = ctx.op(definition)
+        scalar = CoordinateSetRowWise(data[0:n:97].tolist())
+        batch = CoordinateSetNumpy(data.copy(), columnwise=False)
+        columns = CoordinateSetNumpy(data.T.copy(), columnwise=True)
+        for direction in (OpDirection.FWD, OpDirection.INV):
+            ctx.apply(op, direction, scalar)
+            ctx.apply(op, direction, batch)
+            ctx.apply(op, direction, columns)
+            assert (batch.coords[0:n:97] == np.array(scalar.coords)).all()
+            assert (columns.coords.T == batch.coords).all()
+        assert np.abs(batch.coords - data).max() < 1e-12
+
+    with raises(ValueError):
+        ctx.apply(ctx.op("ne"), OpDirection.FWD, CoordinateSetNumpy([[1.0], [2.0]]))
+
+    # A typical datum shift pipeline, with batch kernels for all steps
+    op = ctx.op(
+        "geo | cart | helmert translation=1,2,3 rotation=1,2,3 "
+        "convention=position_vector | cart inv | geo inv"
+    )
+    # (staying clear of the poles and the antimeridian)
+    data *= (0.9, 0.9, 1, 1)
+    batch = CoordinateSetNumpy(data.copy())
+    ctx.apply(op, OpDirection.FWD, batch)
+    assert np.abs(batch.coords[:, 0:2] - data[:, 0:2]).max() < 1e-2
+    ctx.apply(op, OpDirection.INV, batch)
+    assert np.abs(batch.coords[:, 0:2] - data[:, 0:2]).max() < 1e-10
+
+
+def test_unitconvert():
+    ctx = MinimalContext()
+
+    op = ctx.op("unitconvert xy_in=gon xy_out=deg z_in=us-ft z_out=m")
+    coord = CoordinateSetRowWise([[100.0, 50.0, 3937.0, 2020.0]])
+    ctx.apply(op, OpDirection.FWD, coord)
+    assert dist(coord[0], [90.0, 45.0, 1200.0, 2020.0]) < 1e-9
+    ctx.apply(op, OpDirection.INV, coord)
+    assert dist(coord[0], [100.0, 50.0, 3937.0, 2020.0]) < 1e-9
+
+    # An omitted unit defaults to its counterpart
+    op = ctx.op("unitconvert z_in=mm | unitconvert xy_out=arcsec")
+    coord = CoordinateSetRowWise([[1.0, 2.0, 3.0]])
+    ctx.apply(op, OpDirection.FWD, coord)
+    assert coord[0] == [1.0, 2.0, 3.0]
+
+    # Folded into the degree conversion of geo, as one affine step
+    op = Operator("unitconvert xy_in=arcsec xy_out=deg | geo", ctx)
+    assert [step.parameters["_name"] for step in op.forward_steps] == ["affine"]
+    coord = CoordinateSetRowWise([[3600.0 * 55, 3600.0 * 12]])
+    op.fwd(ctx, coord)
+    assert dist(coord[0], [radians(12), radians(55)]) < 1e-12
+
+    # ... but not when converting time, which is beyond the affine representation
+    op = Operator("unitconvert t_in=a t_out=a | unitconvert xy_in=rad | gis", ctx)
+    assert len(op.forward_steps) == 1
+    op = Operator("unitconvert xy_in=urad xy_out=mrad t_in=a | gis", ctx)
+    assert len(op.forward_steps) == 1
+
+    with raises(ValueError):
+        ctx.op("unitconvert xy_in=furlong xy_out=m")
+    with raises(ValueError):
+        ctx.op("unitconvert xy_in=m xy_out=deg")
+
+
+def test_unitconvert_batch():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    ctx = MinimalContext()
+    data = np.column_stack(
+        (
+            np.linspace(-200, 200, 1000),
+            np.linspace(-100, 100, 1000),
+            np.linspace(0, 100, 1000),
+        )
+    )
+    op = ctx.op("unitconvert xy_in=gon xy_out=arcmin z_in=ft z_out=us-ft")
+    scalar = CoordinateSetRowWise(data.tolist())
+    batch = CoordinateSetNumpy(data.copy())
+    for direction in (OpDirection.FWD, OpDirection.INV):
+        ctx.apply(op, direction, scalar)
+        ctx.apply(op, direction, batch)
+        assert np.abs(batch.coords - np.array(scalar.coords)).max() < 1e-9
+    assert np.abs(batch.coords - data).max() < 1e-9
+
+
+def test_operator_plan():
+    ctx = MinimalContext()
+
+    # The plan has inversion and omission folded in
+    coord = CoordinateSetRowWise([[1, 2]])
+    op = Operator("inv addone", ctx)
+    op.plan.fwd(ctx, coord)
+    assert coord[0] == [0, 2]
+    op.plan.inv(ctx, coord)
+    assert coord[0] == [1, 2]
+    op = Operator("omit_fwd inv addone", ctx)
+    assert op.plan.fwd(ctx, coord) == 1 and coord[0] == [1, 2]
+    op.plan.inv(ctx, coord)
+    assert coord[0] == [2, 2]
+
+    # For pipelines, the steps come in order of execution
+    op = Operator("addone | helmert translation=0,1 | cart", ctx, optimize=False)
+    assert len(op.plan.forward_steps) == 3
+    assert op.plan.forward_steps[0] is op.steps[0].plan.fwd
+    assert op.plan.inverse_steps[0] is op.steps[2].plan.inv
+
+    # Operators without an inverse say so, when asked to invert
+    ctx.register_operator_method(
+        OperatorMethod(id="fwd_only", fwd=lambda op, ctx, operands: len(operands))
+    )
+    op = Operator("fwd_only", ctx)
+    assert op.fwd(ctx, coord) == 1
+    with raises(ValueError):
+        op.inv(ctx, coord)
+    with raises(ValueError):
+        Operator("inv fwd_only", ctx).fwd(ctx, coord)
+
+
+def test_pipeline_optimization():
+    ctx = MinimalContext()
+
+    def names(steps):
+        return [step.parameters["_name"] for step in steps]
+
+    # Mutually inverse adjacent steps cancel, also when nested
+    op = Operator("geo | cart | cart inv | geo inv", ctx)
+    assert len(op.steps) == 4
+    assert op.forward_steps == () and op.inverse_steps == ()
+    op = Operator(
+        "cart | helmert translation=1,2,3 | inv helmert translation=1,2,3 | cart inv",
+        ctx,
+    )
+    assert op.forward_steps == () and op.inverse_steps == ()
+
+    # ... but only when the parameters match
+    op = Operator("cart | cart inv south", ctx)
+    assert names(op.forward_steps) == ["cart", "cart"]
+
+    # Steps omitted in one direction are only dropped in that direction
+    op = Operator("addone | omit_fwd subone | omit_inv addone", ctx)
+    assert names(op.forward_steps) == ["addone", "addone"]
+    assert names(op.inverse_steps) == ["addone", "subone"]
+    op = Operator("addone | omit_fwd addone | inv addone", ctx)
+    assert names(op.forward_steps) == []
+    assert names(op.inverse_steps) == ["addone"]
+
+    # Consecutive affine steps are merged, and dropped if they amount to nothing
+    op = Operator("geo | helmert translation=1,2,3 | ne | addone", ctx)
+    assert names(op.forward_steps) == ["affine", "addone"]
+    assert names(op.inverse_steps) == ["affine", "addone"]
+    op = Operator("helmert translation=1,2,3 | helmert translation=-1,-2,-3", ctx)
+    assert op.forward_steps == () and op.inverse_steps == ()
+    op = Operator("helmert translation=0,0,0", ctx)
+    assert op.is_noop is False
+    op = Operator("cart | helmert translation=0,0,0 | cart inv", ctx)
+    assert op.forward_steps == ()
+
+    # Optimization can be switched off
+    op = Operator("geo | cart | cart inv | geo inv", ctx, optimize=False)
+    assert op.forward_steps == op.steps and op.inverse_steps == op.steps
+
+
+def test_optimized_pipelines_are_equivalent():
+    ctx = MinimalContext()
+    rotation = "rotation=1,2,3 scale=2 convention=position_vector"
+    pipelines = (
+        "geo | helmert translation=1,2,3 | ne | inv gis",
+        f"helmert translation=1,2,3 {rotation} | inv helmert translation=3,2,1 {rotation}",
+        f"helmert translation=1,2,3 {rotation} | addone | inv helmert {rotation} | ne",
+        f"inv helmert translation=1,2,3 {rotation} | geo | omit_fwd ne | omit_inv gis",
+        f"addone | helmert translation=1,2,3 | helmert {rotation} | affine matrix=1,2,3,4,5,6,7,8,10",
+        "unitconvert xy_in=gon xy_out=deg z_in=us-ft z_out=m | geo | addone",
+    )
+    data = [[12.0, 55.0, 100.0, 2020.0], [-6.0, -45.0, 10.0, 2000.0]]
+    for definition in pipelines:
+        optimized = Operator(definition, ctx)
+        plain = Operator(definition, ctx, optimize=False)
+        assert len(optimized.forward_steps) < len(plain.forward_steps)
+        for dim in (1, 2, 3, 4):
+            a = CoordinateSetRowWise([row[0:dim] for row in data])
+            b = CoordinateSetRowWise([row[0:dim] for row in data])
+            for direction in ("fwd", "inv"):
+                if dim == 1 and {"geo", "gis", "ne"} & set(definition.split()):
+                    with raises(ValueError):
+                        getattr(plain, direction)(ctx, a)
+                    with raises(ValueError):
+                        getattr(optimized, direction)(ctx, b)
+                    continue
+                getattr(plain, direction)(ctx, a)
+                getattr(optimized, direction)(ctx, b)
+                for i in range(len(data)):
+                    assert dist(a[i], b[i]) < 1e-6
+
+
+def test_optimized_pipelines_keep_nan_in_place():
+    np = importorskip("numpy")
+    from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+    # A NaN height must not spread to the horizontal coordinates, when merged
+    # steps swap or scale the axes
+    ctx = MinimalContext()
+    for definition in ("geo | ne", "unitconvert xy_in=gon xy_out=deg | geo"):
+        optimized = Operator(definition, ctx)
+        plain = Operator(definition, ctx, optimize=False)
+        assert len(optimized.forward_steps) == 1
+        for direction in ("fwd", "inv"):
+            a = CoordinateSetRowWise([[55.0, 12.0, nan]])
+            b = CoordinateSetRowWise([[55.0, 12.0, nan]])
+            c = CoordinateSetNumpy(np.array([[55.0, 12.0, nan]]))
+            getattr(plain, direction)(ctx, a)
+            getattr(optimized, direction)(ctx, b)
+            getattr(optimized, direction)(ctx, c)
+            for coord in (b[0], c[0]):
+                assert dist(a[0][0:2], coord[0:2]) < 1e-12
+                assert coord[2] != coord[2]
+
+
+def test_operator_pickling():
+    ctx = MinimalContext()
+    op = Operator("geo | cart | helmert translation=1,2,3 | inv cart | inv geo", ctx)
+    clone = pickle.loads(pickle.dumps(op))
+
+    # The clone is unbound, but otherwise equivalent, with read-only prepared state
+    assert clone.ctx is None
+    assert clone.normalized_definition == op.normalized_definition
+    assert len(clone.plan.forward_steps) == len(op.plan.forward_steps)
+    assert clone.steps[1].prepared["ellps"] == op.steps[1].prepared["ellps"]
+    with raises(TypeError):
+        clone.steps[1].prepared["ellps"] = None
+
+    coords = CoordinateSetRowWise([[55.0, 12.0, 100.0]])
+    expected = CoordinateSetRowWise([[55.0, 12.0, 100.0]])
+    clone.fwd(ctx, coords)
+    op.fwd(ctx, expected)
+    assert coords[0] == expected[0]
@@ -0,0 +1,70 @@
+from math import dist
+
+from pytest import importorskip, raises
+
+from pyge.context import Context, OpDirection, OpHandle
+from pyge.coordinateset import CoordinateSet, CoordinateSetRowWise
+from pyge.minimal import MinimalContext
+from pyge.operator import Operator
+from pyge.operator_method import OperatorMethod
+from pyge.parallel import ProcessPool
+
+
+def test_process_pool():
+    ctx = MinimalContext()
+    op = ctx.op("geo | utm zone=32 | ne")
+    rows = [[55.0 + i / 1000, 12.0 - i / 1000, 100.0] for i in range(1000)]
+    parallel = CoordinateSetRowWise([list(row) for row in rows])
+    serial = CoordinateSetRowWise([list(row) for row in rows])
+
+    with ProcessPool(ctx, op, processes=3) as pool:
+        # The parallel results agree with the serial ones. Not necessarily to the
+        # last bit, since the workers use the batch kernels, if NumPy is available
+        assert pool.apply(OpDirection.FWD, parallel) == 1000
+        ctx.apply(op, OpDirection.FWD, serial)
+        assert all(dist(parallel[i], serial[i]) < 1e-6 for i in range(1000))
+
+        # ... and the pool can be reused, e.g. for the roundtrip
+        pool.apply(OpDirection.INV, parallel)
+        assert all(dist(parallel[i], rows[i]) < 1e-8 for i in range(1000))
+
+        # Errors in the workers come back to us
+        with raises(ValueError):
+            pool.apply(OpDirection.FWD, CoordinateSetRowWise([[1.0]]))
+
+        # Array backed operands are transformed too
+        np = importorskip("numpy")
+        from pyge.coordinateset_numpy import CoordinateSetNumpy
+
+        array = CoordinateSetNumpy(np.array(rows))
+        assert pool.apply(OpDirection.FWD, array) == 1000
+        assert np.abs(array.coords - np.array(serial.coords)).max() < 1e-6
+
+
+def test_process_pool_user_defined_method():
+    ctx = MinimalContext()
+    ctx.register_operator_method(addhalf)
+    op = ctx.op("addhalf | addone")
+
+    coords = CoordinateSetRowWise([[float(i), 0.0] for i in range(100)])
+    with ProcessPool(ctx, op, processes=2) as pool:
+        pool.apply(OpDirection.FWD, coords)
+    assert [coords[i][0] for i in range(100)] == [i + 1.5 for i in range(100)]
+
+    with raises(ValueError):
+        ProcessPool(ctx, OpHandle())
+
+
+# A user defined OperatorMethod, which must be defined at module level to be
+# shipped to the workers
+
+
+def addhalf_forward(_op: Operator, _ctx: Context, operands: CoordinateSet) -> int:
+    for i in range(len(operands)):
+        operand = operands[i]
+        operand[0] += 0.5
+        operands[i] = operand
+    return len(operands)
+
+
+addhalf = OperatorMethod(id="addhalf", fwd=addhalf_forward)
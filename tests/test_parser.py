@@ -0,0 +1,62 @@
+from pytest import raises
+
+from pyge.parser import (
+    invert_definition,
+    normalize_definition,
+    parse_definition,
+    split_definition,
+)
+
+
+def test_normalization():
+    # Whitespace around the separators and joiners is insignificant, as are
+    # comments and empty steps
+    assert normalize_definition(" geo|utm zone = 32 |ne ") == "geo | utm zone=32 | ne"
+    assert normalize_definition("helmert xyz= 1, two, 3") == "helmert xyz=1,two,3"
+    assert normalize_definition("addone | inv  addone # a comment") == (
+        "addone | inv addone"
+    )
+    assert split_definition("  |  | ") == []
+    assert split_definition("") == []
+
+    # Comments end at the end of the line, and may separate joined words
+    definition = "# Datum shift\r\ncart # to cartesian\n| helmert x = # shift\n 1"
+    assert split_definition(definition) == ["cart", "helmert x=1"]
+    assert split_definition("a # c\n b") == ["a b"]
+
+
+def test_parse_definition():
+    steps = parse_definition("inv utm zone=32 south | omit_inv ne")
+    assert [step.definition for step in steps] == [
+        "inv utm zone=32 south",
+        "omit_inv ne",
+    ]
+    assert steps[0].parameters == {"inv": "", "_name": "utm", "zone": "32", "south": ""}
+    assert steps[1].parameters == {"omit_inv": "", "_name": "ne"}
+    assert [step.index for step in steps] == [0, 1]
+
+    # Modifiers may go anywhere in the step
+    assert parse_definition("utm inv zone=32")[0].parameters["_name"] == "utm"
+
+    # Errors are reported with their location in the definition
+    with raises(ValueError, match="Missing operator name at column 7"):
+        parse_definition("geo | inv")
+    with raises(ValueError, match="Expected operator name at column 1"):
+        parse_definition("zone=32 utm")
+    with raises(ValueError, match="Repeated '=' in 'zone=32=3' at line 2, column 7"):
+        parse_definition("geo |\n  utm zone = 32 = 3")
+
+    # ... as are unknown operator methods, when instantiating
+    from pyge.minimal import MinimalContext
+
+    with raises(NameError, match="'cheese' at line 3, column 3"):
+        MinimalContext().op("geo\n# cheese is not an operator\n| cheese")
+
+
+def test_invert_definition():
+    definition = "geo | utm inv zone=32 | omit_inv ne  # comment"
+    assert invert_definition(definition) == "inv omit_fwd ne | utm zone=32 | inv geo"
+    assert invert_definition(invert_definition(definition)) == (
+        "geo | inv utm zone=32 | omit_inv ne"
+    )
+    assert invert_definition("") == ""
@@ -0,0 +1,111 @@
+from math import dist
+
+from pytest import raises
+
+from pyge.context import OpDirection
+from pyge.coordinateset import CoordinateSetRowWise
+from pyge.crs import Crs
+from pyge.minimal import MinimalContext
+from pyge.planner import Planner
+
+
+def crss() -> list[Crs]:
+    height = Crs(id="height", units=("m",))
+    utm32 = Crs(id="etrs89utm32", parent_id="etrs89", to_parent="inv utm zone=32")
+    return [
+        Crs(id="etrs89", units=("rad", "rad", "m")),
+        Crs(id="etrs89geo", parent_id="etrs89", to_parent="geo"),
+        Crs(
+            id="etrs89gon",
+            parent_id="etrs89geo",
+            to_parent="unitconvert xy_in=gon xy_out=deg",
+        ),
+        utm32,
+        Crs(id="etrs89utm33", parent_id="etrs89", to_parent="utm inv zone=33"),
+        height,
+        Crs(
+            id="height_usft",
+            parent_id="height",
+            to_parent="unitconvert z_in=us-ft z_out=m",
+        ),
+        Crs(id="utm32+height", parts=(utm32, height)),
+        Crs(id="utm33+height_usft", parts=("etrs89utm33", "height_usft")),
+        Crs(id="nad83", units=("rad", "rad", "m")),
+    ]
+
+
+def test_planning():
+    planner = Planner(MinimalContext(), crss())
+
+    # Up to the nearest common ancestor, and down again
+    assert planner.definition("etrs89geo", "etrs89utm32") == "geo | utm zone=32"
+    assert planner.definition("etrs89utm32", "etrs89utm33") == (
+        "inv utm zone=32 | utm zone=33"
+    )
+    assert (
+        planner.definition("etrs89gon", "etrs89geo")
+        == "unitconvert xy_in=gon xy_out=deg"
+    )
+    assert planner.definition("etrs89utm33", "etrs89gon") == (
+        "utm inv zone=33 | inv geo | inv unitconvert xy_in=gon xy_out=deg"
+    )
+    assert planner.definition("etrs89", "etrs89") == ""
+
+    # Compound CRSs go part by part
+    assert planner.definition("utm33+height_usft", "utm32+height") == (
+        "utm inv zone=33 | utm zone=32 | unitconvert z_in=us-ft z_out=m"
+    )
+
+    with raises(NameError, match="Unknown CRS 'wgs84'"):
+        planner.definition("wgs84", "etrs89")
+    with raises(ValueError, match="No route"):
+        planner.definition("etrs89geo", "nad83")
+    with raises(ValueError, match="No route"):
+        planner.definition("utm32+height", "etrs89")
+    planner.register(Crs(id="nad83", parent_id="etrs89"))
+    with raises(ValueError, match="no definition"):
+        planner.definition("etrs89geo", "nad83")
+    planner.register(Crs(id="etrs89", parent_id="etrs89geo", to_parent="inv geo"))
+    with raises(ValueError, match="Circular"):
+        planner.definition("etrs89geo", "etrs89utm32")
+
+
+def test_planned_operators():
+    ctx = MinimalContext()
+    planner = Planner(ctx, crss())
+
+    op = planner.op("etrs89geo", "etrs89utm32")
+    coord = CoordinateSetRowWise([[55.0, 12.0, 100.0]])
+    ctx.apply(op, OpDirection.FWD, coord)
+    assert dist(coord[0], [691875.632, 6098907.825, 100.0]) < 1e-3
+    ctx.apply(planner.op("etrs89utm32", "etrs89gon"), OpDirection.FWD, coord)
+    assert dist(coord[0], [55.0 / 0.9, 12.0 / 0.9, 100.0]) < 1e-9
+
+    # Cached per pair: No planning, parsing or instantiation the second time
+    misses = ctx.cache_info().misses
+    assert planner.op("etrs89geo", "etrs89utm32") == op
+    geo, utm32 = planner.crs("etrs89geo"), planner.crs("etrs89utm32")
+    assert planner.op(geo, utm32) == op
+    assert ctx.cache_info().misses == misses
+
+    # CRSs not registered cannot be told apart by id, so they are not cached.
+    # Their definitions are still available, for instantiating directly
+    adhoc = Crs(id="etrs89geo", parent_id="etrs89", to_parent="gis")
+    with raises(ValueError, match="not the one registered"):
+        planner.op(adhoc, utm32)
+    with raises(NameError):
+        planner.op("etrs89geo", "wgs84")
+    assert planner.definition(adhoc, utm32) == "gis | utm zone=32"
+    assert planner.op("etrs89geo", "etrs89utm32") == op
+
+    # Registering a CRS may change the routes, so they are planned anew, and the
+    # operators given back to the context
+    planner.register(
+        Crs(id="etrs89utm32", parent_id="etrs89", to_parent="inv utm zone=34")
+    )
+    assert planner.plans == {}
+    assert ctx.references[op] == 0
+    op = planner.op("etrs89geo", "etrs89utm32")
+    assert ctx.ops[op].normalized_definition == "geo | utm zone=34"
+    planner.clear()
+    assert ctx.references[op] == 0
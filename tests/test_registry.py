@@ -0,0 +1,87 @@
+import subprocess
+import sys
+
+from pyge.context import OpDirection
+from pyge.coordinateset import CoordinateSetRowWise
+from pyge.minimal import MinimalContext
+from pyge.registry import LazyRegistry, entry_point_methods
+
+# Generous, to stay clear of noise on slow machines: The import takes some 60 ms
+IMPORT_BUDGET_MICROSECONDS = 250_000
+
+
+def run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_time():
+    # Importing the context imports none of the operator methods, nor NumPy
+    code = (
+        "import sys, pyge.minimal\n"
+        "print(sorted(m for m in sys.modules if 'operator_methods.' in m))\n"
+        "print('numpy' in sys.modules, 'asyncio' in sys.modules)\n"
+        "ctx = pyge.minimal.MinimalContext()\n"
+        "ctx.op('utm zone=32')\n"
+        "print(sorted(m for m in sys.modules if 'operator_methods.' in m))\n"
+        "ctx.op('addone | addone')\n"
+        "ctx.op('geo | ne | helmert translation=1,2,3 | cart | utm zone=33')\n"
+        "print('numpy' in sys.modules)\n"
+    )
+    result = run(code)
+    lines = result.stdout.splitlines()
+    assert lines[0] == "[]"
+    assert lines[1] == "False False"
+    # ... while using a method imports just that
+    assert lines[2] == "['pyge.builtin_operator_methods.tmerc']"
+    # ... and NumPy is not imported for instantiating operators, including the
+    # merged affine steps, but only when operands with array storage come along
+    assert lines[3] == "False"
+
+    # The cumulative import time of the context, as reported by -X importtime
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    assert 0 < times["pyge.minimal"] < IMPORT_BUDGET_MICROSECONDS
+
+
+def test_plugin_discovery(tmp_path, monkeypatch):
+    # A third party package, providing the operator method "halve" through the
+    # pyge.operator_methods entry point group
+    (tmp_path / "pyge_halve.py").write_text(
+        "from pyge.operator_method import OperatorMethod\n"
+        "def halve(op, ctx, operands):\n"
+        "    for i in range(len(operands)):\n"
+        "        operands[i] = [operands[i][0] / 2]\n"
+        "    return len(operands)\n"
+        "halve = OperatorMethod(id='halve', fwd=halve)\n"
+    )
+    info = tmp_path / "pyge_halve-1.0.dist-info"
+    info.mkdir()
+    (info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: pyge-halve\nVersion: 1.0\n"
+    )
+    (info / "entry_points.txt").write_text(
+        "[pyge.operator_methods]\nhalve = pyge_halve:halve\nutm = pyge_halve:halve\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    registry = LazyRegistry(entry_point_methods)
+    assert "halve" in registry
+    assert "pyge_halve" not in sys.modules
+    monkeypatch.setattr("pyge.minimal.plugin_operator_methods", registry)
+
+    ctx = MinimalContext()
+    coords = CoordinateSetRowWise([[3.0, 1.0]])
+    ctx.apply(ctx.op("halve | addone"), OpDirection.FWD, coords)
+    assert coords[0] == [2.5, 1.0]
+
+    # Plugins cannot shadow the builtins
+    assert ctx.operator_method("utm").id == "utm"
+    assert ctx.operator_method("no_such_method") is None